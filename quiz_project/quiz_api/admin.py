@@ -1,18 +1,22 @@
 # quiz_api/admin.py
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
-from .models import Category, Question, Choice
+from .models import Category, Question, Choice, ImportJob
 from .resources import CategoryResource, QuestionResource, ChoiceResource, UnifiedQuizResource
+from .importers import QuizImportError, preview_csv
+from .import_jobs import enqueue_import, retry_jobs
+from .exporters import streaming_csv_response
+from .stats_snapshot import COUNTERS as STATS_COUNTERS, get_stats_snapshot
 from django import forms
-from django.shortcuts import render, redirect
-from django.urls import path
+from django.db.models import Count, Exists, OuterRef
+from django.shortcuts import get_object_or_404, render, redirect
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.contrib import messages
 from import_export import resources
-from django.http import HttpResponseRedirect, HttpResponse, JsonResponse
+from django.http import JsonResponse
 from django.utils import timezone
 from datetime import timedelta
-import csv
-import io
 
 class BulkQuestionForm(forms.Form):
     category = forms.ModelChoiceField(queryset=Category.objects.all())
@@ -172,6 +176,20 @@ class SimpleQuestionInline(admin.TabularInline):
         }
 
 
+UNIFIED_IMPORT_HELP_TEXT = '''
+CSVファイルの形式:
+カテゴリー,質問,選択肢1,選択肢2,選択肢3,選択肢4,正解番号
+
+例:
+数学,2+2は?,2,3,4,5,3
+数学,3×3は?,6,9,12,15,2
+英語,appleの意味は?,りんご,みかん,バナナ,ぶどう,1
+
+※選択肢5,選択肢6も使用可能です
+※正解番号は1から始まる数字で指定してください
+'''
+
+
 class UnifiedQuizImportForm(forms.Form):
     """統一CSV形式インポート用フォーム"""
     csv_file = forms.FileField(
@@ -193,10 +211,15 @@ class CategoryAdmin(ImportExportModelAdmin):
     actions = ['unified_export_selected']
     inlines = [SimpleQuestionInline]  # カテゴリー内で質問を直接編集
     
+    def get_queryset(self, request):
+        """一覧の質問数を一覧取得のクエリで集計する"""
+        return super().get_queryset(request).annotate(_question_count=Count('questions'))
+    
     def question_count(self, obj):
         """カテゴリーに属する質問数を表示"""
-        return obj.questions.count()
+        return obj._question_count
     question_count.short_description = '質問数'
+    question_count.admin_order_field = '_question_count'
     
     def get_urls(self):
         urls = super().get_urls()
@@ -216,178 +239,28 @@ class CategoryAdmin(ImportExportModelAdmin):
                 csv_file = request.FILES['csv_file']
                 
                 try:
-                    # CSVファイルをデコード
-                    import io
-                    import csv
-                    
-                    # ファイルを読み込み
-                    file_data = csv_file.read()
-                    
-                    # BOMを除去
-                    if file_data.startswith(b'\xef\xbb\xbf'):
-                        file_data = file_data[3:]
-                    
-                    # エンコーディングを試行
-                    decoded_data = None
-                    encoding_used = None
-                    
-                    for encoding in ['utf-8-sig', 'utf-8', 'shift_jis', 'cp932', 'iso-2022-jp']:
-                        try:
-                            decoded_data = file_data.decode(encoding)
-                            encoding_used = encoding
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    
-                    if decoded_data is None:
-                        decoded_data = file_data.decode('utf-8', errors='ignore')
-                        encoding_used = 'utf-8 (with errors ignored)'
-                    
-                    # デバッグ: エンコーディング情報を追加
-                    messages.info(request, f"ファイルエンコーディング: {encoding_used}")
-                    
-                    # 改行コードを統一
-                    decoded_data = decoded_data.replace('\r\n', '\n').replace('\r', '\n')
-                    
-                    # CSVを解析（複数の区切り文字を試行）
-                    csv_reader = None
-                    delimiter_used = None
-                    
-                    for delimiter in [',', ';', '\t']:
-                        try:
-                            test_reader = csv.DictReader(io.StringIO(decoded_data), delimiter=delimiter)
-                            test_rows = list(test_reader)
-                            if len(test_rows) > 0 and len(test_rows[0]) >= 5:  # 最低5列必要
-                                csv_reader = csv.DictReader(io.StringIO(decoded_data), delimiter=delimiter)
-                                delimiter_used = delimiter
-                                break
-                        except:
-                            continue
-                    
-                    if csv_reader is None:
-                        csv_reader = csv.DictReader(io.StringIO(decoded_data))
-                        delimiter_used = ','
-                    
-                    messages.info(request, f"CSV区切り文字: '{delimiter_used}'")
-                    
-                    # UnifiedQuizResourceを使用してインポート
-                    resource = UnifiedQuizResource()
-                    
-                    # データを一旦全て読み込んで重複チェック
-                    rows = list(csv_reader)
-                    
-                    # CSV内での重複質問チェック
-                    seen_questions = set()
-                    duplicate_warnings = []
-                    
-                    for row_num, row in enumerate(rows, 1):
-                        question_key = f"{row.get('カテゴリー', '').strip()}:{row.get('質問', '').strip()}"
-                        if question_key in seen_questions:
-                            duplicate_warnings.append(f"行{row_num}: 重複する質問があります - {row.get('質問', '')}")
-                        else:
-                            seen_questions.add(question_key)
-                    
-                    # 重複警告を表示
-                    if duplicate_warnings:
-                        warning_msg = "CSV内で重複する質問が見つかりました:\n" + "\n".join(duplicate_warnings[:5])
-                        if len(duplicate_warnings) > 5:
-                            warning_msg += f"\n...他{len(duplicate_warnings)-5}件の重複"
-                        messages.warning(request, warning_msg)
-                    
-                    # プレビューモードの場合
+                    # プレビューモードの場合（先頭10行のみ検証し、総行数を数える）
                     if form.cleaned_data.get('preview_only'):
-                        preview_data = []
-                        validation_errors = []
-                        
-                        for row_num, row in enumerate(rows[:10], 1):  # 最初の10行のみプレビュー
-                            try:
-                                # バリデーションのみ実行
-                                resource.before_import_row(row)
-                                preview_data.append({
-                                    'row_num': row_num,
-                                    'category': row.get('カテゴリー', ''),
-                                    'question': row.get('質問', ''),
-                                    'choices': [row.get(f'選択肢{i}', '') for i in range(1, 7) if row.get(f'選択肢{i}', '').strip()],
-                                    'correct_answer': row.get('正解番号', ''),
-                                    'status': 'OK'
-                                })
-                            except Exception as e:
-                                validation_errors.append(f"行{row_num}: {str(e)}")
-                                preview_data.append({
-                                    'row_num': row_num,
-                                    'category': row.get('カテゴリー', ''),
-                                    'question': row.get('質問', ''),
-                                    'choices': [],
-                                    'correct_answer': row.get('正解番号', ''),
-                                    'status': f'エラー: {str(e)}'
-                                })
-                        
+                        result, preview_data = preview_csv(csv_file)
+                        messages.info(request, f"ファイルエンコーディング: {result.encoding}")
+                        messages.info(request, f"CSV区切り文字: '{result.delimiter}'")
                         return render(request, 'admin/quiz_api/category/unified_import.html', {
                             'form': form,
                             'title': '統一CSV形式インポート - プレビュー',
                             'preview_data': preview_data,
-                            'total_rows': len(rows),
-                            'validation_errors': validation_errors,
-                            'duplicate_warnings': duplicate_warnings,
-                            'help_text': '''
-CSVファイルの形式:
-カテゴリー,質問,選択肢1,選択肢2,選択肢3,選択肢4,正解番号
-
-例:
-数学,2+2は?,2,3,4,5,3
-数学,3×3は?,6,9,12,15,2
-英語,appleの意味は?,りんご,みかん,バナナ,ぶどう,1
-
-※選択肢5,選択肢6も使用可能です
-※正解番号は1から始まる数字で指定してください
-                            '''
-                        })
-                    
-                    # 実際のインポート実行
-                    imported_count = 0
-                    errors = []
-                    
-                    # デバッグ: CSVの内容を確認
-                    if len(rows) == 0:
-                        messages.error(request, "CSVファイルにデータが見つかりませんでした。ヘッダー行のみの可能性があります。")
-                        return render(request, 'admin/quiz_api/category/unified_import.html', {
-                            'form': form,
-                            'title': '統一CSV形式インポート',
+                            'total_rows': result.total_rows,
+                            'validation_errors': result.errors,
+                            'duplicate_warnings': [],
+                            'help_text': UNIFIED_IMPORT_HELP_TEXT,
                         })
                     
-                    # デバッグ情報をメッセージに追加
-                    debug_msg = f"CSVファイル解析結果: {len(rows)}行のデータを検出しました"
-                    if len(rows) > 0:
-                        first_row = rows[0]
-                        debug_msg += f"\n最初の行の内容: {dict(first_row)}"
-                        debug_msg += f"\nCSVヘッダー: {list(first_row.keys())}"
-                    else:
-                        # CSVの生データも表示
-                        debug_msg += f"\nCSVファイルの内容（最初の500文字）:\n{decoded_data[:500]}"
-                    messages.info(request, debug_msg)
-                    
-                    for row_num, row in enumerate(rows, 1):
-                        try:
-                            # デバッグ: 各行の処理状況をログ
-                            print(f"Processing row {row_num}: {dict(row)}")
-                            resource.import_row(row, None)
-                            imported_count += 1
-                        except Exception as e:
-                            error_detail = f"行{row_num}: {str(e)} (データ: {dict(row)})"
-                            errors.append(error_detail)
-                            print(f"Error in row {row_num}: {e}")
-                    
-                    if errors:
-                        error_msg = "一部のデータでエラーが発生しました:\n" + "\n".join(errors[:5])
-                        if len(errors) > 5:
-                            error_msg += f"\n...他{len(errors)-5}件のエラー"
-                        messages.warning(request, error_msg)
-                    
-                    success_msg = f"{imported_count}問の問題を正常にインポートしました（総処理行数: {len(rows)}行）"
-                    messages.success(request, success_msg)
-                    
-                    return HttpResponseRedirect('..')
+                    # 実際のインポートはワーカー（run_import_worker）で実行する
+                    job = enqueue_import(ImportJob.FORMAT_CSV, uploaded_file=csv_file, user=request.user)
+                    messages.success(request, f"インポートジョブ {job.id} を登録しました。進捗はこの画面で確認できます")
+                    return redirect(f'{self.admin_site.name}:quiz_api_importjob_progress', job.id)
                     
+                except QuizImportError as e:
+                    messages.error(request, str(e))
                 except Exception as e:
                     messages.error(request, f"CSVファイルの処理中にエラーが発生しました: {str(e)}")
         else:
@@ -396,57 +269,25 @@ CSVファイルの形式:
         return render(request, 'admin/quiz_api/category/unified_import.html', {
             'form': form,
             'title': '統一CSV形式インポート',
-            'help_text': '''
-CSVファイルの形式:
-カテゴリー,質問,選択肢1,選択肢2,選択肢3,選択肢4,正解番号
-
-例:
-数学,2+2は?,2,3,4,5,3
-数学,3×3は?,6,9,12,15,2
-英語,appleの意味は?,りんご,みかん,バナナ,ぶどう,1
-
-※選択肢5,選択肢6も使用可能です
-※正解番号は1から始まる数字で指定してください
-            '''
+            'help_text': UNIFIED_IMPORT_HELP_TEXT,
         })
     
     def unified_export_view(self, request):
-        """統一CSV形式でのエクスポート"""
+        """統一CSV形式でのエクスポート（ストリーミング、?gzip=1 で gzip 圧縮）"""
         resource = UnifiedQuizResource()
-        data = resource.export_data()
-        
-        # CSVレスポンスを作成
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="unified_quiz_export.csv"'
-        
-        # BOMを追加してExcelで正しく開けるようにする
-        response.write('\ufeff')
-        
-        writer = csv.writer(response)
-        for row in data:
-            writer.writerow(row)
-        
-        return response
+        return streaming_csv_response(
+            resource.iter_export_rows(),
+            'unified_quiz_export.csv',
+            compress=request.GET.get('gzip') == '1',
+        )
     
     def unified_export_selected(self, request, queryset):
         """選択されたカテゴリーの問題を統一CSV形式でエクスポート"""
-        from django.db.models import Q
-        
         # 選択されたカテゴリーに属する質問を取得
-        questions = Question.objects.filter(category__in=queryset).select_related('category').prefetch_related('choices')
+        questions = Question.objects.filter(category__in=queryset)
         
         resource = UnifiedQuizResource()
-        data = resource.export_data(questions)
-        
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = 'attachment; filename="selected_categories_export.csv"'
-        response.write('\ufeff')
-        
-        writer = csv.writer(response)
-        for row in data:
-            writer.writerow(row)
-        
-        return response
+        return streaming_csv_response(resource.iter_export_rows(questions), 'selected_categories_export.csv')
     
     unified_export_selected.short_description = "選択されたカテゴリーを統一CSV形式でエクスポート"
 
@@ -464,16 +305,25 @@ class QuestionAdmin(ImportExportModelAdmin):
             kwargs['form'] = QuestionWithChoicesForm
         return super().get_form(request, obj, **kwargs)
     
+    def get_queryset(self, request):
+        """一覧の選択肢数・正解の有無・カテゴリーを一覧取得のクエリで取得する"""
+        return super().get_queryset(request).select_related('category').annotate(
+            _choice_count=Count('choices'),
+            _has_correct_answer=Exists(Choice.objects.filter(question=OuterRef('pk'), is_correct=True)),
+        )
+    
     def choice_count(self, obj):
         """質問に属する選択肢数を表示"""
-        return obj.choices.count()
+        return obj._choice_count
     choice_count.short_description = '選択肢数'
+    choice_count.admin_order_field = '_choice_count'
     
     def has_correct_answer(self, obj):
         """正解が設定されているかを表示"""
-        return obj.choices.filter(is_correct=True).exists()
+        return obj._has_correct_answer
     has_correct_answer.short_description = '正解設定'
     has_correct_answer.boolean = True
+    has_correct_answer.admin_order_field = '_has_correct_answer'
     
     def get_urls(self):
         urls = super().get_urls()
@@ -489,38 +339,15 @@ class QuestionAdmin(ImportExportModelAdmin):
         if request.method == 'POST':
             form = BulkQuestionForm(request.POST)
             if form.is_valid():
-                category = form.cleaned_data['category']
-                questions_data = form.cleaned_data['questions_data']
-                
-                # 問題ごとに分割
-                question_blocks = [q.strip() for q in questions_data.split('\n\n') if q.strip()]
-                
-                for block in question_blocks:
-                    lines = block.strip().split('\n')
-                    if len(lines) >= 5:  # 問題文 + 少なくとも4つの選択肢
-                        question_text = lines[0].strip()
-                        # 問題を作成
-                        question = Question.objects.create(
-                            text=question_text,
-                            category=category
-                        )
-                        
-                        # 選択肢を追加
-                        for i in range(1, min(5, len(lines))):
-                            choice_text = lines[i].strip()
-                            is_correct = False
-                            if choice_text.endswith('*'):
-                                choice_text = choice_text[:-1].strip()
-                                is_correct = True
-                            
-                            Choice.objects.create(
-                                question=question,
-                                text=choice_text,
-                                is_correct=is_correct
-                            )
-                
-                self.message_user(request, f"{len(question_blocks)}問の問題を追加しました")
-                return redirect('..')
+                # 問題の作成はワーカー（run_import_worker）で実行する
+                job = enqueue_import(
+                    ImportJob.FORMAT_BULK,
+                    text=form.cleaned_data['questions_data'],
+                    category=form.cleaned_data['category'],
+                    user=request.user,
+                )
+                self.message_user(request, f"インポートジョブ {job.id} を登録しました")
+                return redirect(f'{self.admin_site.name}:quiz_api_importjob_progress', job.id)
         else:
             form = BulkQuestionForm()
         
@@ -534,35 +361,15 @@ class QuestionAdmin(ImportExportModelAdmin):
         if request.method == 'POST':
             form = AdvancedBulkQuestionForm(request.POST)
             if form.is_valid():
-                category = form.cleaned_data['category']
-                format_type = form.cleaned_data['format_type']
-                questions_data = form.cleaned_data['questions_data']
-                
-                try:
-                    created_count = 0
-                    errors = []
-                    
-                    if format_type == 'simple':
-                        created_count, errors = self._process_simple_format(category, questions_data)
-                    elif format_type == 'json':
-                        created_count, errors = self._process_json_format(category, questions_data)
-                    elif format_type == 'yaml':
-                        created_count, errors = self._process_yaml_format(category, questions_data)
-                    
-                    if errors:
-                        error_msg = "一部のデータでエラーが発生しました:\n" + "\n".join(errors[:5])
-                        if len(errors) > 5:
-                            error_msg += f"\n...他{len(errors)-5}件のエラー"
-                        messages.warning(request, error_msg)
-                    
-                    if created_count > 0:
-                        success_msg = f"{created_count}問の問題を正常に追加しました"
-                        messages.success(request, success_msg)
-                    
-                    return redirect('..')
-                    
-                except Exception as e:
-                    messages.error(request, f"データ処理中にエラーが発生しました: {str(e)}")
+                # 問題の作成はワーカー（run_import_worker）で実行する
+                job = enqueue_import(
+                    form.cleaned_data['format_type'],
+                    text=form.cleaned_data['questions_data'],
+                    category=form.cleaned_data['category'],
+                    user=request.user,
+                )
+                messages.success(request, f"インポートジョブ {job.id} を登録しました。進捗はこの画面で確認できます")
+                return redirect(f'{self.admin_site.name}:quiz_api_importjob_progress', job.id)
         else:
             form = AdvancedBulkQuestionForm()
         
@@ -571,128 +378,6 @@ class QuestionAdmin(ImportExportModelAdmin):
             'title': '高度な問題一括追加'
         })
     
-    def _process_simple_format(self, category, data):
-        """シンプル形式のデータを処理"""
-        question_blocks = [q.strip() for q in data.split('\n\n') if q.strip()]
-        created_count = 0
-        errors = []
-        
-        for i, block in enumerate(question_blocks, 1):
-            try:
-                lines = [line.strip() for line in block.strip().split('\n') if line.strip()]
-                if len(lines) < 3:  # 問題文 + 最低2つの選択肢
-                    errors.append(f"ブロック{i}: 問題文と最低2つの選択肢が必要です")
-                    continue
-                
-                question_text = lines[0]
-                choices_data = lines[1:]
-                
-                # 正解を特定
-                correct_index = -1
-                processed_choices = []
-                
-                for j, choice in enumerate(choices_data):
-                    if choice.endswith('*'):
-                        if correct_index != -1:
-                            errors.append(f"ブロック{i}: 複数の正解が指定されています")
-                            break
-                        correct_index = j
-                        processed_choices.append(choice[:-1].strip())
-                    else:
-                        processed_choices.append(choice)
-                
-                if correct_index == -1:
-                    errors.append(f"ブロック{i}: 正解が指定されていません（*を付けてください）")
-                    continue
-                
-                # 質問を作成
-                question = Question.objects.create(
-                    text=question_text,
-                    category=category
-                )
-                
-                # 選択肢を作成
-                for j, choice_text in enumerate(processed_choices):
-                    Choice.objects.create(
-                        question=question,
-                        text=choice_text,
-                        is_correct=(j == correct_index)
-                    )
-                
-                created_count += 1
-                
-            except Exception as e:
-                errors.append(f"ブロック{i}: {str(e)}")
-        
-        return created_count, errors
-    
-    def _process_json_format(self, category, data):
-        """JSON形式のデータを処理"""
-        import json
-        
-        try:
-            questions_list = json.loads(data)
-        except json.JSONDecodeError as e:
-            return 0, [f"JSON形式エラー: {str(e)}"]
-        
-        created_count = 0
-        errors = []
-        
-        for i, q_data in enumerate(questions_list, 1):
-            try:
-                question_text = q_data.get('question', '').strip()
-                choices_data = q_data.get('choices', [])
-                
-                if not question_text:
-                    errors.append(f"質問{i}: 問題文が空です")
-                    continue
-                
-                if len(choices_data) < 2:
-                    errors.append(f"質問{i}: 最低2つの選択肢が必要です")
-                    continue
-                
-                correct_count = sum(1 for c in choices_data if c.get('correct', False))
-                if correct_count != 1:
-                    errors.append(f"質問{i}: 正解は1つだけ指定してください")
-                    continue
-                
-                # 質問を作成
-                question = Question.objects.create(
-                    text=question_text,
-                    category=category
-                )
-                
-                # 選択肢を作成
-                for choice_data in choices_data:
-                    Choice.objects.create(
-                        question=question,
-                        text=choice_data.get('text', ''),
-                        is_correct=choice_data.get('correct', False)
-                    )
-                
-                created_count += 1
-                
-            except Exception as e:
-                errors.append(f"質問{i}: {str(e)}")
-        
-        return created_count, errors
-    
-    def _process_yaml_format(self, category, data):
-        """YAML形式のデータを処理"""
-        try:
-            import yaml
-        except ImportError:
-            return 0, ["YAMLライブラリがインストールされていません"]
-        
-        try:
-            questions_list = yaml.safe_load(data)
-        except yaml.YAMLError as e:
-            return 0, [f"YAML形式エラー: {str(e)}"]
-        
-        # JSON形式と同じ処理ロジックを使用
-        import json
-        return self._process_json_format(category, json.dumps(questions_list))
-    
     def unified_add_view(self, request):
         """統合フォームで新規作成"""
         if request.method == 'POST':
@@ -745,7 +430,10 @@ class ChoiceAdmin(ImportExportModelAdmin):
     list_display = ['text', 'question', 'question_category', 'is_correct']
     list_filter = ['is_correct', 'question__category']
     search_fields = ['text', 'question__text']
-    list_select_related = ['question__category']  # パフォーマンス最適化
+    
+    def get_queryset(self, request):
+        """一覧の質問とカテゴリーを一覧取得のクエリで取得する"""
+        return super().get_queryset(request).select_related('question__category')
     
     def question_category(self, obj):
         """質問のカテゴリーを表示"""
@@ -754,6 +442,92 @@ class ChoiceAdmin(ImportExportModelAdmin):
     question_category.admin_order_field = 'question__category__name'
 
 
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'format', 'original_name', 'category', 'status', 'progress_percent',
+                    'processed_rows', 'created_count', 'error_count', 'created_at', 'progress_link']
+    list_filter = ['status', 'format']
+    readonly_fields = [field.name for field in ImportJob._meta.fields]
+    list_select_related = ['category']
+    actions = ['retry_selected']
+    
+    def has_add_permission(self, request):
+        # ジョブは各インポート画面から登録する
+        return False
+    
+    def progress_percent(self, obj):
+        """進捗率を表示"""
+        return f"{obj.progress * 100:.0f}%"
+    progress_percent.short_description = '進捗'
+    
+    def progress_link(self, obj):
+        """進捗画面へのリンク"""
+        url = reverse(f'{self.admin_site.name}:quiz_api_importjob_progress', args=[obj.id])
+        return format_html('<a href="{}">進捗を表示</a>', url)
+    progress_link.short_description = '詳細'
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('<int:job_id>/progress/', self.admin_site.admin_view(self.progress_view),
+                 name='quiz_api_importjob_progress'),
+            path('<int:job_id>/status/', self.admin_site.admin_view(self.status_api),
+                 name='quiz_api_importjob_status'),
+        ]
+        return custom_urls + urls
+    
+    def _job_data(self, job):
+        return {
+            'id': job.id,
+            'format': job.format,
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'is_finished': job.is_finished,
+            'progress': job.progress,
+            'processed_rows': job.processed_rows,
+            'created_count': job.created_count,
+            'updated_count': job.updated_count,
+            'error_count': job.error_count,
+            'errors': job.errors,
+            'message': job.message,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
+    
+    def status_api(self, request, job_id):
+        """ジョブの進捗API（進捗画面からポーリングする）"""
+        job = get_object_or_404(ImportJob, pk=job_id)
+        return JsonResponse(self._job_data(job))
+    
+    def progress_view(self, request, job_id):
+        """ジョブの進捗画面"""
+        job = get_object_or_404(ImportJob, pk=job_id)
+        return render(request, 'admin/quiz_api/importjob/progress.html', {
+            **self.admin_site.each_context(request),
+            'title': f'インポートジョブ {job.id} の進捗',
+            'job': job,
+            'status_url': reverse(f'{self.admin_site.name}:quiz_api_importjob_status', args=[job.id]),
+            'opts': self.model._meta,
+        })
+    
+    def retry_selected(self, request, queryset):
+        """選択されたジョブを再実行"""
+        count = retry_jobs(queryset)
+        self.message_user(request, f"{count}件のジョブを再実行待ちにしました")
+    retry_selected.short_description = "選択されたジョブを再実行"
+
+
+def _stats_context():
+    """管理画面テンプレート用の件数（件数スナップショットから取得）"""
+    snapshot = get_stats_snapshot()
+    return {
+        'category_count': snapshot['categories'],
+        'question_count': snapshot['questions'],
+        'choice_count': snapshot['choices'],
+        'quiz_attempts': snapshot['attempts'],
+    }
+
+
 class QuizAdminSite(admin.AdminSite):
     """カスタム管理サイト"""
     site_header = "クイズ管理システム"
@@ -762,17 +536,10 @@ class QuizAdminSite(admin.AdminSite):
     
     def index(self, request, extra_context=None):
         """管理画面トップページのカスタマイズ"""
-        from .models import QuizAttempt
-        
         extra_context = extra_context or {}
         
         # 統計データ
-        extra_context.update({
-            'category_count': Category.objects.count(),
-            'question_count': Question.objects.count(),
-            'choice_count': Choice.objects.count(),
-            'quiz_attempts': QuizAttempt.objects.count(),
-        })
+        extra_context.update(_stats_context())
         
         # 最近の活動（過去7日間）
         week_ago = timezone.now() - timedelta(days=7)
@@ -810,19 +577,29 @@ class QuizAdminSite(admin.AdminSite):
         urls = super().get_urls()
         custom_urls = [
             path('quiz-stats-api/', self.admin_view(self.stats_api), name='quiz_api_stats_api'),
+            path('quiz-cache-stats-api/', self.admin_view(self.cache_stats_api), name='quiz_api_cache_stats_api'),
+            path('quiz-metrics-api/', self.admin_view(self.metrics_api), name='quiz_api_metrics_api'),
         ]
         return custom_urls + urls
     
     def stats_api(self, request):
         """統計データAPI"""
-        from .models import QuizAttempt
+        snapshot = get_stats_snapshot()
+        return JsonResponse({name: snapshot[name] for name in STATS_COUNTERS})
+    
+    def cache_stats_api(self, request):
+        """キャッシュのヒット・ミス数API（このワーカープロセスの集計）"""
+        from .cache import get_cache_stats
         
-        data = {
-            'categories': Category.objects.count(),
-            'questions': Question.objects.count(),
-            'choices': Choice.objects.count(),
-            'attempts': QuizAttempt.objects.count(),
-        }
+        return JsonResponse(get_cache_stats())
+    
+    def metrics_api(self, request):
+        """URL名ごとのレイテンシー・SQL件数のヒストグラムAPI（このワーカープロセスの集計）"""
+        from .instrumentation import get_request_metrics, reset_request_metrics
+        
+        data = get_request_metrics()
+        if request.method == 'POST':
+            reset_request_metrics()
         return JsonResponse(data)
 
 
@@ -833,6 +610,7 @@ quiz_admin_site = QuizAdminSite(name='quiz_admin')
 quiz_admin_site.register(Category, CategoryAdmin)
 quiz_admin_site.register(Question, QuestionAdmin)
 quiz_admin_site.register(Choice, ChoiceAdmin)
+quiz_admin_site.register(ImportJob, ImportJobAdmin)
 
 # デフォルト管理画面の設定もカスタマイズ
 admin.site.site_header = "クイズ管理システム"
@@ -845,11 +623,4 @@ def admin_context_processor(request):
     if not request.path.startswith('/admin/'):
         return {}
     
-    from .models import QuizAttempt
-    
-    return {
-        'category_count': Category.objects.count(),
-        'question_count': Question.objects.count(), 
-        'choice_count': Choice.objects.count(),
-        'quiz_attempts': QuizAttempt.objects.count(),
-    }
+    return _stats_context()
@@ -0,0 +1,58 @@
+# quiz_api/answer_keys.py
+"""採点用の解答キャッシュ
+
+カテゴリごとに {question_id: {choice_id: is_correct}} の対応表を保持し、
+クイズ結果の保存時はこの表だけで選択肢の検証と採点を行う。
+対応表は共有キャッシュ（cache.ANSWER_KEYS）に保存し、各プロセスは
+バージョンが変わるまでローカルにも保持する。
+Question / Choice の保存・削除シグナルでバージョンが更新される（signals.py）。
+"""
+from . import cache as quiz_cache
+from .models import Choice
+
+# プロセス内の写し: {category_id: (バージョン, 対応表)}
+_local_answer_keys = {}
+
+
+def _load_choices(queryset):
+    answer_key = {}
+    for question_id, choice_id, is_correct in queryset.values_list('question_id', 'id', 'is_correct'):
+        answer_key.setdefault(question_id, {})[choice_id] = is_correct
+    return answer_key
+
+
+def get_category_answer_key(category_id):
+    """カテゴリの解答対応表を返す（初回のみDBから構築）"""
+    version = quiz_cache.get_version(quiz_cache.ANSWER_KEYS)
+    local = _local_answer_keys.get(category_id)
+    if local is not None and local[0] == version:
+        quiz_cache.record(quiz_cache.ANSWER_KEYS, hits=1)
+        return local[1]
+
+    answer_key = quiz_cache.cache_aside(
+        quiz_cache.ANSWER_KEYS,
+        [category_id],
+        lambda: _load_choices(Choice.objects.filter(question__category_id=category_id)),
+        version=version,
+    )
+    _local_answer_keys[category_id] = (version, answer_key)
+    return answer_key
+
+
+def get_answer_key(category_id, question_ids):
+    """指定問題の解答対応表を返す
+
+    カテゴリ外の問題が含まれる場合だけ、その問題分を追加で1回問い合わせる。
+    """
+    answer_key = get_category_answer_key(category_id)
+    missing = {question_id for question_id in question_ids if question_id not in answer_key}
+    if not missing:
+        return answer_key
+    merged = dict(answer_key)
+    merged.update(_load_choices(Choice.objects.filter(question_id__in=missing)))
+    return merged
+
+
+def invalidate_answer_keys():
+    """全カテゴリの解答対応表を無効にする"""
+    quiz_cache.invalidate(quiz_cache.ANSWER_KEYS)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class QuizApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quiz_api'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401
+
+        if settings.QUIZ_INSTRUMENTATION:
+            from .instrumentation import install_serializer_timing
+            install_serializer_timing()
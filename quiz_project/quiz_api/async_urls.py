@@ -0,0 +1,21 @@
+# quiz_api/async_urls.py
+"""QUIZ_ASYNC_VIEWS=True の場合の ROOT_URLCONF
+
+出題系APIと公開リーダーボードを同じURLの非同期ビュー（async_views.py）で処理し、
+それ以外は quiz_project.urls の同期版（DRF）に任せる。URL名も同期版と同じにする。
+"""
+from django.urls import include, path
+
+from .async_views import (
+    AsyncPublicLeaderboardView, AsyncQuizSessionView, AsyncRandomQuestionsView,
+    AsyncSessionQuestionsView, AsyncUniqueRandomView,
+)
+
+urlpatterns = [
+    path('api/questions/unique_random/', AsyncUniqueRandomView.as_view(), name='question-unique-random'),
+    path('api/questions/random_questions/', AsyncRandomQuestionsView.as_view(), name='question-random-questions'),
+    path('api/questions/session_questions/', AsyncSessionQuestionsView.as_view(), name='question-session-questions'),
+    path('api/questions/quiz_session/', AsyncQuizSessionView.as_view(), name='question-quiz-session'),
+    path('api/quiz/leaderboard/', AsyncPublicLeaderboardView.as_view(), name='public-leaderboard'),
+    path('', include('quiz_project.urls')),
+]
@@ -0,0 +1,250 @@
+# quiz_api/async_views.py
+"""出題系APIと公開リーダーボードの非同期版（ASGIでの運用向け）
+
+QUIZ_ASYNC_VIEWS=True の場合、async_urls.py で同じURLに
+QuestionViewSet の unique_random / random_questions / session_questions / quiz_session と
+PublicLeaderboardView より先に登録される。DBは非同期のORM、キャッシュは Django のキャッシュの
+非同期API（aget / aget_many など）で読み書きし、待っている間に同じワーカーで別のリクエストを処理する。
+認証・権限・レート制限・コンテンツネゴシエーション・ETag・例外処理は同期版と同じ APIView の実装を使い、
+レスポンスの本文とキャッシュのキーも同期版と共有する。
+"""
+import asyncio
+import hashlib
+import random
+import uuid
+
+from asgiref.sync import sync_to_async
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from . import cache as quiz_cache
+from .compression import precompress
+from .conditional import ConditionalGetMixin, make_etag
+from .models import QuizSession
+from .question_cache import aget_question_fragments
+from .question_pool import aget_question_pool, sample_from_pool, seeded_random
+from .recent_questions import aget_recent_question_ids
+from .renderers import RawJSON
+from .serializers import PublicLeaderboardSerializer, PublicQuestionSerializer, QuestionSerializer
+from .views import PublicLeaderboardView, parse_limit, public_leaderboard_queryset
+
+
+class AsyncAPIView(ConditionalGetMixin, APIView):
+    """ハンドラーを非同期で実行する APIView（GET のみ）
+
+    APIView.dispatch と同じ流れで、initial()（認証・権限・レート制限・コンテンツネゴシエーション・
+    条件付きGET）と handle_exception() は同期版の実装をスレッドで呼ぶ。
+    そのため throttle_classes などの上書きや ?format= も同期版のビューと同じように効く。
+    """
+    http_method_names = ['get', 'head', 'options']
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await sync_to_async(self.initial)(request, *args, **kwargs)
+            handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            response = handler(request, *args, **kwargs)
+            if asyncio.iscoroutine(response):
+                response = await response
+        except Exception as exc:
+            response = await sync_to_async(self.handle_exception)(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class AsyncQuestionView(AsyncAPIView):
+    """QuestionViewSet の抽選系アクションの非同期版の基底クラス"""
+
+    def hide_answers(self):
+        return self.request.query_params.get('hide_answers', 'false').lower() == 'true'
+
+    async def get_question_payloads(self, question_ids):
+        """問題IDをキャッシュ済みのJSON断片に変換する（QuestionViewSet.get_question_payloads と同じ断片）"""
+        serializer_class = PublicQuestionSerializer if self.hide_answers() else QuestionSerializer
+        return await aget_question_fragments(
+            question_ids,
+            self.request,
+            serialize=lambda questions: serializer_class(questions, many=True, context={'request': self.request}).data,
+            hide_answers=self.hide_answers(),
+        )
+
+
+class AsyncUniqueRandomView(AsyncQuestionView):
+    """QuestionViewSet.unique_random の非同期版"""
+
+    async def get(self, request):
+        category = request.query_params.get('category', None)
+        limit_num = parse_limit(request.query_params.get('limit', '10'))
+        seed = request.query_params.get('seed', None)
+
+        pool = await aget_question_pool(category)
+        if not pool:
+            return Response({
+                'count': 0,
+                'results': [],
+                'message': '指定された条件に合う問題が見つかりませんでした'
+            })
+
+        rng = seeded_random(seed) if seed else None
+        selected_questions = await self.get_question_payloads(sample_from_pool(pool, limit_num, rng=rng))
+        return Response({
+            'count': len(selected_questions),
+            'results': selected_questions,
+            'total_available': len(pool),
+            'message': f'{len(selected_questions)}問の問題をランダムに取得しました（重複なし保証）'
+        })
+
+
+class AsyncSessionQuestionsView(AsyncQuestionView):
+    """QuestionViewSet.session_questions の非同期版"""
+
+    async def get(self, request):
+        category = request.query_params.get('category', None)
+        session_id = request.query_params.get('session_id', '') or f"quiz_{uuid.uuid4().hex[:12]}"
+        limit_num = parse_limit(request.query_params.get('limit', '10'), maximum=20)
+        reset_session = request.query_params.get('reset', 'false')
+
+        session, created = await QuizSession.objects.aget_or_create(
+            session_id=session_id,
+            defaults={
+                'user': request.user if request.user.is_authenticated else None,
+                'category_id': int(category) if category and category != 'all' else None
+            }
+        )
+
+        used_question_ids = set()
+        if reset_session.lower() != 'true':
+            used_question_ids = session.get_used_question_ids()
+
+        pool = await aget_question_pool(category)
+        available_count = sum(1 for question_id in pool if question_id not in used_question_ids)
+
+        message_suffix = ''
+        if available_count == 0:
+            if not pool:
+                return Response({
+                    'count': 0, 'results': [], 'session_id': session_id,
+                    'message': '指定された条件に合う問題が見つかりませんでした',
+                    'total_available': 0, 'used_count': 0
+                })
+            used_question_ids = set()
+            available_count = len(pool)
+            message_suffix = '（すべての問題を出題済みのため、セッションをリセットしました）'
+
+        selected_ids = sample_from_pool(pool, limit_num, exclude=used_question_ids)
+        selected_questions = await self.get_question_payloads(selected_ids)
+
+        session.set_used_question_ids(used_question_ids | set(selected_ids))
+        await session.asave(update_fields=['used_question_data', 'used_count', 'updated_at'])
+
+        return Response({
+            'count': len(selected_questions),
+            'results': selected_questions,
+            'session_id': session_id,
+            'total_available': len(pool),
+            'used_count': session.used_count,
+            'remaining': available_count - len(selected_questions),
+            'message': f'{len(selected_questions)}問の問題を取得しました（セッション管理による重複なし保証）{message_suffix}'
+        })
+
+
+class AsyncRandomQuestionsView(AsyncQuestionView):
+    """QuestionViewSet.random_questions の非同期版"""
+
+    async def get(self, request):
+        category = request.query_params.get('category', None)
+        limit_num = parse_limit(request.query_params.get('limit', '10'))
+        exclude = request.query_params.get('exclude', '')
+
+        exclude_ids = set()
+        if exclude:
+            try:
+                exclude_ids = {int(x.strip()) for x in exclude.split(',') if x.strip()}
+            except ValueError:
+                pass
+
+        pool = await aget_question_pool(category)
+        questions = await self.get_question_payloads(sample_from_pool(pool, limit_num, exclude=exclude_ids))
+        return Response({
+            'count': len(questions),
+            'results': questions,
+            'message': f'{len(questions)}問の問題をランダムに取得しました'
+        })
+
+
+class AsyncQuizSessionView(AsyncQuestionView):
+    """QuestionViewSet.quiz_session の非同期版"""
+
+    async def get(self, request):
+        category = request.query_params.get('category', None)
+        session_id = request.query_params.get('session_id', '')
+        question_count = parse_limit(request.query_params.get('count', '10'), maximum=20)
+        exclude_recent = request.query_params.get('exclude_recent', 'true')
+
+        pool = await aget_question_pool(category)
+
+        recent_question_ids = set()
+        if exclude_recent.lower() == 'true' and request.user.is_authenticated:
+            recent_question_ids = await aget_recent_question_ids(request.user.id)
+
+        total_questions = sum(1 for question_id in pool if question_id not in recent_question_ids)
+        if total_questions == 0:
+            return Response({
+                'count': 0, 'results': [],
+                'message': '指定された条件に合う問題が見つかりませんでした',
+                'total_available': 0
+            })
+
+        questions = await self.get_question_payloads(
+            sample_from_pool(pool, question_count, exclude=recent_question_ids)
+        )
+        return Response({
+            'count': len(questions),
+            'results': questions,
+            'session_id': session_id or f'session_{random.randint(1000, 9999)}',
+            'total_available': total_questions,
+            'message': f'{len(questions)}問の問題を取得しました（利用可能: {total_questions}問）'
+        })
+
+
+class AsyncPublicLeaderboardView(AsyncAPIView):
+    """PublicLeaderboardView の非同期版（同じキャッシュキー・ETag を使う）"""
+    permission_classes = [AllowAny]
+
+    def get_etag(self, request):
+        return make_etag('leaderboard', quiz_cache.get_version(quiz_cache.LEADERBOARD))
+
+    async def get(self, request):
+        url_digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+        async def render():
+            users = [user async for user in public_leaderboard_queryset(request.query_params.get('category', None))]
+            page = self.paginate(users)
+            serializer = PublicLeaderboardSerializer(users if page is None else page, many=True)
+            data = serializer.data if page is None else self.paginator.get_paginated_response(serializer.data).data
+            raw = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+            return raw, precompress(raw)
+
+        raw, encoded = await quiz_cache.acache_aside(
+            quiz_cache.LEADERBOARD,
+            [PublicLeaderboardView.__name__, 'z', url_digest],
+            render,
+            timeout=PublicLeaderboardView.leaderboard_cache_timeout,
+        )
+        return Response(RawJSON(raw, encoded=encoded))
+
+    def paginate(self, users):
+        """GenericAPIView.paginate_queryset と同じページネーション（なければ None）"""
+        pagination_class = api_settings.DEFAULT_PAGINATION_CLASS
+        if pagination_class is None:
+            return None
+        self.paginator = pagination_class()
+        return self.paginator.paginate_queryset(users, self.request, view=self)
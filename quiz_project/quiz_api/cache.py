@@ -0,0 +1,144 @@
+# quiz_api/cache.py
+"""quiz_api のキャッシュアサイド層
+
+キーには名前空間ごとのバージョントークンを含め、無効化はトークンの更新で行う。
+トークンも CACHES['default'] に保存するため、ファイルや Redis などの
+共有バックエンドを使えば gunicorn のワーカー間で無効化が伝わる。
+名前空間ごとのヒット・ミス数はプロセス単位で集計する。
+非同期ビュー（async_views.py）用に、キャッシュの非同期API（aget / aadd など）を使う a で始まる版も用意する。
+"""
+import os
+import threading
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+DEFAULT_TIMEOUT = 60 * 60
+
+# 名前空間
+CATEGORIES = 'categories'
+QUESTION_POOL = 'question_pool'
+ANSWER_KEYS = 'answer_keys'
+QUESTION_JSON = 'question_json'
+LEADERBOARD = 'leaderboard'
+STATS = 'stats'
+RECENT_QUESTIONS = 'recent_questions'
+CONTENT = 'content'
+ATTEMPTS = 'attempts'
+
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _version_key(namespace):
+    return f'ver:{namespace}'
+
+
+def _new_token():
+    return uuid.uuid4().hex[:12]
+
+
+def get_version(namespace):
+    """名前空間の現在のバージョントークンを返す"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_token(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(namespace):
+    """get_version の非同期版"""
+    key = _version_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, _new_token(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(*namespaces):
+    """名前空間のバージョンを更新し、既存のキャッシュをすべて無効にする"""
+    cache.set_many({_version_key(namespace): _new_token() for namespace in namespaces}, None)
+
+
+def invalidate(*namespaces):
+    """シグナル用の無効化（即時に加えてコミット後にも更新する）
+
+    コミット前に他のリクエストが古いデータを新しいバージョンで
+    キャッシュしてしまっても、コミット後の更新で破棄される。
+    """
+    bump_version(*namespaces)
+    transaction.on_commit(lambda: bump_version(*namespaces))
+
+
+def make_key(namespace, *parts, version=None):
+    """バージョン付きのキャッシュキーを作成する"""
+    if version is None:
+        version = get_version(namespace)
+    return ':'.join([namespace, version, *map(str, parts)])
+
+
+def record(namespace, hits=0, misses=0):
+    """ヒット・ミス数を加算する"""
+    with _stats_lock:
+        if hits:
+            _stats[(namespace, 'hits')] += hits
+        if misses:
+            _stats[(namespace, 'misses')] += misses
+
+
+def cache_aside(namespace, parts, loader, timeout=DEFAULT_TIMEOUT, version=None):
+    """キャッシュにあればその値を、なければ loader() の結果を保存して返す"""
+    key = make_key(namespace, *parts, version=version)
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        record(namespace, hits=1)
+        return value
+    record(namespace, misses=1)
+    value = loader()
+    cache.set(key, value, timeout)
+    return value
+
+
+async def acache_aside(namespace, parts, loader, timeout=DEFAULT_TIMEOUT, version=None):
+    """cache_aside の非同期版（loader はコルーチン関数）"""
+    if version is None:
+        version = await aget_version(namespace)
+    key = make_key(namespace, *parts, version=version)
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        record(namespace, hits=1)
+        return value
+    record(namespace, misses=1)
+    value = await loader()
+    await cache.aset(key, value, timeout)
+    return value
+
+
+def get_cache_stats():
+    """このプロセスのヒット・ミス数を名前空間ごとに返す"""
+    with _stats_lock:
+        snapshot = dict(_stats)
+    namespaces = {}
+    for (namespace, kind), count in snapshot.items():
+        namespaces.setdefault(namespace, {'hits': 0, 'misses': 0})[kind] = count
+    for counts in namespaces.values():
+        total = counts['hits'] + counts['misses']
+        counts['hit_rate'] = round(counts['hits'] / total, 4) if total else 0.0
+    return {
+        'pid': os.getpid(),
+        'backend': settings.CACHES['default']['BACKEND'],
+        'namespaces': namespaces,
+    }
+
+
+def reset_cache_stats():
+    """ヒット・ミス数をリセットする"""
+    with _stats_lock:
+        _stats.clear()
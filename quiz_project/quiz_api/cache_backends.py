@@ -0,0 +1,55 @@
+# quiz_api/cache_backends.py
+"""CACHE_URL から CACHES 設定を組み立てるユーティリティ
+
+settings.py から読み込むため、Django のモジュールには依存しない。
+
+対応形式:
+    locmem://name                  プロセス内メモリ（開発・テスト用）
+    file:///var/tmp/quiz_cache     ファイルベース（同一マシンのワーカー間で共有。小規模な環境向け）
+    unix:///run/redis.sock?db=0    Redis（ローカルソケット）
+    redis://host:6379/0            Redis 互換サーバー（rediss:// も可）
+    memcached://host:11211         Memcached（pymemcache）
+"""
+from urllib.parse import urlsplit
+
+DEFAULT_TIMEOUT = 300
+KEY_PREFIX = 'quiz'
+# FileBasedCache は書き込みのたびにディレクトリ全体を列挙して件数を数える（_cull）。
+# レート制限の履歴は毎リクエスト書き込まれ、バージョン更新で古いキーも期限切れまで残るため、
+# 上限を大きくすると1リクエストごとに数万ファイルの列挙が発生する。上限を小さく保ち、超えたら間引く
+FILE_CACHE_MAX_ENTRIES = 3000
+
+
+def cache_config_from_url(url, key_prefix=KEY_PREFIX, timeout=DEFAULT_TIMEOUT):
+    """CACHE_URL を CACHES['default'] 用の dict に変換する"""
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    config = {'KEY_PREFIX': key_prefix, 'TIMEOUT': timeout}
+
+    if scheme == 'locmem':
+        config.update({
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': parts.netloc or 'quiz-api',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        })
+    elif scheme == 'file':
+        if not parts.path:
+            raise ValueError(f'ファイルキャッシュのディレクトリが指定されていません: {url}')
+        config.update({
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': parts.path,
+            'OPTIONS': {'MAX_ENTRIES': FILE_CACHE_MAX_ENTRIES},
+        })
+    elif scheme in ('redis', 'rediss', 'unix'):
+        config.update({
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': url,
+        })
+    elif scheme in ('memcached', 'pymemcache'):
+        config.update({
+            'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+            'LOCATION': parts.netloc,
+        })
+    else:
+        raise ValueError(f'未対応のキャッシュURLです: {url}')
+    return config
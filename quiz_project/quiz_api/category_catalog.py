@@ -0,0 +1,47 @@
+# quiz_api/category_catalog.py
+"""ホーム画面用のカテゴリカタログ
+
+全カテゴリと、カテゴリごとの出題可能な問題数（選択肢のある問題）・そのうち画像付きの問題数を
+1回の集計クエリで作り、共有キャッシュ（cache.CATEGORIES）に保存する。
+キーのバージョンは CATEGORIES と QUESTION_POOL のトークンを組み合わせたもので、
+カテゴリ・問題・選択肢の保存・削除シグナル（signals.py）でどちらかが更新されると作り直される。
+同じバージョンを ETag にも使うため、キャッシュが温まっていればDBに触れずに 304 を返せる。
+キャッシュにはレンダリング済みのJSONと圧縮済みの表現（compression.precompress）を保存する。
+"""
+from django.db.models import Count, Q
+from rest_framework.settings import api_settings
+
+from . import cache as quiz_cache
+from .compression import precompress
+from .models import Category
+from .renderers import RawJSON
+
+
+def get_catalog_version():
+    """カタログの現在のバージョン（CATEGORIES と QUESTION_POOL のトークン）"""
+    return '.'.join([
+        quiz_cache.get_version(quiz_cache.CATEGORIES),
+        quiz_cache.get_version(quiz_cache.QUESTION_POOL),
+    ])
+
+
+def _build_catalog():
+    playable = Q(questions__choices__isnull=False)
+    rows = list(
+        Category.objects.annotate(
+            question_count=Count('questions', filter=playable, distinct=True),
+            image_question_count=Count('questions', filter=playable & Q(questions__image__gt=''), distinct=True),
+        )
+        .order_by('name', 'id')
+        .values('id', 'name', 'question_count', 'image_question_count')
+    )
+    raw = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(rows)
+    return raw, precompress(raw)
+
+
+def get_category_catalog(version=None):
+    """カテゴリカタログ（名前順の辞書のリストのJSON）を RawJSON で返す"""
+    if version is None:
+        version = get_catalog_version()
+    raw, encoded = quiz_cache.cache_aside(quiz_cache.CATEGORIES, ['catalog-z'], _build_catalog, version=version)
+    return RawJSON(raw, encoded=encoded)
@@ -0,0 +1,181 @@
+# quiz_api/compression.py
+"""APIレスポンスの圧縮（gzip / brotli）
+
+CompressionMiddleware は Accept-Encoding に応じて QUIZ_COMPRESSION_MIN_BYTES 以上の
+/api/ 以下の JSON レスポンスを圧縮する。brotli は brotli パッケージがある場合のみ使う。
+CSRFトークンを含む管理画面などのHTMLは BREACH 攻撃を避けるため圧縮しない。
+キャッシュ済みのペイロードは圧縮済みの表現も一緒に保存し、リクエストごとに圧縮しない。
+- カタログ・リーダーボード: precompress() で作ったレスポンス全体の gzip / br を RawJSON.encoded に持つ
+- 問題のJSON断片: deflate_block() で作った断片ごとの deflate ブロックを RawJSON.deflate_block に持ち、
+  レンダラーが残した断片の並び（response.json_parts）から gzip ストリームを組み立てる
+  （区切りの数バイトだけを圧縮し、CRC32 は全体から計算する）
+"""
+import struct
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+from .renderers import RawJSON
+
+try:
+    import brotli
+except ImportError:  # brotli は任意（なければ gzip のみ）
+    brotli = None
+
+# リクエストごとに圧縮する場合と、キャッシュに保存する前に1回だけ圧縮する場合の圧縮レベル
+COMPRESSION_LEVEL = 6
+PRECOMPRESSION_LEVEL = 9
+
+# 圧縮するのは API の JSON レスポンスのみ（秘密の値を含むHTMLは圧縮しない）
+API_PATH_PREFIX = '/api/'
+COMPRESSIBLE_TYPES = ('application/json',)
+
+# mtime 0・OS 不明の gzip ヘッダー（同じ内容なら同じバイト列になる）
+_GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+# 空の最終ブロック
+_FINAL_BLOCK = zlib.compressobj(wbits=-zlib.MAX_WBITS).flush()
+
+
+def available_encodings():
+    """このプロセスで使える圧縮形式（優先順）"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def compress(data, encoding, level=COMPRESSION_LEVEL):
+    """data を encoding（'gzip' または 'br'）で圧縮する"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=min(level + 2, 11))
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = compressor.compress(data) + compressor.flush()
+    return _GZIP_HEADER + body + struct.pack('<II', zlib.crc32(data), len(data) & 0xffffffff)
+
+
+def precompress(data):
+    """キャッシュに保存する圧縮済みの表現（{形式: バイト列}、しきい値未満なら空）"""
+    if len(data) < settings.QUIZ_COMPRESSION_MIN_BYTES:
+        return {}
+    return {encoding: compress(data, encoding, PRECOMPRESSION_LEVEL) for encoding in available_encodings()}
+
+
+def deflate_block(data, level=PRECOMPRESSION_LEVEL):
+    """他のブロックと連結できる deflate ブロック（最終ブロックなし・バイト境界で終わる）"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def splice_gzip(parts):
+    """bytes と RawJSON の並びを、断片の deflate ブロックを使って1つの gzip ストリームにする"""
+    blocks = []
+    pending = []
+    crc = 0
+    size = 0
+    for part in parts:
+        raw = part.raw if isinstance(part, RawJSON) else part
+        crc = zlib.crc32(raw, crc)
+        size += len(raw)
+        block = part.deflate_block if isinstance(part, RawJSON) else None
+        if block is None:
+            pending.append(raw)
+            continue
+        if pending:
+            blocks.append(deflate_block(b''.join(pending), COMPRESSION_LEVEL))
+            pending = []
+        blocks.append(block)
+    if pending:
+        blocks.append(deflate_block(b''.join(pending), COMPRESSION_LEVEL))
+    return _GZIP_HEADER + b''.join(blocks) + _FINAL_BLOCK + struct.pack('<II', crc, size & 0xffffffff)
+
+
+def accepted_encodings(header):
+    """Accept-Encoding から受け入れ可能な形式の集合を返す（q=0 は除く、* は全形式）"""
+    accepted = set()
+    refused = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        (accepted if quality > 0 else refused).add(coding)
+    if '*' in accepted:
+        accepted.update(set(available_encodings()) - refused)
+    return accepted - refused
+
+
+class CompressionMiddleware:
+    """Accept-Encoding に応じてレスポンスを圧縮するミドルウェア（圧縮済みの表現があれば使う。同期・非同期の両対応）"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUIZ_COMPRESSION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.min_bytes = settings.QUIZ_COMPRESSION_MIN_BYTES
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if (
+            response.streaming
+            or not request.path_info.startswith(API_PATH_PREFIX)
+            or response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES)
+            or len(response.content) < self.min_bytes
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encodings = [encoding for encoding in available_encodings() if encoding in accepted]
+        if encodings:
+            body, encoding = self.encode(response, encodings)
+            if len(body) < len(response.content):
+                self.apply(response, body, encoding)
+        return response
+
+    def rendered_parts(self, response):
+        """レンダラーが残した本文の並び（レンダラーを通らない・本文が変更された場合は None）"""
+        parts = getattr(response, 'json_parts', None)
+        if parts is None or sum(len(p.raw if isinstance(p, RawJSON) else p) for p in parts) != len(response.content):
+            return None
+        return parts
+
+    def encode(self, response, encodings):
+        """(圧縮後の本文, 形式) を返す（圧縮済みの表現を優先し、なければ優先順の先頭で圧縮する）"""
+        parts = self.rendered_parts(response)
+        if parts is not None:
+            if len(parts) == 1 and isinstance(parts[0], RawJSON):
+                for encoding in encodings:
+                    if encoding in parts[0].encoded:
+                        return parts[0].encoded[encoding], encoding
+            elif 'gzip' in encodings and any(isinstance(p, RawJSON) and p.deflate_block is not None for p in parts):
+                return splice_gzip(parts), 'gzip'
+        return compress(response.content, encodings[0]), encodings[0]
+
+    def apply(self, response, body, encoding):
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        response['Content-Encoding'] = encoding
+        # 圧縮後のバイト列は異なるため、ETag は弱い比較用にする（条件付きGETは弱い比較）
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
@@ -0,0 +1,72 @@
+# quiz_api/conditional.py
+"""ETag による条件付きGET
+
+ビューはクエリやシリアライズの前に、キャッシュのバージョントークンなど安価に求まる値から
+ETag を作り、If-None-Match が一致すれば本文なしの 304 を返す。
+"""
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """バージョンなどの値を連結して ETag（引用符付き）を作る"""
+    return quote_etag('-'.join(map(str, parts)))
+
+
+def _matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    etags = parse_etags(header)
+    # 弱い比較（W/ の有無は区別しない）
+    return '*' in etags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in etags}
+
+
+def set_validators(response, etag, private=False):
+    """ETag を付け、ブラウザには毎回再検証させる（private はユーザーごとの内容）"""
+    response['ETag'] = etag
+    if private:
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+class NotModified(Exception):
+    """If-None-Match が一致した（ConditionalGetMixin が 304 に変換する）"""
+
+
+class ConditionalGetMixin:
+    """get_etag() の ETag で条件付きGETに応えるビュー用のミックスイン
+
+    認証・権限・レート制限の後、ハンドラー（クエリやシリアライズ）の前に If-None-Match を比較する。
+    """
+    # ユーザーごとに内容が変わるビューは True（Cache-Control: private と Vary: Authorization）
+    etag_private = False
+
+    def get_etag(self, request):
+        """ETag を返す（None なら条件付きGETを行わない）"""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        self.etag = None
+        super().initial(request, *args, **kwargs)
+        if request.method in ('GET', 'HEAD'):
+            self.etag = self.get_etag(request)
+            if self.etag is not None and _matches(request, self.etag):
+                raise NotModified
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, 'etag', None)
+        if etag is not None and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            set_validators(response, etag, private=self.etag_private)
+        return response
@@ -0,0 +1,42 @@
+# quiz_api/content_versions.py
+"""条件付きGET用のコンテンツのバージョン
+
+キャッシュのバージョントークン（cache.py）をキー単位で使い、次の版を管理する。
+- カテゴリごとの問題・選択肢の版（'all' は全カテゴリ分）: 問題・選択肢のシグナルで更新
+- ユーザーごとの受験結果の版: 受験結果のシグナルで更新
+どちらも名前空間全体のトークン（CONTENT / ATTEMPTS）と組み合わせるため、
+シグナルを送らない一括処理（インポートやデータ生成）は名前空間ごと無効化すればよい。
+リーダーボードの版は既存の LEADERBOARD のトークンをそのまま使う。
+"""
+from . import cache as quiz_cache
+
+
+def _scoped(namespace, scope):
+    return f'{namespace}:{scope}'
+
+
+def _version(namespace, scope):
+    return '.'.join([quiz_cache.get_version(namespace), quiz_cache.get_version(_scoped(namespace, scope))])
+
+
+def content_version(category_id=None):
+    """カテゴリの問題・選択肢の版（None は全カテゴリ）"""
+    return _version(quiz_cache.CONTENT, 'all' if category_id is None else category_id)
+
+
+def bump_content_version(category_id=None):
+    """カテゴリと全カテゴリ分の版を更新する（None なら全カテゴリの版をまとめて更新）"""
+    if category_id is None:
+        quiz_cache.invalidate(quiz_cache.CONTENT)
+    else:
+        quiz_cache.invalidate(_scoped(quiz_cache.CONTENT, category_id), _scoped(quiz_cache.CONTENT, 'all'))
+
+
+def attempts_version(user_id):
+    """ユーザーの受験結果の版"""
+    return _version(quiz_cache.ATTEMPTS, user_id)
+
+
+def bump_attempts_version(user_id):
+    """ユーザーの受験結果の版を更新する"""
+    quiz_cache.invalidate(_scoped(quiz_cache.ATTEMPTS, user_id))
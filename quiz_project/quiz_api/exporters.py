@@ -0,0 +1,67 @@
+# quiz_api/exporters.py
+"""CSVのストリーミングレスポンス
+
+行のイテレーターを CSV に変換しながら StreamingHttpResponse で送り出す。
+バッファは BUFFER_SIZE ごとに送信するため、件数に関係なく使用メモリは一定で、
+最初のバイト（BOM）はすぐにクライアントへ届く。
+"""
+import codecs
+import csv
+import zlib
+
+from django.http import StreamingHttpResponse
+
+BUFFER_SIZE = 64 * 1024
+
+
+class _Echo:
+    """csv.writer の出力をそのまま返す疑似ファイル"""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv_bytes(rows, buffer_size=BUFFER_SIZE):
+    """行のイテレーターを UTF-8（BOM付き）の CSV バイト列に変換する"""
+    # BOMを追加してExcelで正しく開けるようにする
+    yield codecs.BOM_UTF8
+    writer = csv.writer(_Echo())
+    buffer = []
+    size = 0
+    for row in rows:
+        line = writer.writerow(row).encode('utf-8')
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzip(chunks, level=6):
+    """バイト列のイテレーターを gzip 形式に圧縮しながら返す"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if first:
+            # 先頭はすぐに送り出す（以降は圧縮器のバッファに任せる）
+            compressed += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def streaming_csv_response(rows, filename, compress=False):
+    """行のイテレーターをCSVファイルとしてストリーミングで返す（compress=True で .csv.gz）"""
+    chunks = iter_csv_bytes(rows)
+    if compress:
+        response = StreamingHttpResponse(iter_gzip(chunks), content_type='application/gzip')
+        filename = f'{filename}.gz'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,68 @@
+# quiz_api/fast_json.py
+"""orjson を使う JSON レンダラーとパーサー（QUIZ_FAST_JSON=True の場合に REST_FRAMEWORK へ設定）
+
+出力は QuizJSONRenderer（DRF の JSONRenderer）とバイト単位で同じになるようにしている。
+日時・Decimal・遅延文字列などは JSONRenderer と同じ encoder_class に任せ、
+インデント指定時（Browsable API）・ensure_ascii・非コンパクトの設定や、
+orjson が扱えない値（64ビットを超える整数など）は JSONRenderer にフォールバックする。
+ただし NaN / Infinity はエラーにならず null になり、1e16 以上や 1e-4 未満の浮動小数点数は
+指数の表記（1e16 と 1e+16）が異なる（このAPIの出力には含まれない）。
+"""
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from .renderers import QuizJSONRenderer
+
+# 日時・dataclass は encoder_class の default() で JSONRenderer と同じ形式にする
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class QuizORJSONRenderer(QuizJSONRenderer):
+    """orjson でエンコードする QuizJSONRenderer"""
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().encode(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().encode(data, accepted_media_type, renderer_context)
+        # JSONRenderer と同じく、JavaScript の文字列に入れられない U+2028 / U+2029 をエスケープする
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class QuizORJSONParser(JSONParser):
+    """orjson で解析する JSONParser（解析できない入力は同じエラーになるよう JSONParser に任せる）"""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if encoding.lower().replace('_', '-') not in ('utf-8', 'utf8'):
+            return super().parse(stream, media_type, parser_context)
+        data = stream.read()
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN（strict=False の場合）や64ビットを超える整数、エラーメッセージは JSONParser と揃える
+            return super().parse(io.BytesIO(data), media_type, parser_context)
+
+
+def with_fast_json(rest_framework):
+    """REST_FRAMEWORK の設定を orjson のレンダラー・パーサーに差し替えたコピーを返す（計測・テスト用）"""
+    renderers = list(rest_framework.get('DEFAULT_RENDERER_CLASSES', ['quiz_api.renderers.QuizJSONRenderer']))
+    renderers[0] = 'quiz_api.fast_json.QuizORJSONRenderer'
+    return {
+        **rest_framework,
+        'DEFAULT_RENDERER_CLASSES': renderers,
+        'DEFAULT_PARSER_CLASSES': [
+            'quiz_api.fast_json.QuizORJSONParser',
+            'rest_framework.parsers.FormParser',
+            'rest_framework.parsers.MultiPartParser',
+        ],
+    }
@@ -0,0 +1,121 @@
+# quiz_api/import_jobs.py
+"""DBをキューとして使う一括インポートのジョブ管理
+
+管理画面は enqueue_import() でジョブを登録するだけで、実際の取り込みは
+run_import_worker コマンドのプロセスが claim_next_job() / run_job() で行う。
+ジョブの取得は「待機中なら実行中にする」条件付き UPDATE で行うため、
+SELECT ... FOR UPDATE SKIP LOCKED のない SQLite でも複数ワーカーが同じジョブを重複して処理しない。
+"""
+import logging
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from .importers import DEFAULT_CHUNK_SIZE, QuizImportError, import_csv, import_questions
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# ジョブに保存する行エラーの上限
+MAX_JOB_ERRORS = 1000
+
+
+def enqueue_import(format_type, uploaded_file=None, text=None, category=None, user=None):
+    """インポートジョブを登録する（ファイルかテキストのどちらかを渡す）"""
+    if uploaded_file is None:
+        uploaded_file = ContentFile(text.encode('utf-8'), name=f'{format_type}.txt')
+    return ImportJob.objects.create(
+        format=format_type,
+        source=uploaded_file,
+        original_name=getattr(uploaded_file, 'name', '') or '',
+        category=category,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def claim_next_job(worker):
+    """待機中の最も古いジョブを実行中にして返す（なければ None）"""
+    pending = ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).order_by('created_at', 'id')
+    for job_id in pending.values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_PENDING).update(
+            status=ImportJob.STATUS_RUNNING, worker=worker, started_at=now, heartbeat_at=now,
+        )
+        if claimed:
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def fail_stale_jobs(stale_after):
+    """一定時間進捗のない実行中ジョブを失敗にする（ワーカーの異常終了対策）
+
+    途中までの取り込みはコミット済みのため自動では再実行せず、管理画面から再実行する。
+    """
+    threshold = timezone.now() - timedelta(seconds=stale_after)
+    return ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING, heartbeat_at__lt=threshold).update(
+        status=ImportJob.STATUS_FAILED,
+        message='ワーカーからの応答がなくなったため中断しました',
+        finished_at=timezone.now(),
+    )
+
+
+def _save_progress(job, result, **extra):
+    ImportJob.objects.filter(id=job.id).update(
+        progress=result.progress,
+        processed_rows=result.total_rows,
+        created_count=result.created_questions,
+        updated_count=result.updated_questions,
+        error_count=result.error_count,
+        errors=result.duplicate_warnings + result.errors,
+        heartbeat_at=timezone.now(),
+        **extra,
+    )
+
+
+def run_job(job, chunk_size=DEFAULT_CHUNK_SIZE):
+    """取得済みのジョブを実行し、結果をジョブに書き戻す"""
+    def progress(result):
+        _save_progress(job, result)
+
+    try:
+        with job.source.open('rb') as stream:
+            if job.format == ImportJob.FORMAT_CSV:
+                result = import_csv(
+                    stream, chunk_size=chunk_size, progress=progress,
+                    total_bytes=job.source.size, max_errors=MAX_JOB_ERRORS,
+                )
+            else:
+                if job.category_id is None:
+                    raise QuizImportError('追加先のカテゴリーが指定されていません')
+                data = stream.read().decode('utf-8')
+                result = import_questions(
+                    job.category_id, data, job.format, chunk_size=chunk_size,
+                    progress=progress, max_errors=MAX_JOB_ERRORS,
+                )
+    except Exception as e:
+        if isinstance(e, QuizImportError):
+            logger.warning("インポートジョブ %s が失敗しました: %s", job.id, e)
+        else:
+            logger.exception("インポートジョブ %s が失敗しました", job.id)
+        ImportJob.objects.filter(id=job.id).update(
+            status=ImportJob.STATUS_FAILED, message=str(e), finished_at=timezone.now(),
+        )
+    else:
+        _save_progress(
+            job, result,
+            status=ImportJob.STATUS_SUCCEEDED,
+            message=f"{result.imported}問をインポートしました（総処理数: {result.total_rows}）",
+            finished_at=timezone.now(),
+        )
+    job.refresh_from_db()
+    return job
+
+
+def retry_jobs(queryset):
+    """終了したジョブを待機中に戻す"""
+    return queryset.exclude(status=ImportJob.STATUS_RUNNING).update(
+        status=ImportJob.STATUS_PENDING, progress=0.0, processed_rows=0, created_count=0,
+        updated_count=0, error_count=0, errors=[], message='', worker='',
+        started_at=None, heartbeat_at=None, finished_at=None,
+    )
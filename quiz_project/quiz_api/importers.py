@@ -0,0 +1,454 @@
+# quiz_api/importers.py
+"""統一CSV形式（カテゴリー,質問,選択肢1〜6,正解番号）のストリーミングインポート
+と、問題一括追加フォーム（テキスト / JSON / YAML）のインポート
+
+ファイルは先頭部分だけで文字コードと区切り文字を判定し、以降は少しずつ
+デコードしながら行を読み進める。行は chunk_size 件ごとにまとめ、
+チャンクごとにカテゴリーと既存の質問を1回ずつ問い合わせて bulk_create で保存する。
+保持するのは1チャンク分の行と件数の上限付きのエラー・警告だけなので、
+使用メモリはファイルサイズに依存しない。
+"""
+import codecs
+import csv
+import io
+import json
+import logging
+from collections import defaultdict
+
+from django.db import DatabaseError, transaction
+from django.db.models import Max
+
+from . import cache as quiz_cache
+from .models import Category, Choice, Question
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 2000
+READ_SIZE = 64 * 1024
+MAX_CHOICES = 6
+MAX_REPORTED_ERRORS = 50
+# 再インポートで上書きする選択肢を1回の UPDATE にまとめる件数
+UPDATE_BATCH_SIZE = 500
+
+ENCODINGS = ('utf-8', 'shift_jis', 'cp932', 'iso-2022-jp')
+DELIMITERS = (',', ';', '\t')
+MIN_COLUMNS = 5
+
+
+class QuizImportError(Exception):
+    """ファイル全体を読み込めない場合のエラー"""
+
+
+class ImportResult:
+    """インポートの集計結果（エラーと警告は先頭の max_errors 件のみ保持）"""
+
+    def __init__(self, encoding='', delimiter=',', row_label='行', max_errors=MAX_REPORTED_ERRORS):
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.row_label = row_label
+        self.max_errors = max_errors
+        self.total_rows = 0
+        self.progress = 0.0
+        self.imported = 0
+        self.created_questions = 0
+        self.updated_questions = 0
+        self.created_categories = 0
+        self.error_count = 0
+        self.errors = []
+        self.duplicate_count = 0
+        self.duplicate_warnings = []
+
+    def add_error(self, row_num, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"{self.row_label}{row_num}: {message}")
+
+    def add_duplicate(self, row_num, question_text):
+        self.duplicate_count += 1
+        if len(self.duplicate_warnings) < self.max_errors:
+            self.duplicate_warnings.append(f"{self.row_label}{row_num}: 重複する質問があります - {question_text}")
+
+
+def detect_format(sample):
+    """先頭のバイト列から (文字コード, 区切り文字) を判定する"""
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = 'utf-8-sig'
+    else:
+        encoding = None
+        for candidate in ENCODINGS:
+            try:
+                # 末尾で途切れたマルチバイト文字は許容する
+                codecs.getincrementaldecoder(candidate)().decode(sample, final=False)
+            except UnicodeDecodeError:
+                continue
+            encoding = candidate
+            break
+        if encoding is None:
+            raise QuizImportError('ファイルの文字コードを判定できませんでした（UTF-8 / Shift_JIS に対応）')
+
+    text = codecs.getincrementaldecoder(encoding)(errors='ignore').decode(sample, final=False)
+    header = io.StringIO(text, newline='').readline()
+    for delimiter in DELIMITERS:
+        if len(next(csv.reader([header], delimiter=delimiter), [])) >= MIN_COLUMNS:
+            return encoding, delimiter
+    return encoding, ','
+
+
+def iter_lines(stream, encoding, read_size=READ_SIZE):
+    """バイナリストリームを少しずつデコードし、改行を保ったまま1行ずつ返す"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ''
+    while True:
+        data = stream.read(read_size)
+        pending += decoder.decode(data, final=not data)
+        lines = io.StringIO(pending, newline='').readlines()
+        # 最後の行は次の読み込みで続きがある可能性があるため持ち越す（\r\n の分断も含む）
+        pending = lines.pop() if data and lines else ''
+        yield from lines
+        if not data:
+            return
+
+
+def open_rows(stream, max_errors=MAX_REPORTED_ERRORS):
+    """アップロードファイルを (ImportResult, 行dictのイテレーター) に変換する"""
+    sample = stream.read(READ_SIZE)
+    encoding, delimiter = detect_format(sample)
+    stream.seek(0)
+    result = ImportResult(encoding, delimiter, max_errors=max_errors)
+    if encoding == 'utf-8-sig':
+        stream.read(len(codecs.BOM_UTF8))
+        encoding = 'utf-8'
+    return result, csv.DictReader(iter_lines(stream, encoding), delimiter=delimiter)
+
+
+def parse_row(row):
+    """CSVの1行を (カテゴリー名, 質問文, 選択肢リスト, 正解番号) に変換する（不正な行は ValueError）"""
+    category_name = (row.get('カテゴリー') or '').strip()
+    question_text = (row.get('質問') or '').strip()
+    if not category_name or not question_text:
+        raise ValueError("カテゴリーと質問は必須です")
+    if len(category_name) > Category._meta.get_field('name').max_length:
+        raise ValueError("カテゴリー名が長すぎます")
+    if len(question_text) > Question._meta.get_field('text').max_length:
+        raise ValueError("質問文が長すぎます")
+
+    choices = []
+    for i in range(1, MAX_CHOICES + 1):
+        choice_text = (row.get(f'選択肢{i}') or '').strip()
+        if choice_text:
+            if len(choice_text) > Choice._meta.get_field('text').max_length:
+                raise ValueError(f"選択肢{i}が長すぎます")
+            choices.append(choice_text)
+
+    try:
+        correct_num = int(row.get('正解番号') or '')
+    except ValueError:
+        raise ValueError("正解番号は1以上の数字で入力してください")
+    if correct_num < 1 or correct_num > len(choices):
+        raise ValueError(f"正解番号が無効です: {correct_num}")
+    return category_name, question_text, choices, correct_num
+
+
+def _import_chunk(chunk, result, first_new_question_id):
+    """検証済みの行（[(行番号, 解析結果)]）を1トランザクションで保存する"""
+    # 同じチャンク内の重複は後の行を優先する（既存の質問を上書きするのと同じ扱い）
+    rows = {}
+    for row_num, (category_name, question_text, choices, correct_num) in chunk:
+        if (category_name, question_text) in rows:
+            result.add_duplicate(row_num, question_text)
+        rows[(category_name, question_text)] = (row_num, choices, correct_num)
+
+    with transaction.atomic():
+        # カテゴリー: 1回の問い合わせで解決し、足りない分だけ作成する（同名が複数あれば最小ID）
+        names = {category_name for category_name, _ in rows}
+        categories = dict(
+            Category.objects.filter(name__in=names).order_by('-id').values_list('name', 'id')
+        )
+        missing = [Category(name=name) for name in sorted(names - categories.keys())]
+        for category in Category.objects.bulk_create(missing):
+            categories[category.name] = category.id
+        result.created_categories += len(missing)
+
+        # 既存の質問: 1回の問い合わせで (カテゴリーID, 質問文) を解決する
+        texts = {question_text for _, question_text in rows}
+        existing = {
+            (category_id, text): question_id
+            for question_id, category_id, text in Question.objects.filter(
+                category_id__in=set(categories.values()), text__in=texts,
+            ).order_by('-id').values_list('id', 'category_id', 'text')
+        }
+
+        question_ids = {}
+        new_questions = []
+        for (category_name, question_text), (row_num, _, _) in rows.items():
+            key = (categories[category_name], question_text)
+            question_id = existing.get(key)
+            if question_id is None:
+                new_questions.append(Question(category_id=key[0], text=question_text))
+                continue
+            if question_id >= first_new_question_id:
+                # このインポートの前のチャンクで作成済み（CSV内の重複）
+                result.add_duplicate(row_num, question_text)
+            question_ids[key] = question_id
+        for question in Question.objects.bulk_create(new_questions):
+            question_ids[(question.category_id, question.text)] = question.id
+
+        # 再インポートされた質問の選択肢は、既存の選択肢を ID 順に上書きして ID を保つ
+        # （回答履歴が参照する選択肢を残す）。足りない分は追加し、余った選択肢だけを削除する
+        current_choices = defaultdict(list)
+        if existing:
+            reimported = [question_id for key, question_id in question_ids.items() if key in existing]
+            for choice in Choice.objects.filter(question_id__in=reimported).order_by('id').only('id', 'question_id'):
+                current_choices[choice.question_id].append(choice)
+
+        updated_choices = []
+        new_choices = []
+        surplus_choice_ids = []
+        for (category_name, question_text), (_, choices, correct_num) in rows.items():
+            question_id = question_ids[(categories[category_name], question_text)]
+            current = current_choices.get(question_id, [])
+            for i, choice_text in enumerate(choices, 1):
+                if i <= len(current):
+                    choice = current[i - 1]
+                    choice.text = choice_text
+                    choice.is_correct = (i == correct_num)
+                    updated_choices.append(choice)
+                else:
+                    new_choices.append(Choice(question_id=question_id, text=choice_text, is_correct=(i == correct_num)))
+            surplus_choice_ids.extend(choice.id for choice in current[len(choices):])
+
+        Choice.objects.bulk_update(updated_choices, ['text', 'is_correct'], batch_size=UPDATE_BATCH_SIZE)
+        Choice.objects.bulk_create(new_choices)
+        if surplus_choice_ids:
+            # 選択肢が減った場合のみ。その選択肢を選んだ回答履歴も CASCADE で削除される
+            Choice.objects.filter(id__in=surplus_choice_ids).delete()
+
+        # bulk_create はシグナルを送らないため、キャッシュを明示的に無効化する
+        quiz_cache.invalidate(
+            quiz_cache.CATEGORIES, quiz_cache.QUESTION_POOL,
+            quiz_cache.ANSWER_KEYS, quiz_cache.QUESTION_JSON, quiz_cache.STATS, quiz_cache.CONTENT,
+        )
+
+    updated = len(rows) - len(new_questions)
+    result.created_questions += len(new_questions)
+    result.updated_questions += updated
+    result.imported += len(chunk)
+
+
+def import_csv(stream, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, total_bytes=None,
+               max_errors=MAX_REPORTED_ERRORS):
+    """統一CSV形式のファイルをインポートして ImportResult を返す
+
+    progress を渡すと、チャンクを保存するたびに progress(result) を呼び出す。
+    total_bytes（ファイルサイズ）を渡すと、読み込み位置から result.progress を更新する。
+    保存はチャンク単位でコミットされるため、途中で失敗しても前のチャンクは残る。
+    """
+    result, reader = open_rows(stream, max_errors=max_errors)
+    first_new_question_id = (Question.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+    chunk = []
+
+    def flush():
+        if not chunk:
+            return
+        try:
+            _import_chunk(chunk, result, first_new_question_id)
+        except DatabaseError as e:
+            logger.exception("CSVインポートのチャンク保存に失敗しました")
+            for row_num, _ in chunk:
+                result.add_error(row_num, f"保存に失敗しました: {e}")
+        logger.debug(
+            "CSVインポート: %d行処理（作成 %d / 更新 %d / エラー %d）",
+            result.total_rows, result.created_questions, result.updated_questions, result.error_count,
+        )
+        chunk.clear()
+        if total_bytes:
+            result.progress = min(stream.tell() / total_bytes, 1.0)
+        if progress is not None:
+            progress(result)
+
+    try:
+        for row_num, row in enumerate(reader, 1):
+            result.total_rows = row_num
+            try:
+                chunk.append((row_num, parse_row(row)))
+            except ValueError as e:
+                result.add_error(row_num, str(e))
+            if len(chunk) >= chunk_size:
+                flush()
+    except UnicodeDecodeError:
+        # 先頭部分で判定した文字コードでは読めない文字が途中にあった
+        result.add_error(result.total_rows + 1, f"文字コード（{result.encoding}）として読み込めない文字があるため中断しました")
+    except csv.Error as e:
+        result.add_error(result.total_rows + 1, f"CSVの解析に失敗したため中断しました: {e}")
+    flush()
+    result.progress = 1.0
+    return result
+
+
+def preview_csv(stream, limit=10):
+    """先頭 limit 行の検証結果と総行数を返す（DBには書き込まない）"""
+    result, reader = open_rows(stream)
+    preview_data = []
+    try:
+        for row_num, row in enumerate(reader, 1):
+            result.total_rows = row_num
+            if row_num <= limit:
+                preview_data.append(_preview_row(row_num, row, result))
+    except UnicodeDecodeError:
+        result.add_error(result.total_rows + 1, f"文字コード（{result.encoding}）として読み込めない文字があります")
+    except csv.Error as e:
+        result.add_error(result.total_rows + 1, f"CSVの解析に失敗しました: {e}")
+    return result, preview_data
+
+
+def _preview_row(row_num, row, result):
+    """プレビュー表示用に1行を検証する"""
+    item = {
+        'row_num': row_num,
+        'category': row.get('カテゴリー') or '',
+        'question': row.get('質問') or '',
+        'choices': [],
+        'correct_answer': row.get('正解番号') or '',
+        'status': 'OK',
+    }
+    try:
+        item['choices'] = parse_row(row)[2]
+    except ValueError as e:
+        result.add_error(row_num, str(e))
+        item['status'] = f'エラー: {e}'
+    return item
+
+
+# 問題一括追加フォームの形式
+FORMAT_BULK = 'bulk'
+FORMAT_SIMPLE = 'simple'
+FORMAT_JSON = 'json'
+FORMAT_YAML = 'yaml'
+
+
+def _parse_bulk_blocks(data):
+    """一括追加フォームの形式（問題文 + 選択肢4行、正解に * を付ける）"""
+    blocks = [q.strip() for q in data.split('\n\n') if q.strip()]
+    for i, block in enumerate(blocks, 1):
+        lines = block.strip().split('\n')
+        if len(lines) < 5:
+            yield i, ValueError("問題文と4つの選択肢が必要です")
+            continue
+        choices = []
+        for line in lines[1:5]:
+            choice_text = line.strip()
+            is_correct = choice_text.endswith('*')
+            if is_correct:
+                choice_text = choice_text[:-1].strip()
+            choices.append((choice_text, is_correct))
+        yield i, (lines[0].strip(), choices)
+
+
+def _parse_simple_blocks(data):
+    """シンプル形式（問題文 + 選択肢2行以上、正解1つに * を付ける）"""
+    blocks = [q.strip() for q in data.split('\n\n') if q.strip()]
+    for i, block in enumerate(blocks, 1):
+        lines = [line.strip() for line in block.strip().split('\n') if line.strip()]
+        if len(lines) < 3:  # 問題文 + 最低2つの選択肢
+            yield i, ValueError("問題文と最低2つの選択肢が必要です")
+            continue
+        choices = [
+            (line[:-1].strip(), True) if line.endswith('*') else (line, False)
+            for line in lines[1:]
+        ]
+        correct_count = sum(is_correct for _, is_correct in choices)
+        if correct_count > 1:
+            yield i, ValueError("複数の正解が指定されています")
+        elif correct_count == 0:
+            yield i, ValueError("正解が指定されていません（*を付けてください）")
+        else:
+            yield i, (lines[0], choices)
+
+
+def _parse_question_list(questions_list):
+    """JSON / YAML 形式（[{"question": ..., "choices": [{"text": ..., "correct": true}]}]）"""
+    for i, q_data in enumerate(questions_list, 1):
+        try:
+            question_text = q_data.get('question', '').strip()
+            choices_data = q_data.get('choices', [])
+            if not question_text:
+                raise ValueError("問題文が空です")
+            if len(choices_data) < 2:
+                raise ValueError("最低2つの選択肢が必要です")
+            if sum(1 for c in choices_data if c.get('correct', False)) != 1:
+                raise ValueError("正解は1つだけ指定してください")
+            choices = [(c.get('text', ''), bool(c.get('correct', False))) for c in choices_data]
+        except (AttributeError, TypeError, ValueError) as e:
+            yield i, ValueError(str(e))
+            continue
+        yield i, (question_text, choices)
+
+
+def parse_question_data(data, format_type):
+    """一括追加フォームの入力を [(番号, (質問文, [(選択肢, 正解)]) または ValueError)] に変換する"""
+    if format_type == FORMAT_BULK:
+        return list(_parse_bulk_blocks(data))
+    if format_type == FORMAT_SIMPLE:
+        return list(_parse_simple_blocks(data))
+    if format_type == FORMAT_JSON:
+        try:
+            questions_list = json.loads(data)
+        except json.JSONDecodeError as e:
+            raise QuizImportError(f"JSON形式エラー: {str(e)}")
+    elif format_type == FORMAT_YAML:
+        try:
+            import yaml
+        except ImportError:
+            raise QuizImportError("YAMLライブラリがインストールされていません")
+        try:
+            questions_list = yaml.safe_load(data)
+        except yaml.YAMLError as e:
+            raise QuizImportError(f"YAML形式エラー: {str(e)}")
+    else:
+        raise QuizImportError(f"未対応の形式です: {format_type}")
+    if not isinstance(questions_list, list):
+        raise QuizImportError("問題のリストを指定してください")
+    return list(_parse_question_list(questions_list))
+
+
+def _create_questions_chunk(category_id, items):
+    """[(質問文, [(選択肢, 正解)])] をカテゴリーの新しい問題として一括作成する"""
+    with transaction.atomic():
+        questions = Question.objects.bulk_create(
+            Question(category_id=category_id, text=question_text) for question_text, _ in items
+        )
+        Choice.objects.bulk_create(
+            Choice(question_id=question.id, text=choice_text, is_correct=is_correct)
+            for question, (_, choices) in zip(questions, items)
+            for choice_text, is_correct in choices
+        )
+        # bulk_create はシグナルを送らないため、キャッシュを明示的に無効化する
+        quiz_cache.invalidate(
+            quiz_cache.QUESTION_POOL, quiz_cache.ANSWER_KEYS, quiz_cache.QUESTION_JSON, quiz_cache.STATS,
+            quiz_cache.CONTENT,
+        )
+
+
+def import_questions(category_id, data, format_type, chunk_size=DEFAULT_CHUNK_SIZE, progress=None,
+                     max_errors=MAX_REPORTED_ERRORS):
+    """一括追加フォームの入力をカテゴリーに追加して ImportResult を返す"""
+    label = '質問' if format_type in (FORMAT_JSON, FORMAT_YAML) else 'ブロック'
+    result = ImportResult(row_label=label, max_errors=max_errors)
+    parsed = parse_question_data(data, format_type)
+    chunk = []
+    for position, (number, item) in enumerate(parsed, 1):
+        result.total_rows = number
+        if isinstance(item, ValueError):
+            result.add_error(number, str(item))
+        else:
+            chunk.append(item)
+        if len(chunk) >= chunk_size or (position == len(parsed) and chunk):
+            _create_questions_chunk(category_id, chunk)
+            result.imported += len(chunk)
+            result.created_questions += len(chunk)
+            chunk = []
+            result.progress = position / len(parsed)
+            if progress is not None:
+                progress(result)
+    result.progress = 1.0
+    return result
@@ -0,0 +1,245 @@
+# quiz_api/instrumentation.py
+"""リクエストごとのSQL件数・SQL時間・シリアライザー時間・レイテンシーの計測
+
+InstrumentationMiddleware が connection.execute_wrapper でSQLを、
+install_serializer_timing() で差し替えた BaseSerializer.data でシリアライズ時間を計測し、
+URL名ごとのヒストグラムとしてプロセス単位で集計する（QuizAdminSite の quiz-metrics-api で参照）。
+遅いリクエストと、同じSQLを繰り返し実行するリクエスト（N+1 の疑い）は quiz_api のロガーに出力する。
+計測値の Server-Timing ヘッダーは内部の情報を含むため、QUIZ_SERVER_TIMING=True（DEBUG 時のデフォルト）の場合のみ付ける。
+ASGI では非同期のORMがリクエスト専用のスレッドの接続を使うため、そのスレッドで execute_wrapper を設定する。
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# ヒストグラムの上限値（最後の区間は上限なし）
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('quiz_request_metrics', default=None)
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+_serializer_timing_installed = False
+
+
+class RequestMetrics:
+    """1リクエスト分の計測値"""
+
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper から呼ばれる
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.sql_count += 1
+            self.statements[sql] += 1
+
+
+class Histogram:
+    """上限値ごとの件数"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+
+    def as_dict(self):
+        labels = [f'<={bound}' for bound in self.bounds] + [f'>{self.bounds[-1]}']
+        return dict(zip(labels, self.counts))
+
+
+class EndpointStats:
+    """URL名ごとの集計"""
+
+    def __init__(self):
+        self.requests = 0
+        self.slow_requests = 0
+        self.n_plus_one = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.serializer_ms = 0.0
+        self.latency = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = Histogram(QUERY_COUNT_BUCKETS)
+
+    def add(self, total_ms, metrics, slow, n_plus_one):
+        self.requests += 1
+        self.slow_requests += slow
+        self.n_plus_one += n_plus_one
+        self.total_ms += total_ms
+        self.max_ms = max(self.max_ms, total_ms)
+        self.sql_count += metrics.sql_count
+        self.sql_ms += metrics.sql_time * 1000
+        self.serializer_ms += metrics.serializer_time * 1000
+        self.latency.add(total_ms)
+        self.queries.add(metrics.sql_count)
+
+    def as_dict(self):
+        requests = self.requests or 1
+        return {
+            'requests': self.requests,
+            'slow_requests': self.slow_requests,
+            'n_plus_one': self.n_plus_one,
+            'avg_ms': round(self.total_ms / requests, 2),
+            'max_ms': round(self.max_ms, 2),
+            'avg_sql_count': round(self.sql_count / requests, 2),
+            'avg_sql_ms': round(self.sql_ms / requests, 2),
+            'avg_serializer_ms': round(self.serializer_ms / requests, 2),
+            'latency_ms': self.latency.as_dict(),
+            'sql_count': self.queries.as_dict(),
+        }
+
+
+def install_serializer_timing():
+    """BaseSerializer.data を計測付きに差し替える（入れ子のシリアライザーは外側でまとめて数える）"""
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    from rest_framework.serializers import BaseSerializer
+
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None:
+            return original(self)
+        metrics.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return original(self)
+        finally:
+            metrics.serializer_depth -= 1
+            if metrics.serializer_depth == 0:
+                metrics.serializer_time += time.perf_counter() - start
+
+    BaseSerializer.data = property(data)
+    _serializer_timing_installed = True
+
+
+def _endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match.route or 'unresolved'
+
+
+class InstrumentationMiddleware:
+    """リクエストを計測し、遅いリクエストと N+1 の疑いをログに出力するミドルウェア（同期・非同期の両対応）"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUIZ_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_request_ms = settings.QUIZ_SLOW_REQUEST_MS
+        self.n_plus_one_threshold = settings.QUIZ_N_PLUS_ONE_THRESHOLD
+        self.server_timing = settings.QUIZ_SERVER_TIMING
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                self.wrap_connections(stack, metrics)
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        self.record(request, response, total_ms, metrics)
+        return response
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        stack = ExitStack()
+        try:
+            await sync_to_async(self.wrap_connections)(stack, metrics)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        finally:
+            _current.reset(token)
+        total_ms = (time.perf_counter() - start) * 1000
+        self.record(request, response, total_ms, metrics)
+        return response
+
+    def wrap_connections(self, stack, metrics):
+        """このスレッドのすべてのDB接続に計測用のラッパーを設定する"""
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(metrics))
+
+    def record(self, request, response, total_ms, metrics):
+        name = _endpoint_name(request)
+        slow = total_ms >= self.slow_request_ms
+        repeated = [
+            (sql, count) for sql, count in metrics.statements.most_common(3)
+            if count >= self.n_plus_one_threshold
+        ]
+        if slow:
+            logger.warning(
+                "遅いリクエスト: %s %s (%s) %.1fms SQL %d件/%.1fms シリアライズ %.1fms",
+                request.method, request.path, name, total_ms,
+                metrics.sql_count, metrics.sql_time * 1000, metrics.serializer_time * 1000,
+            )
+        for sql, count in repeated:
+            logger.warning("N+1 の疑い: %s (%s) で同じSQLを%d回実行しました: %s", request.path, name, count, sql[:200])
+
+        with _endpoints_lock:
+            _endpoints.setdefault(name, EndpointStats()).add(total_ms, metrics, slow, bool(repeated))
+
+        if not self.server_timing:
+            return
+        response['Server-Timing'] = (
+            f'db;dur={metrics.sql_time * 1000:.1f};desc="{metrics.sql_count} queries", '
+            f'serialize;dur={metrics.serializer_time * 1000:.1f}, '
+            f'total;dur={total_ms:.1f}'
+        )
+
+
+def get_request_metrics():
+    """このプロセスのURL名ごとの集計を返す"""
+    with _endpoints_lock:
+        endpoints = {name: stats.as_dict() for name, stats in sorted(_endpoints.items())}
+    return {
+        'pid': os.getpid(),
+        'slow_request_ms': settings.QUIZ_SLOW_REQUEST_MS,
+        'n_plus_one_threshold': settings.QUIZ_N_PLUS_ONE_THRESHOLD,
+        'endpoints': endpoints,
+    }
+
+
+def reset_request_metrics():
+    """集計をリセットする"""
+    with _endpoints_lock:
+        _endpoints.clear()
@@ -0,0 +1,232 @@
+# quiz_api/management/commands/benchmark_api.py
+import json
+import platform
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.throttling import SimpleRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from quiz_api import cache as quiz_cache
+from quiz_api.models import Category, Choice, Question, QuestionResponse, QuizAttempt
+from quiz_api.recent_questions import reset_recent_questions
+
+REPORT_VERSION = 1
+
+
+class Command(BaseCommand):
+    help = (
+        'generate_quiz_data で作成したデータで主要APIの応答時間とクエリ数を計測し、'
+        'JSONレポートを出力します（保存系のリクエストは最後にロールバック）'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='generate_quiz_data の接頭辞（デフォルト: bench）')
+        parser.add_argument('--requests', type=int, default=30, help='1エンドポイントあたりの計測回数（デフォルト: 30）')
+        parser.add_argument('--warmup', type=int, default=3, help='計測前に捨てるリクエスト数（デフォルト: 3）')
+        parser.add_argument('--only', nargs='+', help='計測するシナリオ名（デフォルト: すべて）')
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='各リクエストの前にキャッシュを空にする（キャッシュなしの経路を計測する）',
+        )
+        parser.add_argument(
+            '--json', choices=['default', 'orjson'], default='default',
+            help='JSONのレンダラー・パーサー（orjson は quiz_api.fast_json を使う。デフォルト: 設定どおり）',
+        )
+        parser.add_argument('--output', help='JSONレポートの出力先')
+        parser.add_argument('--compare', help='比較する過去のJSONレポート')
+        parser.add_argument(
+            '--max-regression', type=float,
+            help='比較時に中央値がこの割合（%%）を超えて遅くなるか、クエリ数が増えたらエラーにする',
+        )
+
+    def handle(self, *args, **options):
+        category = Category.objects.filter(name__startswith=f"{options['prefix']} ").order_by('id').first()
+        user = (
+            User.objects.filter(username__startswith=f"{options['prefix']}_user", quiz_attempts__isnull=False)
+            .order_by('id').first()
+        )
+        if category is None or user is None:
+            raise CommandError('計測用のデータがありません。先に generate_quiz_data を実行してください')
+
+        scenarios = self.get_scenarios(category, user)
+        if options['only']:
+            unknown = set(options['only']) - {name for name, *_ in scenarios}
+            if unknown:
+                raise CommandError(f"不明なシナリオです: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario[0] in options['only']]
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        throttle_key = SimpleRateThrottle.cache_format % {'scope': 'user', 'ident': user.pk}
+        results = {}
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(override_settings(ALLOWED_HOSTS=['*']))
+                if options['json'] == 'orjson':
+                    from quiz_api.fast_json import with_fast_json
+
+                    stack.enter_context(override_settings(REST_FRAMEWORK=with_fast_json(settings.REST_FRAMEWORK)))
+                stack.enter_context(transaction.atomic())
+                for name, method, path, body in scenarios:
+                    results[name] = self.run_scenario(client, method, path, body, throttle_key, options)
+                    self.stdout.write(self.format_result(name, results[name]))
+                transaction.set_rollback(True)
+        finally:
+            # ロールバックした保存結果がキャッシュに残らないようにする
+            quiz_cache.invalidate(quiz_cache.LEADERBOARD, quiz_cache.STATS)
+            reset_recent_questions(user.pk)
+            cache.delete(throttle_key)
+
+        report = self.build_report(results, options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"レポートを {options['output']} に出力しました"))
+        if options['compare']:
+            self.compare(report, options['compare'], options['max_regression'])
+
+    def get_scenarios(self, category, user):
+        """[(名前, メソッド, パス, 本文)]"""
+        correct = list(
+            Choice.objects.filter(question__category=category, is_correct=True)
+            .order_by('question_id').values_list('question_id', 'id')[:10]
+        )
+        save_body = {
+            'category_id': category.id,
+            'total_questions': len(correct),
+            'responses': [
+                {'question_id': question_id, 'selected_choice_id': choice_id}
+                for question_id, choice_id in correct
+            ],
+        }
+        c = category.id
+        return [
+            ('categories', 'get', '/api/categories/', None),
+            ('question_list', 'get', f'/api/questions/?category={c}&limit=10', None),
+            ('random_questions', 'get', f'/api/questions/random_questions/?category={c}&limit=10', None),
+            ('unique_random', 'get', f'/api/questions/unique_random/?category={c}&limit=10', None),
+            ('quiz_session', 'get', f'/api/questions/quiz_session/?category={c}&count=10', None),
+            ('save_result', 'post', '/api/quiz/save-result/', save_body),
+            ('history', 'get', '/api/quiz/history/?summary=true', None),
+            ('history_full', 'get', '/api/quiz/history/', None),
+            ('leaderboard_public', 'get', '/api/quiz/leaderboard/', None),
+            ('leaderboard', 'get', '/api/quiz/leaderboard/authenticated/', None),
+            ('leaderboard_cursor', 'get', '/api/quiz/leaderboard/authenticated/?pagination=cursor', None),
+            ('user_stats', 'get', '/api/user/stats/', None),
+        ]
+
+    def run_scenario(self, client, method, path, body, throttle_key, options):
+        def request():
+            # レート制限の履歴は計測に含めずに消す
+            cache.delete(throttle_key)
+            if options['cold']:
+                cache.clear()
+            started = time.perf_counter()
+            if body is None:
+                response = getattr(client, method)(path)
+            else:
+                response = getattr(client, method)(path, body, content_type='application/json')
+            elapsed = (time.perf_counter() - started) * 1000
+            return response, elapsed
+
+        for _ in range(options['warmup']):
+            request()
+        # クエリログは次のリクエストの開始時に消えるため、件数はすぐに取り出す
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response, _ = request()
+        query_count = len(queries.captured_queries)
+        if response.status_code >= 400:
+            self.stderr.write(f'{method.upper()} {path} が {response.status_code} を返しました')
+
+        timings = sorted(request()[1] for _ in range(options['requests']))
+        return {
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'queries': query_count,
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'min_ms': round(timings[0], 3),
+            'max_ms': round(timings[-1], 3),
+        }
+
+    def format_result(self, name, result):
+        return (
+            f"{name:<20} {result['status']:>4} {result['queries']:>4}q "
+            f"median {result['median_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms"
+        )
+
+    def build_report(self, results, options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'version': REPORT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'commit': commit,
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+            },
+            'options': {
+                'prefix': options['prefix'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'cold': options['cold'],
+                'json': options['json'],
+            },
+            'dataset': {
+                'categories': Category.objects.count(),
+                'questions': Question.objects.count(),
+                'choices': Choice.objects.count(),
+                'users': User.objects.count(),
+                'attempts': QuizAttempt.objects.count(),
+                'responses': QuestionResponse.objects.count(),
+            },
+            'results': results,
+        }
+
+    def compare(self, report, path, max_regression):
+        try:
+            with open(path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'比較するレポートを読み込めません: {e}')
+
+        regressions = []
+        self.stdout.write(f"\n{'scenario':<20} {'median_ms':>20} {'change':>8} {'queries':>10}")
+        for name, result in report['results'].items():
+            before = baseline.get('results', {}).get(name)
+            if before is None:
+                continue
+            change = (result['median_ms'] - before['median_ms']) / before['median_ms'] * 100 if before['median_ms'] else 0.0
+            self.stdout.write(
+                f"{name:<20} {before['median_ms']:>9.2f} → {result['median_ms']:>8.2f} {change:>+7.1f}% "
+                f"{before['queries']:>4} → {result['queries']:<4}"
+            )
+            if max_regression is not None:
+                if change > max_regression:
+                    regressions.append(f'{name}: 中央値 {change:+.1f}%')
+                if result['queries'] > before['queries']:
+                    regressions.append(f"{name}: クエリ数 {before['queries']} → {result['queries']}")
+        if regressions:
+            raise CommandError('性能が低下しました: ' + '、'.join(regressions))
@@ -0,0 +1,247 @@
+# quiz_api/management/commands/benchmark_concurrency.py
+import asyncio
+import io
+import json
+import math
+import platform
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.throttling import SimpleRateThrottle, UserRateThrottle
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from quiz_api.models import Category, QuizSession
+
+REPORT_VERSION = 1
+SERVER_NAME = 'benchmark'
+
+# 計測するデプロイ: 名前 → ROOT_URLCONF（WSGI は同期ビュー、ASGI は QUIZ_ASYNC_VIEWS=True と同じ非同期ビュー）
+TARGETS = {
+    'wsgi': 'quiz_project.urls',
+    'asgi': 'quiz_api.async_urls',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'generate_quiz_data で作成したデータで、出題系APIと公開リーダーボードに同時接続数を変えてリクエストを送り、'
+        'WSGI（同期ビュー）と ASGI（非同期ビュー）のスループットとレイテンシーを比較します'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='bench', help='generate_quiz_data の接頭辞（デフォルト: bench）')
+        parser.add_argument(
+            '--concurrency', type=int, nargs='+', default=[1, 10, 50],
+            help='同時接続数（複数指定可。デフォルト: 1 10 50）',
+        )
+        parser.add_argument('--requests', type=int, default=20, help='1接続あたりのリクエスト数（デフォルト: 20）')
+        parser.add_argument(
+            '--workers', type=int, default=3,
+            help='WSGI で同時に処理するリクエスト数（gunicorn の sync ワーカー数。デフォルト: 3）',
+        )
+        parser.add_argument('--only', nargs='+', help='計測するシナリオ名（デフォルト: すべて）')
+        parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS), help='計測するデプロイ')
+        parser.add_argument('--output', help='JSONレポートの出力先')
+
+    def handle(self, *args, **options):
+        category = Category.objects.filter(name__startswith=f"{options['prefix']} ").order_by('id').first()
+        users = list(User.objects.filter(username__startswith=f"{options['prefix']}_user").order_by('id')[:max(options['concurrency'])])
+        if category is None or not users:
+            raise CommandError('計測用のデータがありません。先に generate_quiz_data を実行してください')
+        if min(options['concurrency']) < 1 or options['requests'] < 1 or options['workers'] < 1:
+            raise CommandError('--concurrency・--requests・--workers には1以上を指定してください')
+
+        # 接続ごとに別のユーザーで認証し、1回の計測で1ユーザーあたりのレート制限を超えないようにする
+        per_user = options['requests'] * math.ceil(max(options['concurrency']) / len(users))
+        limit = UserRateThrottle().num_requests
+        if limit is not None and per_user > limit:
+            raise CommandError(
+                f'1ユーザーあたり{per_user}回のリクエストがレート制限（{limit}回）を超えます。'
+                '--requests を減らすか、generate_quiz_data --users でユーザーを増やしてください'
+            )
+        tokens = [str(RefreshToken.for_user(user).access_token) for user in users]
+        throttle_keys = [SimpleRateThrottle.cache_format % {'scope': 'user', 'ident': user.pk} for user in users]
+
+        scenarios = self.get_scenarios(category, options['prefix'])
+        if options['only']:
+            unknown = set(options['only']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"不明なシナリオです: {', '.join(sorted(unknown))}")
+            scenarios = {name: path for name, path in scenarios.items() if name in options['only']}
+
+        results = {}
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']):
+                for name, path in scenarios.items():
+                    results[name] = {}
+                    for target in options['targets']:
+                        results[name][target] = {}
+                        with override_settings(ROOT_URLCONF=TARGETS[target]):
+                            runner = self.run_wsgi if target == 'wsgi' else self.run_asgi
+                            # キャッシュを温める（計測には含めない）
+                            runner(path, tokens[:1], 1, options)
+                            for concurrency in options['concurrency']:
+                                cache.delete_many(throttle_keys)
+                                result = runner(path, tokens, concurrency, options)
+                                results[name][target][str(concurrency)] = result
+                                self.stdout.write(self.format_result(name, target, concurrency, result))
+        finally:
+            cache.delete_many(throttle_keys)
+            QuizSession.objects.filter(session_id__startswith=f"{options['prefix']}-concurrency-").delete()
+
+        report = self.build_report(results, options)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"レポートを {options['output']} に出力しました"))
+
+    def get_scenarios(self, category, prefix):
+        """{名前: パス}（{connection} は接続の番号に置き換える）"""
+        c = category.id
+        return {
+            'unique_random': f'/api/questions/unique_random/?category={c}&limit=10',
+            'random_questions': f'/api/questions/random_questions/?category={c}&limit=10',
+            'session_questions': f'/api/questions/session_questions/?category={c}&limit=10&session_id={prefix}-concurrency-{{connection}}',
+            'quiz_session': f'/api/questions/quiz_session/?category={c}&count=10',
+            'leaderboard_public': '/api/quiz/leaderboard/',
+        }
+
+    def run_wsgi(self, path, tokens, concurrency, options):
+        """接続ごとのスレッドから WSGIHandler を呼ぶ（同時に処理するのは --workers 件まで）"""
+        handler = WSGIHandler()
+        workers = threading.Semaphore(options['workers'])
+
+        def connection_loop(index):
+            environ = self.wsgi_environ(path.format(connection=index), tokens[index % len(tokens)])
+            statuses, timings = [], []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                with workers:
+                    statuses.append(self.wsgi_request(handler, environ))
+                timings.append((time.perf_counter() - started) * 1000)
+            return statuses, timings
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(connection_loop, range(concurrency)))
+        return self.summarize(outcomes, time.perf_counter() - started)
+
+    def wsgi_environ(self, path, token):
+        path_info, _, query = path.partition('?')
+        return {
+            'REQUEST_METHOD': 'GET', 'SCRIPT_NAME': '', 'PATH_INFO': path_info, 'QUERY_STRING': query,
+            'SERVER_NAME': SERVER_NAME, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1', 'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': SERVER_NAME, 'HTTP_AUTHORIZATION': f'Bearer {token}', 'HTTP_ACCEPT_ENCODING': 'gzip',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True, 'wsgi.multiprocess': True, 'wsgi.run_once': False,
+        }
+
+    def wsgi_request(self, handler, environ):
+        status = []
+        body = handler({**environ, 'wsgi.input': io.BytesIO()}, lambda line, headers, exc_info=None: status.append(line))
+        try:
+            b''.join(body)
+        finally:
+            # request_finished（DB接続の後始末）は close() で送られる
+            body.close()
+        return int(status[0].split()[0])
+
+    def run_asgi(self, path, tokens, concurrency, options):
+        """1つのイベントループ（ASGIのワーカー1つ）で接続ごとのタスクから ASGIHandler を呼ぶ"""
+        handler = ASGIHandler()
+
+        async def connection_loop(index):
+            scope = self.asgi_scope(path.format(connection=index), tokens[index % len(tokens)])
+            statuses, timings = [], []
+            for _ in range(options['requests']):
+                started = time.perf_counter()
+                statuses.append(await self.asgi_request(handler, scope))
+                timings.append((time.perf_counter() - started) * 1000)
+            return statuses, timings
+
+        async def run():
+            return await asyncio.gather(*(connection_loop(index) for index in range(concurrency)))
+
+        started = time.perf_counter()
+        outcomes = asyncio.run(run())
+        return self.summarize(outcomes, time.perf_counter() - started)
+
+    def asgi_scope(self, path, token):
+        path_info, _, query = path.partition('?')
+        return {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path_info, 'raw_path': path_info.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [
+                (b'host', SERVER_NAME.encode()),
+                (b'authorization', f'Bearer {token}'.encode()),
+                (b'accept-encoding', b'gzip'),
+            ],
+            'client': ('127.0.0.1', 0), 'server': (SERVER_NAME, 80),
+        }
+
+    async def asgi_request(self, handler, scope):
+        messages = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        status = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # 切断は送らない（レスポンスの送信後に Django がキャンセルする）
+            return await asyncio.Future()
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                status.append(message['status'])
+
+        await handler(dict(scope), receive, send)
+        return status[0]
+
+    def summarize(self, outcomes, elapsed):
+        statuses = [status for connection_statuses, _ in outcomes for status in connection_statuses]
+        timings = sorted(timing for _, connection_timings in outcomes for timing in connection_timings)
+        return {
+            'requests': len(timings),
+            'errors': sum(1 for status in statuses if status >= 400),
+            'throughput_rps': round(len(timings) / elapsed, 1),
+            'median_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+            'max_ms': round(timings[-1], 3),
+        }
+
+    def format_result(self, name, target, concurrency, result):
+        return (
+            f"{name:<20} {target:<5} c={concurrency:<4} {result['throughput_rps']:>8.1f} req/s  "
+            f"median {result['median_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  errors {result['errors']}"
+        )
+
+    def build_report(self, results, options):
+        return {
+            'version': REPORT_VERSION,
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'cache': settings.CACHES['default']['BACKEND'],
+            },
+            'options': {
+                'prefix': options['prefix'],
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'workers': options['workers'],
+            },
+            'results': results,
+        }
@@ -0,0 +1,78 @@
+# quiz_api/management/commands/benchmark_question_list.py
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+
+from quiz_api.models import Category, Question
+from quiz_api.question_cache import invalidate_question_fragments
+from quiz_api.question_pool import invalidate_question_pools
+from quiz_api.views import QuestionViewSet
+
+
+class Command(BaseCommand):
+    help = '問題一覧APIのランダム順をカテゴリの問題数ごとに計測します（データは最後にロールバック）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+            help='計測するカテゴリの問題数（デフォルト: 10000 100000 1000000）',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='1サイズあたりのリクエスト数（デフォルト: 50）',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='bulk_create の1バッチあたりの行数（デフォルト: 5000）',
+        )
+        parser.add_argument(
+            '--compare-order-by', action='store_true',
+            help="比較のため order_by('?') で10件取得する時間も計測する",
+        )
+
+    def handle(self, *args, **options):
+        view = QuestionViewSet.as_view({'get': 'list'}, throttle_classes=[])
+        factory = RequestFactory()
+
+        self.stdout.write(f"{'questions':>10} {'median_ms':>10} {'p95_ms':>10} {'order_by_ms':>12}")
+        try:
+            with override_settings(ALLOWED_HOSTS=['*']), transaction.atomic():
+                category = Category.objects.create(name='__benchmark_question_list__')
+                url = f'/api/questions/?category={category.id}'
+                created = 0
+                for size in sorted(options['sizes']):
+                    while created < size:
+                        count = min(options['batch_size'], size - created)
+                        Question.objects.bulk_create(
+                            Question(category=category, text=f'benchmark {created + i}')
+                            for i in range(count)
+                        )
+                        created += count
+                    # bulk_create はシグナルを送らないため明示的に無効化する
+                    invalidate_question_pools()
+                    view(factory.get(url)).render()
+
+                    timings = []
+                    for _ in range(options['requests']):
+                        started = time.perf_counter()
+                        view(factory.get(url)).render()
+                        timings.append((time.perf_counter() - started) * 1000)
+                    timings.sort()
+                    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+
+                    order_by_ms = ''
+                    if options['compare_order_by']:
+                        started = time.perf_counter()
+                        list(Question.objects.filter(category=category).order_by('?')[:10])
+                        order_by_ms = f'{(time.perf_counter() - started) * 1000:.2f}'
+
+                    self.stdout.write(
+                        f'{size:>10} {statistics.median(timings):>10.2f} {p95:>10.2f} {order_by_ms:>12}'
+                    )
+                transaction.set_rollback(True)
+        finally:
+            invalidate_question_pools()
+            invalidate_question_fragments()
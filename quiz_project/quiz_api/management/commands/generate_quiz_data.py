@@ -0,0 +1,146 @@
+# quiz_api/management/commands/generate_quiz_data.py
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from quiz_api import cache as quiz_cache
+from quiz_api.models import Category, Choice, Question, QuestionResponse, QuizAttempt, UserCategoryStats
+
+
+class Command(BaseCommand):
+    help = 'ベンチマーク用のカテゴリ・問題・選択肢・ユーザー・受験結果を生成します（同じシードなら同じデータ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10, help='カテゴリ数（デフォルト: 10）')
+        parser.add_argument('--questions', type=int, default=100, help='カテゴリあたりの問題数（デフォルト: 100）')
+        parser.add_argument('--choices', type=int, default=4, help='問題あたりの選択肢数（デフォルト: 4）')
+        parser.add_argument('--users', type=int, default=100, help='ユーザー数（デフォルト: 100）')
+        parser.add_argument('--attempts', type=int, default=10, help='ユーザーあたりの受験回数（デフォルト: 10）')
+        parser.add_argument('--answers', type=int, default=10, help='受験1回あたりの回答数（デフォルト: 10）')
+        parser.add_argument('--seed', type=int, default=1, help='乱数のシード（デフォルト: 1）')
+        parser.add_argument(
+            '--prefix', default='bench',
+            help='生成するカテゴリ名・ユーザー名の接頭辞（デフォルト: bench）',
+        )
+        parser.add_argument(
+            '--password', default='bench-pass',
+            help='生成するユーザーのパスワード（デフォルト: bench-pass）',
+        )
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='同じ接頭辞の既存データを削除してから生成する',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='bulk_create の1バッチあたりの行数（デフォルト: 5000）',
+        )
+
+    def handle(self, *args, **options):
+        if options['choices'] < 2:
+            raise CommandError('選択肢は2つ以上必要です')
+        if options['answers'] < 1:
+            raise CommandError('回答数は1以上を指定してください')
+        prefix = options['prefix']
+        categories = Category.objects.filter(name__startswith=f'{prefix} ')
+        users = User.objects.filter(username__startswith=f'{prefix}_user')
+        if categories.exists() or users.exists():
+            if not options['replace']:
+                raise CommandError(f'接頭辞「{prefix}」のデータが既にあります（--replace で作り直せます）')
+            users.delete()
+            categories.delete()
+
+        with transaction.atomic():
+            counts = self.generate(random.Random(options['seed']), options)
+            # 集計テーブルとキャッシュは bulk_create では更新されないため作り直す
+            UserCategoryStats.rebuild_from_attempts(batch_size=options['batch_size'])
+            quiz_cache.invalidate(
+                quiz_cache.CATEGORIES, quiz_cache.QUESTION_POOL, quiz_cache.ANSWER_KEYS,
+                quiz_cache.QUESTION_JSON, quiz_cache.LEADERBOARD, quiz_cache.STATS,
+                quiz_cache.CONTENT, quiz_cache.ATTEMPTS,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            'データを生成しました（' + '、'.join(f'{name}: {count}' for name, count in counts.items()) + '）'
+        ))
+
+    def generate(self, rng, options):
+        prefix = options['prefix']
+        batch_size = options['batch_size']
+
+        categories = Category.objects.bulk_create(
+            Category(name=f'{prefix} カテゴリ{i + 1:03d}')
+            for i in range(options['categories'])
+        )
+        questions = Question.objects.bulk_create(
+            (
+                Question(category=category, text=f'{category.name} 問題{j + 1}')
+                for category in categories
+                for j in range(options['questions'])
+            ),
+            batch_size=batch_size,
+        )
+        correct_numbers = [rng.randrange(options['choices']) for _ in questions]
+        choices = Choice.objects.bulk_create(
+            (
+                Choice(question=question, text=f'選択肢{k + 1}', is_correct=(k == correct))
+                for question, correct in zip(questions, correct_numbers)
+                for k in range(options['choices'])
+            ),
+            batch_size=batch_size,
+        )
+
+        # カテゴリごとの [(問題ID, [選択肢ID], 正解の選択肢ID)]
+        per_category = {category.id: [] for category in categories}
+        for index, (question, correct) in enumerate(zip(questions, correct_numbers)):
+            choice_ids = [choice.id for choice in choices[index * options['choices']:(index + 1) * options['choices']]]
+            per_category[question.category_id].append((question.id, choice_ids, choice_ids[correct]))
+
+        password = make_password(options['password'])
+        users = User.objects.bulk_create(
+            (User(username=f'{prefix}_user{i + 1:05d}', password=password) for i in range(options['users'])),
+            batch_size=batch_size,
+        )
+
+        attempts = []
+        answers = []
+        playable = [category for category in categories if per_category[category.id]]
+        for user in users:
+            for _ in range(options['attempts'] if playable else 0):
+                category = rng.choice(playable)
+                pool = per_category[category.id]
+                selected = rng.sample(pool, min(options['answers'], len(pool)))
+                picks = []
+                for question_id, choice_ids, correct_id in selected:
+                    # 6割程度が正解になるように選ぶ
+                    choice_id = correct_id if rng.random() < 0.6 else rng.choice(choice_ids)
+                    picks.append((question_id, choice_id, choice_id == correct_id))
+                score = sum(1 for _, _, is_correct in picks if is_correct)
+                attempts.append(QuizAttempt(
+                    user=user, category=category, score=score,
+                    total_questions=len(picks), percentage=score * 100.0 / len(picks),
+                ))
+                answers.append(picks)
+        attempts = QuizAttempt.objects.bulk_create(attempts, batch_size=batch_size)
+        responses = QuestionResponse.objects.bulk_create(
+            (
+                QuestionResponse(
+                    quiz_attempt=attempt, question_id=question_id,
+                    selected_choice_id=choice_id, is_correct=is_correct,
+                )
+                for attempt, picks in zip(attempts, answers)
+                for question_id, choice_id, is_correct in picks
+            ),
+            batch_size=batch_size,
+        )
+
+        return {
+            'カテゴリ': len(categories),
+            '問題': len(questions),
+            '選択肢': len(choices),
+            'ユーザー': len(users),
+            '受験結果': len(attempts),
+            '回答': len(responses),
+        }
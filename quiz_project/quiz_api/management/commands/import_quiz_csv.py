@@ -0,0 +1,35 @@
+# quiz_api/management/commands/import_quiz_csv.py
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz_api.importers import DEFAULT_CHUNK_SIZE, QuizImportError, import_csv
+
+
+class Command(BaseCommand):
+    help = '統一CSV形式（カテゴリー,質問,選択肢1〜6,正解番号）のファイルをチャンク単位でインポートします'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='インポートするCSVファイルのパス')
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで保存する行数（デフォルト: {DEFAULT_CHUNK_SIZE}）',
+        )
+
+    def handle(self, *args, **options):
+        def progress(result):
+            self.stdout.write(
+                f'{result.total_rows}行処理 '
+                f'（新規 {result.created_questions} / 更新 {result.updated_questions} / エラー {result.error_count}）'
+            )
+
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = import_csv(stream, chunk_size=options['chunk_size'], progress=progress)
+        except (OSError, QuizImportError) as e:
+            raise CommandError(str(e))
+
+        for message in result.duplicate_warnings + result.errors:
+            self.stderr.write(message)
+        self.stdout.write(self.style.SUCCESS(
+            f'{result.imported}問をインポートしました（総行数: {result.total_rows}行、'
+            f'エンコーディング: {result.encoding}、エラー: {result.error_count}件）'
+        ))
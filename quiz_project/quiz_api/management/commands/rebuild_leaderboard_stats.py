@@ -0,0 +1,20 @@
+# quiz_api/management/commands/rebuild_leaderboard_stats.py
+from django.core.management.base import BaseCommand
+
+from quiz_api import cache as quiz_cache
+from quiz_api.models import UserCategoryStats
+
+
+class Command(BaseCommand):
+    help = 'QuizAttempt の履歴からリーダーボード用の集計テーブル（UserCategoryStats）を再構築します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='bulk_create の1バッチあたりの行数（デフォルト: 1000）',
+        )
+
+    def handle(self, *args, **options):
+        created = UserCategoryStats.rebuild_from_attempts(batch_size=options['batch_size'])
+        quiz_cache.invalidate(quiz_cache.LEADERBOARD)
+        self.stdout.write(self.style.SUCCESS(f'{created}行の集計データを再構築しました'))
@@ -0,0 +1,55 @@
+# quiz_api/management/commands/run_import_worker.py
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from quiz_api.import_jobs import claim_next_job, fail_stale_jobs, run_job
+from quiz_api.importers import DEFAULT_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = '管理画面から登録されたインポートジョブを処理します（DBをキューとして使用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='待機中のジョブをすべて処理したら終了する',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='待機中のジョブがないときの確認間隔（秒、デフォルト: 2）',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+            help=f'1トランザクションで保存する行数（デフォルト: {DEFAULT_CHUNK_SIZE}）',
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='進捗が更新されない実行中ジョブを失敗とみなすまでの秒数（デフォルト: 600）',
+        )
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'インポートワーカーを開始しました（{worker}）')
+        try:
+            while True:
+                close_old_connections()
+                stale = fail_stale_jobs(options['stale_after'])
+                if stale:
+                    self.stderr.write(f'{stale}件の応答のないジョブを失敗にしました')
+
+                job = claim_next_job(worker)
+                if job is None:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                self.stdout.write(f'ジョブ {job.id}（{job.get_format_display()}）を開始します')
+                job = run_job(job, chunk_size=options['chunk_size'])
+                self.stdout.write(f'ジョブ {job.id}: {job.get_status_display()} - {job.message}')
+        except KeyboardInterrupt:
+            self.stdout.write('インポートワーカーを停止しました')
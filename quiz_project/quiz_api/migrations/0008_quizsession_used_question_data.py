@@ -0,0 +1,72 @@
+import sys
+import zlib
+from array import array
+
+from django.db import migrations, models
+
+
+def _pack(question_ids):
+    ids = sorted(set(question_ids))
+    if not ids:
+        return b''
+    deltas = array('q', [ids[0]] + [b - a for a, b in zip(ids, ids[1:])])
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes())
+
+
+def copy_used_questions(apps, schema_editor):
+    """M2M の出題済み問題をパック済みカラムへ移行する"""
+    QuizSession = apps.get_model('quiz_api', 'QuizSession')
+    Through = QuizSession.used_questions.through
+    used = {}
+    for session_id, question_id in Through.objects.values_list('quizsession_id', 'question_id').iterator():
+        used.setdefault(session_id, []).append(question_id)
+    for session_id, question_ids in used.items():
+        QuizSession.objects.filter(pk=session_id).update(
+            used_question_data=_pack(question_ids),
+            used_count=len(set(question_ids)),
+        )
+
+
+def restore_used_questions(apps, schema_editor):
+    """パック済みカラムから M2M を復元する"""
+    from itertools import accumulate
+
+    QuizSession = apps.get_model('quiz_api', 'QuizSession')
+    Question = apps.get_model('quiz_api', 'Question')
+    Through = QuizSession.used_questions.through
+    rows = []
+    for session_id, data in QuizSession.objects.exclude(used_question_data=b'').values_list('pk', 'used_question_data'):
+        deltas = array('q')
+        deltas.frombytes(zlib.decompress(bytes(data)))
+        if sys.byteorder == 'big':
+            deltas.byteswap()
+        existing = set(Question.objects.filter(pk__in=list(accumulate(deltas))).values_list('pk', flat=True))
+        rows.extend(Through(quizsession_id=session_id, question_id=question_id) for question_id in existing)
+    Through.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0007_alter_question_image_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizsession',
+            name='used_question_data',
+            field=models.BinaryField(blank=True, default=b''),
+        ),
+        migrations.AddField(
+            model_name='quizsession',
+            name='used_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(copy_used_questions, restore_used_questions),
+        migrations.RemoveField(
+            model_name='quizsession',
+            name='used_questions',
+        ),
+    ]
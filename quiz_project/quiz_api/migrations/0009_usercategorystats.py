@@ -0,0 +1,63 @@
+# Generated by Django 5.2.3 on 2026-10-18 20:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    """既存の QuizAttempt から集計テーブルを作成する"""
+    QuizAttempt = apps.get_model('quiz_api', 'QuizAttempt')
+    UserCategoryStats = apps.get_model('quiz_api', 'UserCategoryStats')
+    aggregates = {
+        'attempts': Count('id'),
+        'score_sum': Sum('score'),
+        'questions_sum': Sum('total_questions'),
+    }
+    rows = []
+    groups = [
+        (QuizAttempt.objects.order_by().values('user_id', 'category_id').annotate(**aggregates), True),
+        (QuizAttempt.objects.order_by().values('user_id').annotate(**aggregates), False),
+    ]
+    for queryset, per_category in groups:
+        for row in queryset.iterator():
+            questions_sum = row['questions_sum'] or 0
+            score_sum = row['score_sum'] or 0
+            rows.append(UserCategoryStats(
+                user_id=row['user_id'],
+                category_id=row['category_id'] if per_category else None,
+                attempts=row['attempts'],
+                score_sum=score_sum,
+                questions_sum=questions_sum,
+                avg_percentage=(score_sum * 100.0 / questions_sum) if questions_sum > 0 else 0.0,
+            ))
+    UserCategoryStats.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz_api', '0008_quizsession_used_question_data'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.IntegerField(default=0)),
+                ('score_sum', models.IntegerField(default=0)),
+                ('questions_sum', models.IntegerField(default=0)),
+                ('avg_percentage', models.FloatField(default=0.0)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='user_stats', to='quiz_api.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['category', '-avg_percentage'], name='idx_stats_category_pct')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='uniq_stats_user_category'), models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user',), name='uniq_stats_user_overall')],
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
 # quiz_api/models.py
-from django.db import models
+import sys
+import zlib
+from array import array
+from itertools import accumulate
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, Q, Sum, Value, When
 from django.contrib.auth.models import User
 from django.core.validators import FileExtensionValidator
 
@@ -62,12 +68,137 @@ class QuestionResponse(models.Model):
         return f"{self.quiz_attempt.user.username} - {self.question.text[:30]} - {'正解' if self.is_correct else '不正解'}"
 
 
+class UserCategoryStats(models.Model):
+    """ユーザー×カテゴリ別の成績集計（category が NULL の行は全カテゴリ合計）
+
+    QuizAttempt の保存・更新・削除時にシグナルから F() 式で増減させ、
+    リーダーボードはこのテーブルだけを参照する。
+    シグナルを送らない QuerySet.update() や bulk_create で受験結果を変更した場合は
+    rebuild_from_attempts()（rebuild_leaderboard_stats コマンド）で作り直すこと。
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='category_stats')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='user_stats')
+    attempts = models.IntegerField(default=0)
+    score_sum = models.IntegerField(default=0)
+    questions_sum = models.IntegerField(default=0)
+    avg_percentage = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='uniq_stats_user_category'),
+            models.UniqueConstraint(
+                fields=['user'], condition=Q(category__isnull=True), name='uniq_stats_user_overall'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['category', '-avg_percentage'], name='idx_stats_category_pct'),
+        ]
+
+    def __str__(self):
+        category_name = self.category.name if self.category_id else '全カテゴリ'
+        return f"{self.user.username} - {category_name} - {self.score_sum}/{self.questions_sum}"
+
+    @classmethod
+    def record_attempt(cls, user_id, category_id, score, total_questions, sign=1):
+        """1回分の受験結果をカテゴリ行と全体行に加算する（sign=-1 で減算）"""
+        attempts = sign
+        score = score * sign
+        total_questions = total_questions * sign
+        new_questions_sum = F('questions_sum') + total_questions
+        updates = {
+            'attempts': F('attempts') + attempts,
+            'score_sum': F('score_sum') + score,
+            'questions_sum': new_questions_sum,
+            'avg_percentage': Case(
+                When(questions_sum__gt=-total_questions,
+                    then=ExpressionWrapper(
+                        (F('score_sum') + score) * 100.0 / new_questions_sum,
+                        output_field=FloatField()
+                    )
+                ),
+                default=Value(0.0),
+                output_field=FloatField()
+            ),
+        }
+        for target_category_id in (category_id, None):
+            rows = cls.objects.filter(user_id=user_id, category_id=target_category_id)
+            if rows.update(**updates) or sign < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    cls.objects.create(
+                        user_id=user_id,
+                        category_id=target_category_id,
+                        attempts=attempts,
+                        score_sum=score,
+                        questions_sum=total_questions,
+                        avg_percentage=(score * 100.0 / total_questions) if total_questions > 0 else 0.0,
+                    )
+            except IntegrityError:
+                # 同時に作成された場合は加算でやり直す
+                rows.update(**updates)
+
+
+    @classmethod
+    def rebuild_from_attempts(cls, batch_size=1000):
+        """QuizAttempt の履歴から集計テーブルを作り直す（作成した行数を返す）"""
+        aggregates = {
+            'attempts': Count('id'),
+            'score_sum': Sum('score'),
+            'questions_sum': Sum('total_questions'),
+        }
+        per_category = QuizAttempt.objects.order_by().values('user_id', 'category_id').annotate(**aggregates)
+        overall = QuizAttempt.objects.order_by().values('user_id').annotate(**aggregates)
+
+        def build(row, category_id):
+            questions_sum = row['questions_sum'] or 0
+            score_sum = row['score_sum'] or 0
+            return cls(
+                user_id=row['user_id'],
+                category_id=category_id,
+                attempts=row['attempts'],
+                score_sum=score_sum,
+                questions_sum=questions_sum,
+                avg_percentage=(score_sum * 100.0 / questions_sum) if questions_sum > 0 else 0.0,
+            )
+
+        with transaction.atomic():
+            cls.objects.all().delete()
+            stats = [build(row, row['category_id']) for row in per_category.iterator()]
+            stats.extend(build(row, None) for row in overall.iterator())
+            cls.objects.bulk_create(stats, batch_size=batch_size)
+        return len(stats)
+
+def pack_question_ids(question_ids):
+    """問題IDの集合を差分エンコード + zlib 圧縮したバイト列に変換する"""
+    ids = sorted(set(question_ids))
+    if not ids:
+        return b''
+    deltas = array('q', [ids[0]] + [b - a for a, b in zip(ids, ids[1:])])
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes())
+
+
+def unpack_question_ids(data):
+    """pack_question_ids で作成したバイト列を問題IDの集合に戻す"""
+    if not data:
+        return set()
+    deltas = array('q')
+    deltas.frombytes(zlib.decompress(bytes(data)))
+    if sys.byteorder == 'big':
+        deltas.byteswap()
+    return set(accumulate(deltas))
+
+
 class QuizSession(models.Model):
     """クイズセッション管理"""
     session_id = models.CharField(max_length=100, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
-    used_questions = models.ManyToManyField(Question, blank=True)
+    # 出題済みの問題ID（pack_question_ids 形式）
+    used_question_data = models.BinaryField(default=b'', blank=True)
+    used_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -78,4 +209,87 @@ class QuizSession(models.Model):
         ]
     
     def __str__(self):
-        return f"Session {self.session_id} - {self.used_questions.count()} questions used"
\ No newline at end of file
+        return f"Session {self.session_id} - {self.used_count} questions used"
+
+    def get_used_question_ids(self):
+        """出題済みの問題IDの集合を返す"""
+        return unpack_question_ids(self.used_question_data)
+
+    def set_used_question_ids(self, question_ids):
+        """出題済みの問題IDを置き換える（保存は呼び出し側で行う）"""
+        question_ids = set(question_ids)
+        self.used_question_data = pack_question_ids(question_ids)
+        self.used_count = len(question_ids)
+
+    def mark_questions_used(self, question_ids):
+        """問題IDを出題済みに追加する（保存は呼び出し側で行う）"""
+        self.set_used_question_ids(self.get_used_question_ids() | set(question_ids))
+
+    def reset_used_questions(self):
+        """出題済みの記録をクリアする（保存は呼び出し側で行う）"""
+        self.set_used_question_ids(())
+
+
+class ImportJob(models.Model):
+    """管理画面から登録された一括インポートのジョブ
+
+    run_import_worker コマンドがDB上の待機中ジョブを取得して処理し、
+    進捗・件数・行ごとのエラーをこのレコードに書き戻す。
+    """
+    FORMAT_CSV = 'csv'
+    FORMAT_BULK = 'bulk'
+    FORMAT_SIMPLE = 'simple'
+    FORMAT_JSON = 'json'
+    FORMAT_YAML = 'yaml'
+    FORMAT_CHOICES = [
+        (FORMAT_CSV, '統一CSV形式'),
+        (FORMAT_BULK, '一括追加'),
+        (FORMAT_SIMPLE, 'シンプル形式'),
+        (FORMAT_JSON, 'JSON形式'),
+        (FORMAT_YAML, 'YAML形式'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, '待機中'),
+        (STATUS_RUNNING, '実行中'),
+        (STATUS_SUCCEEDED, '完了'),
+        (STATUS_FAILED, '失敗'),
+    ]
+
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    source = models.FileField(upload_to='import_jobs/')
+    original_name = models.CharField(max_length=255, blank=True)
+    # 一括追加形式の追加先（CSV形式は行ごとにカテゴリーを指定する）
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    progress = models.FloatField(default=0.0)
+    processed_rows = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    updated_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    message = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='idx_importjob_status_created'),
+        ]
+
+    def __str__(self):
+        return f"ImportJob {self.id} - {self.get_format_display()} - {self.get_status_display()}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
+
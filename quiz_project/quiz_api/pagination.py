@@ -1,6 +1,14 @@
 # pagination.py
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 class LeaderboardPagination(PageNumberPagination):
     page_size = 10
@@ -15,4 +23,123 @@ class LeaderboardPagination(PageNumberPagination):
             'total_pages': (self.page.paginator.count // self.page_size) + (1 if self.page.paginator.count % self.page_size > 0 else 0),
             'current_page': self.page.number,
             'results': data
-        })
\ No newline at end of file
+        })
+
+
+class KeysetPagination(BasePagination):
+    """?pagination=cursor（または ?cursor=...）のときだけキーセット方式で返すページネーション
+
+    ordering の各列の値を前ページ最終行の値と比較して次のページを取得するため、
+    OFFSET も COUNT(*) も使わず、深いページでも取得時間が変わらない。
+    ordering の最後には一意な列（id）を含めること。
+    count はビューの get_pagination_count(queryset) が返す値（集計済みの値やキャッシュ）を使い、
+    定義されていなければ None を返す。
+    オプトインしない場合は fallback_class に委譲し、従来どおりの形式で返す。
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    fallback_class = PageNumberPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.view = view
+        self.use_keyset = (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+        if not self.use_keyset:
+            self.fallback = self.fallback_class()
+            return self.fallback.paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        self.count = self.get_count(queryset)
+        queryset = queryset.order_by(*self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._after(self.decode_cursor(cursor, queryset)))
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_count(self, queryset):
+        get_pagination_count = getattr(self.view, 'get_pagination_count', None)
+        return get_pagination_count(queryset) if get_pagination_count else None
+
+    def _after(self, values):
+        """(a, b, ...) が前ページ最終行より後ろにある行の条件"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, obj):
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(value.isoformat() if isinstance(value, datetime) else value)
+        return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+    def get_ordering_fields(self, queryset):
+        """ordering の各列のフィールド（注釈の列は output_field）"""
+        fields = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            annotation = queryset.query.annotations.get(name)
+            fields.append(annotation.output_field if annotation is not None else queryset.model._meta.get_field(name))
+        return fields
+
+    def decode_cursor(self, cursor, queryset):
+        """カーソルを ordering の各列の型の値に変換する（形式・型が不正なら404）"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(values)
+            values = [field.to_python(value) for field, value in zip(self.get_ordering_fields(queryset), values)]
+        except (ValidationError, TypeError, ValueError, UnicodeError):
+            raise NotFound('無効なカーソルです')
+        if None in values:
+            raise NotFound('無効なカーソルです')
+        return values
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.use_keyset:
+            return self.fallback.get_paginated_response(data)
+        # 前ページへはクライアントが保持したカーソルで戻る（前方向のみ）
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'count': self.count,
+            'results': data,
+        })
+
+
+class QuizHistoryPagination(KeysetPagination):
+    """受験履歴（idx_attempt_user_created の順に新しい順）"""
+    ordering = ('-created_at', '-id')
+
+
+class LeaderboardCursorPagination(KeysetPagination):
+    """リーダーボード（平均正答率の降順、同率は id 順）"""
+    ordering = ('-avg_percentage', 'id')
@@ -0,0 +1,96 @@
+# quiz_api/question_cache.py
+"""問題ごとのシリアライズ済みJSONキャッシュ
+
+問題IDとコンテンツバージョンをキーに、QuestionSerializer の出力を
+JSONバイト列として保持する。ランダム出題APIはキャッシュ済みの断片を
+RawJSON として連結するだけで、シリアライザーを経由しない。
+断片ごとに連結用の deflate ブロックも保存し、gzip の応答はブロックをつなげて作る（compression.py）。
+コンテンツバージョン（cache.QUESTION_JSON の名前空間バージョン）は
+Question / Choice の保存・削除シグナルで更新される（signals.py）。
+非同期ビュー用の aget_question_fragments() は同じキーの断片をキャッシュの非同期APIで読み書きする。
+"""
+import hashlib
+
+from django.core.cache import cache
+from rest_framework.settings import api_settings
+
+from . import cache as quiz_cache
+from .compression import deflate_block
+from .question_pool import afetch_questions, fetch_questions
+from .renderers import RawJSON
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+
+def invalidate_question_fragments():
+    """コンテンツバージョンを更新し、既存の断片をすべて無効にする"""
+    quiz_cache.invalidate(quiz_cache.QUESTION_JSON)
+
+
+def _fragment_keys(question_ids, request, hide_answers, version=None):
+    # 画像URLは絶対URLで出力されるため、ホストごとに別の断片を持つ（z は deflate ブロック付きの形式）
+    variant = f"{request.build_absolute_uri('/')}|{'public' if hide_answers else 'full'}|z"
+    digest = hashlib.md5(variant.encode('utf-8')).hexdigest()[:10]
+    prefix = quiz_cache.make_key(quiz_cache.QUESTION_JSON, digest, '', version=version)
+    return {question_id: f'{prefix}{question_id}' for question_id in question_ids}
+
+
+def _missing_ids(question_ids, keys, fragments):
+    missing = [question_id for question_id in question_ids if keys[question_id] not in fragments]
+    quiz_cache.record(quiz_cache.QUESTION_JSON, hits=len(question_ids) - len(missing), misses=len(missing))
+    return missing
+
+
+def _render_fragments(questions, keys, serialize):
+    # 設定されたレンダラー（QuizJSONRenderer か fast_json.QuizORJSONRenderer）で断片を作る
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    new_fragments = {}
+    for question, item in zip(questions, serialize(questions)):
+        raw = renderer.render(item)
+        new_fragments[keys[question.id]] = (raw, deflate_block(raw))
+    return new_fragments
+
+
+def _payloads(question_ids, keys, fragments):
+    payloads = []
+    for question_id in question_ids:
+        fragment = fragments.get(keys[question_id])
+        if fragment is not None:
+            raw, block = fragment
+            payloads.append(RawJSON(raw, deflate_block=block))
+    return payloads
+
+
+def get_question_fragments(question_ids, request, serialize, hide_answers=False):
+    """問題IDのリストをシリアライズ済みJSON断片（RawJSON）のリストに変換する
+
+    キャッシュにない問題だけをDBから取得し、serialize(questions) の結果を保存する。
+    削除済みの問題は結果から除かれる。
+    """
+    if not question_ids:
+        return []
+    keys = _fragment_keys(question_ids, request, hide_answers)
+    fragments = cache.get_many(list(keys.values()))
+
+    missing = _missing_ids(question_ids, keys, fragments)
+    if missing:
+        new_fragments = _render_fragments(fetch_questions(missing), keys, serialize)
+        cache.set_many(new_fragments, FRAGMENT_TIMEOUT)
+        fragments.update(new_fragments)
+    return _payloads(question_ids, keys, fragments)
+
+
+async def aget_question_fragments(question_ids, request, serialize, hide_answers=False):
+    """get_question_fragments の非同期版（serialize は取得済みの問題だけを使い、DBにはアクセスしない）"""
+    if not question_ids:
+        return []
+    version = await quiz_cache.aget_version(quiz_cache.QUESTION_JSON)
+    keys = _fragment_keys(question_ids, request, hide_answers, version=version)
+    fragments = await cache.aget_many(list(keys.values()))
+
+    missing = _missing_ids(question_ids, keys, fragments)
+    if missing:
+        new_fragments = _render_fragments(await afetch_questions(missing), keys, serialize)
+        await cache.aset_many(new_fragments, FRAGMENT_TIMEOUT)
+        fragments.update(new_fragments)
+    return _payloads(question_ids, keys, fragments)
@@ -0,0 +1,191 @@
+# quiz_api/question_pool.py
+"""カテゴリ別の出題可能な問題IDプール
+
+選択肢を持つ問題のIDだけを整数配列として保持し、
+ランダム出題時はこの配列からIDを抽選して、選ばれた行だけをDBから取得する。
+問題一覧APIのランダム順には、選択肢の有無を問わないプールを使う。
+配列は共有キャッシュ（cache.QUESTION_POOL）に保存し、各プロセスは
+バージョンが変わるまでローカルにも保持する。
+Question / Choice の保存・削除シグナルでバージョンが更新される（signals.py）。
+非同期ビュー用の aget_question_pool() / afetch_questions() は非同期のORMとキャッシュAPIを使う。
+"""
+import hashlib
+import random
+from array import array
+from collections.abc import Sequence
+
+from . import cache as quiz_cache
+from .models import Question
+
+# プロセス内の写し: {(カテゴリキー, playable_only): (バージョン, array)}
+_local_pools = {}
+
+
+def normalize_category(category):
+    """category パラメータをプールのキーに変換する（None は全カテゴリ）"""
+    if not category or category == 'all':
+        return None
+    try:
+        return int(category)
+    except (ValueError, TypeError):
+        return None
+
+
+def _pool_queryset(key, playable_only=True):
+    queryset = Question.objects.all()
+    if playable_only:
+        queryset = queryset.filter(choices__isnull=False).distinct()
+    if key is not None:
+        queryset = queryset.filter(category_id=key)
+    return queryset.order_by('id').values_list('id', flat=True)
+
+
+def _build_pool(key, playable_only=True):
+    return array('q', _pool_queryset(key, playable_only)).tobytes()
+
+
+async def _abuild_pool(key, playable_only=True):
+    return array('q', [question_id async for question_id in _pool_queryset(key, playable_only)]).tobytes()
+
+
+def _pool_parts(key, playable_only):
+    parts = ['all' if key is None else key]
+    if not playable_only:
+        parts.append('any')
+    return parts
+
+
+def _local_pool(key, playable_only, version):
+    """プロセス内の写しがあれば返す（バージョンが古ければ None）"""
+    local = _local_pools.get((key, playable_only))
+    if local is not None and local[0] == version:
+        quiz_cache.record(quiz_cache.QUESTION_POOL, hits=1)
+        return local[1]
+    return None
+
+
+def _store_local_pool(key, playable_only, version, data):
+    pool = array('q')
+    pool.frombytes(data)
+    _local_pools[(key, playable_only)] = (version, pool)
+    return pool
+
+
+def get_question_pool(category=None, playable_only=True):
+    """問題IDプール（ID昇順の array）を返す
+
+    playable_only=False の場合は選択肢のない問題も含める。
+    """
+    key = normalize_category(category)
+    version = quiz_cache.get_version(quiz_cache.QUESTION_POOL)
+    pool = _local_pool(key, playable_only, version)
+    if pool is not None:
+        return pool
+
+    data = quiz_cache.cache_aside(
+        quiz_cache.QUESTION_POOL,
+        _pool_parts(key, playable_only),
+        lambda: _build_pool(key, playable_only),
+        version=version,
+    )
+    return _store_local_pool(key, playable_only, version, data)
+
+
+async def aget_question_pool(category=None, playable_only=True):
+    """get_question_pool の非同期版"""
+    key = normalize_category(category)
+    version = await quiz_cache.aget_version(quiz_cache.QUESTION_POOL)
+    pool = _local_pool(key, playable_only, version)
+    if pool is not None:
+        return pool
+
+    data = await quiz_cache.acache_aside(
+        quiz_cache.QUESTION_POOL,
+        _pool_parts(key, playable_only),
+        lambda: _abuild_pool(key, playable_only),
+        version=version,
+    )
+    return _store_local_pool(key, playable_only, version, data)
+
+
+def invalidate_question_pools():
+    """全カテゴリのプールを無効にする"""
+    quiz_cache.invalidate(quiz_cache.QUESTION_POOL)
+
+
+def seeded_random(seed):
+    """シード値からリクエスト専用の乱数生成器を作る（グローバルの random の状態は変えない）
+
+    整数のシードはそのまま使い、それ以外の文字列はプロセスごとに値の変わる hash() ではなく
+    SHA-256 から整数を作るため、どのワーカーでも同じ並びになる。
+    """
+    try:
+        value = int(seed)
+    except (ValueError, TypeError):
+        value = int.from_bytes(hashlib.sha256(str(seed).encode('utf-8')).digest()[:8], 'big')
+    return random.Random(value)
+
+
+def sample_question_ids(category=None, limit=10, exclude=None, rng=None):
+    """プールから最大limit件のIDをランダムに抽選する
+
+    rng に seeded_random() の乱数生成器を渡すと、結果はプールのIDとシード・件数だけで決まる
+    （問題の本文は読み込まないため、選ばれたIDはそのままJSON断片のキャッシュから返せる）。
+    """
+    return sample_from_pool(get_question_pool(category), limit, exclude=exclude, rng=rng)
+
+
+def sample_from_pool(pool, limit=10, exclude=None, rng=None):
+    """取得済みのプールから最大limit件のIDをランダムに抽選する（sample_question_ids と同じ抽選）"""
+    rng = rng or random
+    if exclude:
+        candidates = [question_id for question_id in pool if question_id not in exclude]
+    else:
+        candidates = pool
+
+    if len(candidates) <= limit:
+        selected = list(candidates)
+        rng.shuffle(selected)
+        return selected
+    return rng.sample(candidates, limit)
+
+
+class RandomIdSample(Sequence):
+    """IDプールをランダムな順に並べたものとして振る舞う遅延シーケンス
+
+    Paginator からスライスされた件数だけをその都度抽選するため、
+    プール全体の並べ替えは行わない。order_by('?') と同様に、
+    ページをまたいだ並び順は固定されない。
+    """
+
+    def __init__(self, pool, size=None):
+        self.pool = pool
+        self.size = len(pool) if size is None else min(size, len(pool))
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return random.sample(self.pool, len(range(*index.indices(self.size))))
+        if not -self.size <= index < self.size:
+            raise IndexError('RandomIdSample index out of range')
+        return random.choice(self.pool)
+
+
+def fetch_questions(question_ids):
+    """指定IDの問題を選択肢付きで取得し、ID の並び順を保って返す"""
+    if not question_ids:
+        return []
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related('choices')
+    by_id = {question.id: question for question in questions}
+    return [by_id[question_id] for question_id in question_ids if question_id in by_id]
+
+
+async def afetch_questions(question_ids):
+    """fetch_questions の非同期版"""
+    if not question_ids:
+        return []
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related('choices')
+    by_id = {question.id: question async for question in questions}
+    return [by_id[question_id] for question_id in question_ids if question_id in by_id]
@@ -0,0 +1,143 @@
+# quiz_api/recent_questions.py
+"""ユーザーごとの最近出題した問題IDの集合
+
+クイズ結果の保存時に回答した問題IDを時間枠（QUIZ_RECENT_QUESTIONS_BUCKET 秒）ごとの集合として
+共有キャッシュに追記し、quiz_session は直近 QUIZ_RECENT_QUESTIONS_WINDOW 秒分の
+時間枠を get_many でまとめて読み出して除外に使う（受験結果・回答テーブルとの結合は不要）。
+キャッシュが空の場合（初回やキャッシュの再起動後）は、受験結果から1回だけ再構築する。
+非同期ビュー用の aget_recent_question_ids() は非同期のORMとキャッシュAPIで同じキーを読み書きする。
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import cache as quiz_cache
+from .models import QuizAttempt
+
+
+def _window():
+    return settings.QUIZ_RECENT_QUESTIONS_WINDOW
+
+
+def _bucket_size():
+    return settings.QUIZ_RECENT_QUESTIONS_BUCKET
+
+
+def _bucket_key(user_id, bucket):
+    return f'{quiz_cache.RECENT_QUESTIONS}:{user_id}:{bucket}'
+
+
+def _seeded_key(user_id):
+    return f'{quiz_cache.RECENT_QUESTIONS}:{user_id}:seeded'
+
+
+def _bucket_timeout():
+    # 時間枠の終わりから期間分だけ残れば十分
+    return _window() + _bucket_size()
+
+
+def _add_to_buckets(user_id, ids_by_bucket):
+    keys = {bucket: _bucket_key(user_id, bucket) for bucket in ids_by_bucket}
+    current = cache.get_many(keys.values())
+    cache.set_many(
+        {key: current.get(key, set()) | ids_by_bucket[bucket] for bucket, key in keys.items()},
+        _bucket_timeout(),
+    )
+
+
+async def _aadd_to_buckets(user_id, ids_by_bucket):
+    keys = {bucket: _bucket_key(user_id, bucket) for bucket in ids_by_bucket}
+    current = await cache.aget_many(keys.values())
+    await cache.aset_many(
+        {key: current.get(key, set()) | ids_by_bucket[bucket] for bucket, key in keys.items()},
+        _bucket_timeout(),
+    )
+
+
+def _recent_rows(user_id):
+    since = timezone.now() - timedelta(seconds=_window())
+    return QuizAttempt.objects.filter(
+        user_id=user_id,
+        created_at__gte=since,
+        responses__question_id__isnull=False,
+    ).values_list('created_at', 'responses__question_id')
+
+
+def _group_by_bucket(rows):
+    ids_by_bucket = {}
+    for created_at, question_id in rows:
+        bucket = int(created_at.timestamp() // _bucket_size())
+        ids_by_bucket.setdefault(bucket, set()).add(question_id)
+    return ids_by_bucket
+
+
+def _ensure_seeded(user_id):
+    """キャッシュに集合がなければ期間内の受験結果から再構築する（構築済みなら True）"""
+    if cache.get(_seeded_key(user_id)):
+        return True
+    ids_by_bucket = _group_by_bucket(_recent_rows(user_id))
+    if ids_by_bucket:
+        _add_to_buckets(user_id, ids_by_bucket)
+    cache.set(_seeded_key(user_id), True, _window())
+    return False
+
+
+async def _aensure_seeded(user_id):
+    """_ensure_seeded の非同期版"""
+    if await cache.aget(_seeded_key(user_id)):
+        return True
+    ids_by_bucket = _group_by_bucket([row async for row in _recent_rows(user_id)])
+    if ids_by_bucket:
+        await _aadd_to_buckets(user_id, ids_by_bucket)
+    await cache.aset(_seeded_key(user_id), True, _window())
+    return False
+
+
+def _window_bucket_keys(user_id):
+    """直近の期間の時間枠のキー（時間枠の単位で期間を切り上げる）"""
+    now = time.time()
+    current = int(now // _bucket_size())
+    first = int((now - _window()) // _bucket_size())
+    return [_bucket_key(user_id, bucket) for bucket in range(first, current + 1)]
+
+
+def _union(buckets):
+    recent = set()
+    for question_ids in buckets.values():
+        recent |= question_ids
+    return recent
+
+
+def add_recent_questions(user_id, question_ids):
+    """回答した問題IDを現在の時間枠に追記する（クイズ結果の保存時に呼ぶ）"""
+    question_ids = set(question_ids)
+    if not question_ids:
+        return
+    _ensure_seeded(user_id)
+    _add_to_buckets(user_id, {int(time.time() // _bucket_size()): question_ids})
+
+
+def get_recent_question_ids(user_id):
+    """直近の期間に出題した問題IDの集合を返す（時間枠の単位で期間を切り上げる）"""
+    if _ensure_seeded(user_id):
+        quiz_cache.record(quiz_cache.RECENT_QUESTIONS, hits=1)
+    else:
+        quiz_cache.record(quiz_cache.RECENT_QUESTIONS, misses=1)
+    return _union(cache.get_many(_window_bucket_keys(user_id)))
+
+
+async def aget_recent_question_ids(user_id):
+    """get_recent_question_ids の非同期版"""
+    if await _aensure_seeded(user_id):
+        quiz_cache.record(quiz_cache.RECENT_QUESTIONS, hits=1)
+    else:
+        quiz_cache.record(quiz_cache.RECENT_QUESTIONS, misses=1)
+    return _union(await cache.aget_many(_window_bucket_keys(user_id)))
+
+
+def reset_recent_questions(user_id):
+    """ユーザーの出題履歴をキャッシュから削除する（次回の参照時に受験結果から再構築される）"""
+    cache.delete_many([_seeded_key(user_id)] + _window_bucket_keys(user_id))
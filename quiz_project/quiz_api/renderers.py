@@ -0,0 +1,124 @@
+# quiz_api/renderers.py
+import json
+from collections.abc import Mapping
+
+from rest_framework.renderers import JSONRenderer
+
+
+class RawJSON(Mapping):
+    """シリアライズ済みのJSON（bytes）をレスポンスにそのまま埋め込むためのラッパー
+
+    レンダラーはバイト列を再エンコードせずに連結する。
+    テストなどで response.data から参照された場合のみ遅延デコードする。
+    encoded（レスポンス全体の圧縮済みの表現）と deflate_block（連結用の deflate ブロック）は
+    CompressionMiddleware が使う（compression.py）。
+    """
+    __slots__ = ('raw', '_value', 'encoded', 'deflate_block')
+
+    def __init__(self, raw, encoded=None, deflate_block=None):
+        self.raw = raw
+        self._value = None
+        self.encoded = encoded or {}
+        self.deflate_block = deflate_block
+
+    def _decoded(self):
+        if self._value is None:
+            self._value = json.loads(self.raw)
+        return self._value
+
+    def __getitem__(self, key):
+        return self._decoded()[key]
+
+    def __iter__(self):
+        return iter(self._decoded())
+
+    def __len__(self):
+        return len(self._decoded())
+
+    def __eq__(self, other):
+        if isinstance(other, RawJSON):
+            other = other._decoded()
+        return self._decoded() == other
+
+    def __repr__(self):
+        return f'RawJSON({self.raw!r})'
+
+
+def _has_raw_json(data):
+    """トップレベルの dict の値、またはその値のリスト要素に RawJSON があるか"""
+    if not isinstance(data, dict):
+        return False
+    for value in data.values():
+        if isinstance(value, RawJSON):
+            return True
+        if isinstance(value, list) and any(isinstance(item, RawJSON) for item in value):
+            return True
+    return False
+
+
+def _decode_raw_json(data):
+    """RawJSON を通常の dict に戻す（インデント付き出力用）"""
+    decoded = {}
+    for key, value in data.items():
+        if isinstance(value, RawJSON):
+            value = value._decoded()
+        elif isinstance(value, list):
+            value = [item._decoded() if isinstance(item, RawJSON) else item for item in value]
+        decoded[key] = value
+    return decoded
+
+
+class QuizJSONRenderer(JSONRenderer):
+    """RawJSON 断片をそのまま連結できる JSONRenderer"""
+
+    def encode(self, data, accepted_media_type=None, renderer_context=None):
+        """RawJSON を含まない値をJSONのバイト列にする（fast_json.QuizORJSONRenderer が差し替える）"""
+        return super().render(data, accepted_media_type, renderer_context)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, RawJSON) and not _has_raw_json(data):
+            return self.encode(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            # Browsable API などのインデント指定時は通常の経路で整形する
+            decoded = data._decoded() if isinstance(data, RawJSON) else _decode_raw_json(data)
+            return super().render(decoded, accepted_media_type, renderer_context)
+
+        item_separator, key_separator = (b',', b':') if self.compact else (b', ', b': ')
+        # bytes と RawJSON の並び（連結したものが本文）
+        parts = []
+
+        def add(value):
+            if isinstance(value, RawJSON):
+                parts.append(value)
+            elif value is None:
+                # JSONRenderer は None を空のバイト列として扱うため明示する
+                parts.append(b'null')
+            elif isinstance(value, list) and any(isinstance(item, RawJSON) for item in value):
+                parts.append(b'[')
+                for index, item in enumerate(value):
+                    if index:
+                        parts.append(item_separator)
+                    add(item)
+                parts.append(b']')
+            else:
+                parts.append(self.encode(value, accepted_media_type, renderer_context))
+
+        if isinstance(data, RawJSON):
+            add(data)
+        else:
+            parts.append(b'{')
+            for index, (key, value) in enumerate(data.items()):
+                if index:
+                    parts.append(item_separator)
+                add(str(key))
+                parts.append(key_separator)
+                add(value)
+            parts.append(b'}')
+
+        response = renderer_context.get('response')
+        if response is not None:
+            # CompressionMiddleware が圧縮済みの表現を使えるように並びを残す
+            response.json_parts = parts
+        return b''.join(part.raw if isinstance(part, RawJSON) else part for part in parts)
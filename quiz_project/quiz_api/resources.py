@@ -3,6 +3,7 @@ from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget
 from .models import Category, Question, Choice
 from django.db import transaction
+from django.db.models import Prefetch
 
 class CategoryResource(resources.ModelResource):
     class Meta:
@@ -116,43 +117,58 @@ class UnifiedQuizResource(resources.ModelResource):
         # 成功したインポートの結果を返す
         return question
     
+    EXPORT_HEADERS = ['カテゴリー', '質問', '選択肢1', '選択肢2', '選択肢3', '選択肢4', '選択肢5', '選択肢6', '正解番号']
+    
     def export_data(self, queryset=None):
-        """統一CSV形式でエクスポート"""
+        """統一CSV形式でエクスポート（全行をリストで返す。大量データは iter_export_rows を使用）"""
+        return list(self.iter_export_rows(queryset))
+    
+    def iter_export_rows(self, queryset=None, chunk_size=1000):
+        """統一CSV形式の行をヘッダーから順に1行ずつ返す
+        
+        質問はID順のキーセットページングで chunk_size 件ずつ取得し、
+        選択肢はチャンクごとに prefetch するため、使用メモリは件数に依存しない。
+        """
         if queryset is None:
-            # 全ての質問を取得
-            questions = Question.objects.all().select_related('category').prefetch_related('choices')
-        else:
-            questions = queryset.select_related('category').prefetch_related('choices')
+            queryset = Question.objects.all()
+        queryset = queryset.select_related('category').prefetch_related(
+            Prefetch('choices', queryset=Choice.objects.order_by('id'))
+        ).order_by('id')
         
-        # CSV用のデータを準備
-        data = []
-        headers = ['カテゴリー', '質問', '選択肢1', '選択肢2', '選択肢3', '選択肢4', '選択肢5', '選択肢6', '正解番号']
+        yield self.EXPORT_HEADERS
         
-        # ヘッダーを追加
-        data.append(headers)
+        last_id = 0
+        while True:
+            questions = list(queryset.filter(id__gt=last_id)[:chunk_size])
+            if not questions:
+                break
+            for question in questions:
+                row = self.export_row(question)
+                if row is not None:
+                    yield row
+            last_id = questions[-1].id
+    
+    def export_row(self, question):
+        """質問1件をCSVの1行に変換する（選択肢のない質問は None）"""
+        choices = list(question.choices.all())
+        if not choices:
+            return None
         
-        for question in questions:
-            choices = list(question.choices.all())
-            if not choices:
-                continue
-                
-            row = [question.category.name, question.text]
-            
-            # 選択肢を追加（最大6個）
-            for i in range(6):
-                if i < len(choices):
-                    row.append(choices[i].text)
-                else:
-                    row.append('')
-            
-            # 正解番号を見つける
-            correct_answer = 1
-            for i, choice in enumerate(choices, 1):
-                if choice.is_correct:
-                    correct_answer = i
-                    break
-            
-            row.append(str(correct_answer))
-            data.append(row)
+        row = [question.category.name, question.text]
+        
+        # 選択肢を追加（最大6個）
+        for i in range(6):
+            if i < len(choices):
+                row.append(choices[i].text)
+            else:
+                row.append('')
         
-        return data
\ No newline at end of file
+        # 正解番号を見つける
+        correct_answer = 1
+        for i, choice in enumerate(choices, 1):
+            if choice.is_correct:
+                correct_answer = i
+                break
+        
+        row.append(str(correct_answer))
+        return row
@@ -1,6 +1,9 @@
 # quiz_api/serializers.py
+from django.db import transaction
 from rest_framework import serializers
 from .models import Category, Question, Choice, QuizAttempt, QuestionResponse
+from .answer_keys import get_answer_key
+from .recent_questions import add_recent_questions
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import get_user_model
@@ -19,6 +22,20 @@ class QuestionSerializer(serializers.ModelSerializer):
         model = Question
         fields = ['id', 'text', 'image', 'choices']
 
+class PublicChoiceSerializer(serializers.ModelSerializer):
+    """正解情報を含まない選択肢（サーバー採点モード用）"""
+    class Meta:
+        model = Choice
+        fields = ['id', 'text']
+
+class PublicQuestionSerializer(serializers.ModelSerializer):
+    """正解情報を含まない問題（サーバー採点モード用）"""
+    choices = PublicChoiceSerializer(many=True, read_only=True)
+    
+    class Meta:
+        model = Question
+        fields = ['id', 'text', 'image', 'choices']
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -84,56 +101,101 @@ class QuizAttemptSerializer(serializers.ModelSerializer):
         responses = obj.responses.all()
         return QuestionResponseSerializer(responses, many=True).data
 
+class QuizAttemptSummarySerializer(serializers.ModelSerializer):
+    """履歴一覧用（受験結果の項目のみ。回答の詳細は QuizAttemptDetailView で取得する）"""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    created_at = serializers.DateTimeField(format='%Y-%m-%dT%H:%M:%SZ')
+
+    class Meta:
+        model = QuizAttempt
+        fields = ['id', 'category', 'category_name', 'score', 'total_questions', 'percentage', 'created_at']
+
 class ResponseSerializer(serializers.Serializer):
     question_id = serializers.IntegerField()
     selected_choice_id = serializers.IntegerField()
-    is_correct = serializers.BooleanField()
+    # 正誤はサーバー側で判定する（送信された値は使用しない）
+    is_correct = serializers.BooleanField(required=False)
 
 class SaveQuizResultSerializer(serializers.Serializer):
     category_id = serializers.IntegerField(min_value=1)
-    score = serializers.IntegerField(min_value=0)
+    # スコアはサーバー側で採点する（送信された値は範囲チェックのみ）
+    score = serializers.IntegerField(min_value=0, required=False)
     total_questions = serializers.IntegerField(min_value=1)
     responses = ResponseSerializer(many=True)
 
     def validate(self, attrs):
-        if attrs['score'] > attrs['total_questions']:
+        if attrs.get('score', 0) > attrs['total_questions']:
             raise serializers.ValidationError(
                 {"score": "スコアは問題数以下である必要があります"}
             )
+        if len(attrs['responses']) > attrs['total_questions']:
+            raise serializers.ValidationError(
+                {"responses": "回答数は問題数以下である必要があります"}
+            )
+        question_ids = [response['question_id'] for response in attrs['responses']]
+        if len(set(question_ids)) != len(question_ids):
+            raise serializers.ValidationError(
+                {"responses": "同じ問題への回答が複数含まれています"}
+            )
         if not Category.objects.filter(id=attrs['category_id']).exists():
             raise serializers.ValidationError(
                 {"category_id": "指定されたカテゴリが存在しません"}
             )
+        self._grade_responses(attrs['category_id'], attrs['responses'])
         return attrs
 
+    def _grade_responses(self, category_id, responses_data):
+        """解答対応表で選択肢を検証し、各回答の is_correct をサーバー側で設定する"""
+        if not responses_data:
+            return
+        answer_key = get_answer_key(category_id, {response['question_id'] for response in responses_data})
+        invalid_rows = []
+        for index, response in enumerate(responses_data, 1):
+            choices = answer_key.get(response['question_id'], {})
+            if response['selected_choice_id'] not in choices:
+                invalid_rows.append(index)
+                continue
+            response['is_correct'] = choices[response['selected_choice_id']]
+        if invalid_rows:
+            raise serializers.ValidationError(
+                {"responses": f"存在しない、または問題に属さない選択肢が指定されています（{', '.join(map(str, invalid_rows[:10]))}件目）"}
+            )
+
+    @transaction.atomic
     def create(self, validated_data):
+        # QuizAttempt の post_save シグナルで UserCategoryStats も同じトランザクション内で更新される
         user = self.context['request'].user
         responses_data = validated_data.pop('responses')
         
-        # スコアと質問数
-        score = validated_data['score']
+        # スコアは validate() で採点済みの回答から算出
+        score = sum(1 for response_data in responses_data if response_data['is_correct'])
         total_questions = validated_data['total_questions']
         
         # パーセンテージを計算
         percentage = (score / total_questions * 100) if total_questions > 0 else 0
         
-        # QuizAttemptの作成（percentageフィールドを含める）
         quiz_attempt = QuizAttempt.objects.create(
             user=user,
             category_id=validated_data['category_id'],
             score=score,
             total_questions=total_questions,
-            percentage=percentage  # この行を追加
+            percentage=percentage
         )
         
-        # 各回答の保存処理（オプション）
-        for response_data in responses_data:
-            QuestionResponse.objects.create(
+        # 各回答をまとめて保存
+        QuestionResponse.objects.bulk_create([
+            QuestionResponse(
                 quiz_attempt=quiz_attempt,
                 question_id=response_data['question_id'],
                 selected_choice_id=response_data['selected_choice_id'],
                 is_correct=response_data['is_correct']
             )
+            for response_data in responses_data
+        ])
+        
+        # 次回のクイズセッションで除外する問題として記録（ロールバックされた保存は記録しない）
+        question_ids = [response_data['question_id'] for response_data in responses_data]
+        transaction.on_commit(lambda: add_recent_questions(user.id, question_ids))
         
         return quiz_attempt
 
@@ -0,0 +1,137 @@
+# quiz_api/signals.py
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import cache as quiz_cache
+from .content_versions import bump_attempts_version, bump_content_version
+from .models import Category, Question, Choice, QuizAttempt, UserCategoryStats
+from .stats_snapshot import add_to_stats
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_question_caches(sender, **kwargs):
+    """問題・選択肢の変更時に出題用IDプール・解答対応表・シリアライズ済みJSONを破棄する"""
+    quiz_cache.invalidate(quiz_cache.QUESTION_POOL, quiz_cache.ANSWER_KEYS, quiz_cache.QUESTION_JSON)
+
+
+# カテゴリが分からない選択肢の変更（問題ID）。コミット後に1回の問い合わせでまとめて版を更新する
+_pending_choice_questions = threading.local()
+
+
+def _bump_pending_choice_categories():
+    question_ids = getattr(_pending_choice_questions, 'ids', None)
+    if not question_ids:
+        return
+    _pending_choice_questions.ids = set()
+    category_ids = set(Question.objects.filter(pk__in=question_ids).values_list('category_id', flat=True))
+    for category_id in category_ids:
+        bump_content_version(category_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def bump_category_content(sender, instance, created=False, update_fields=None, signal=None, **kwargs):
+    """問題・選択肢の変更時にカテゴリのコンテンツの版を更新する"""
+    if sender is Question:
+        if signal is post_save and not created and (update_fields is None or 'category' in update_fields):
+            # 変更前のカテゴリは分からないため全カテゴリの版を更新する
+            bump_content_version()
+        else:
+            bump_content_version(instance.category_id)
+        return
+    if Choice.question.is_cached(instance):
+        bump_content_version(instance.question.category_id)
+        return
+    # 問題の削除に伴う選択肢の削除などは、問題側のシグナルでもカテゴリの版が更新される
+    if not hasattr(_pending_choice_questions, 'ids'):
+        _pending_choice_questions.ids = set()
+    _pending_choice_questions.ids.add(instance.question_id)
+    transaction.on_commit(_bump_pending_choice_categories)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_caches(sender, **kwargs):
+    """カテゴリの変更時にカテゴリ一覧のキャッシュを破棄する"""
+    quiz_cache.invalidate(quiz_cache.CATEGORIES)
+
+
+# 集計に使う受験結果の項目
+STATS_FIELDS = ('user_id', 'category_id', 'score', 'total_questions')
+
+
+@receiver(pre_save, sender=QuizAttempt)
+def remember_attempt_stats(sender, instance, update_fields=None, **kwargs):
+    """既存の受験結果を更新する前に、集計に使う項目の保存済みの値を控える"""
+    instance._stats_previous = None
+    if instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not {'user', 'category', 'score', 'total_questions'} & set(update_fields):
+        return
+    instance._stats_previous = QuizAttempt.objects.filter(pk=instance.pk).values_list(*STATS_FIELDS).first()
+
+
+@receiver(post_save, sender=QuizAttempt)
+def add_attempt_to_stats(sender, instance, created, **kwargs):
+    """受験結果の保存時にリーダーボード集計へ加算する（更新時は変更前の値を減算してから加算し直す）"""
+    if created:
+        UserCategoryStats.record_attempt(
+            instance.user_id, instance.category_id, instance.score, instance.total_questions
+        )
+    else:
+        previous = getattr(instance, '_stats_previous', None)
+        current = tuple(getattr(instance, field) for field in STATS_FIELDS)
+        if previous is not None and previous != current:
+            UserCategoryStats.record_attempt(*previous, sign=-1)
+            UserCategoryStats.record_attempt(*current)
+            if previous[0] != current[0]:
+                bump_attempts_version(previous[0])
+    quiz_cache.invalidate(quiz_cache.LEADERBOARD)
+    bump_attempts_version(instance.user_id)
+
+
+@receiver(post_delete, sender=QuizAttempt)
+def remove_attempt_from_stats(sender, instance, **kwargs):
+    """受験結果の削除時にリーダーボード集計から減算する"""
+    UserCategoryStats.record_attempt(
+        instance.user_id, instance.category_id, instance.score, instance.total_questions, sign=-1
+    )
+    quiz_cache.invalidate(quiz_cache.LEADERBOARD)
+    bump_attempts_version(instance.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_save, sender=QuizAttempt)
+def count_created_objects(sender, instance, created, **kwargs):
+    """作成時に管理画面の件数スナップショットに加算する"""
+    if not created:
+        return
+    if sender is Category:
+        add_to_stats(categories=1)
+    elif sender is Question:
+        add_to_stats(questions=1)
+    elif sender is Choice:
+        add_to_stats(choices=1)
+    else:
+        add_to_stats(attempts=1)
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Choice)
+@receiver(post_delete, sender=QuizAttempt)
+def count_deleted_objects(sender, instance, **kwargs):
+    """削除時に管理画面の件数スナップショットから減算する"""
+    if sender is Category:
+        add_to_stats(categories=-1)
+    elif sender is Question:
+        add_to_stats(questions=-1)
+    elif sender is Choice:
+        add_to_stats(choices=-1)
+    else:
+        add_to_stats(attempts=-1)
@@ -0,0 +1,63 @@
+# quiz_api/stats_snapshot.py
+"""管理画面用の件数スナップショット
+
+カテゴリ・問題・選択肢・受験結果の総数を1件のレコードとして
+共有キャッシュ（cache.STATS）に保存し、管理画面の各ページはこのレコードだけを参照する。
+作成・削除はシグナルからコミット後に差分を加算し（signals.py）、
+bulk_create などシグナルを送らない変更はバージョン更新（cache.STATS）で破棄する。
+差分の加算は読み書きが不可分ではないため、構築から SNAPSHOT_TIMEOUT 秒で必ず作り直す。
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from . import cache as quiz_cache
+from .models import Category, Choice, Question, QuizAttempt
+
+SNAPSHOT_TIMEOUT = 5 * 60
+
+# 差分を加算できる総数の項目
+COUNTERS = ('categories', 'questions', 'choices', 'attempts')
+
+
+def _build_snapshot():
+    return {
+        'categories': Category.objects.count(),
+        'questions': Question.objects.count(),
+        'choices': Choice.objects.count(),
+        'attempts': QuizAttempt.objects.count(),
+        'built_at': time.time(),
+    }
+
+
+def get_stats_snapshot():
+    """件数スナップショットを返す（キャッシュがなければ集計クエリで構築）"""
+    return quiz_cache.cache_aside(quiz_cache.STATS, ['snapshot'], _build_snapshot, timeout=SNAPSHOT_TIMEOUT)
+
+
+def _apply_delta(deltas):
+    key = quiz_cache.make_key(quiz_cache.STATS, 'snapshot')
+    snapshot = cache.get(key)
+    if snapshot is None:
+        # キャッシュがなければ次回の参照時に構築される
+        return
+    for name, delta in deltas.items():
+        snapshot[name] = max(snapshot[name] + delta, 0)
+    # 残りの有効期限は構築時刻から数え、差分の加算では延長しない
+    remaining = SNAPSHOT_TIMEOUT - (time.time() - snapshot['built_at'])
+    if remaining < 1:
+        cache.delete(key)
+        return
+    cache.set(key, snapshot, int(remaining))
+
+
+def add_to_stats(**deltas):
+    """コミット後にスナップショットへ差分を加算する
+
+    例: add_to_stats(questions=1, choices=4)
+    """
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f'不明な項目です: {", ".join(sorted(unknown))}')
+    transaction.on_commit(lambda: _apply_delta(deltas))
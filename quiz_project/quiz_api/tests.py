@@ -1,6 +1,19 @@
-from django.test import TestCase, override_settings
+import io
+import random
+from importlib.util import find_spec
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth.models import User
-from .models import Category, Question, Choice, QuizAttempt, QuizSession, QuestionResponse
+from .models import (
+    Category, Question, Choice, QuizAttempt, QuizSession, QuestionResponse,
+    UserCategoryStats, ImportJob, pack_question_ids, unpack_question_ids,
+)
+from .answer_keys import get_category_answer_key, invalidate_answer_keys
+from .question_cache import invalidate_question_fragments
+from .question_pool import get_question_pool, invalidate_question_pools, sample_question_ids, seeded_random
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -146,7 +159,8 @@ class QuizSessionModelTest(TestCase):
             category=self.category
         )
         self.assertEqual(session.session_id, "test_session_123")
-        self.assertEqual(session.used_questions.count(), 0)
+        self.assertEqual(session.used_count, 0)
+        self.assertEqual(session.get_used_question_ids(), set())
 
     def test_quiz_session_track_questions(self):
         """使用した問題を記録できるか"""
@@ -155,11 +169,73 @@ class QuizSessionModelTest(TestCase):
             user=self.user,
             category=self.category
         )
-        session.used_questions.add(self.question1)
-        session.used_questions.add(self.question2)
+        session.mark_questions_used([self.question1.id])
+        session.mark_questions_used([self.question2.id, self.question1.id])
+        session.save()
 
-        self.assertEqual(session.used_questions.count(), 2)
-        self.assertIn(self.question1, session.used_questions.all())
+        session.refresh_from_db()
+        self.assertEqual(session.used_count, 2)
+        self.assertIn(self.question1.id, session.get_used_question_ids())
+
+    def test_quiz_session_reset(self):
+        """出題済みの記録をクリアできるか"""
+        session = QuizSession.objects.create(session_id="test_session_789")
+        session.mark_questions_used([self.question1.id])
+        session.reset_used_questions()
+        self.assertEqual(session.used_count, 0)
+        self.assertEqual(session.get_used_question_ids(), set())
+
+    def test_pack_question_ids_roundtrip(self):
+        """問題IDのパックと復元が一致するか"""
+        ids = {1, 2, 3, 10, 500, 2**40}
+        self.assertEqual(unpack_question_ids(pack_question_ids(ids)), ids)
+        self.assertEqual(pack_question_ids([]), b'')
+        self.assertEqual(unpack_question_ids(b''), set())
+
+
+class SessionQuestionsAPITest(APITestCase):
+    """セッション管理型問題取得APIのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="Math")
+        for i in range(5):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            Choice.objects.create(question=q, text="A", is_correct=True)
+        self.url = f'/api/questions/session_questions/?category={self.category.id}&limit=2&session_id=s1'
+
+    def test_session_questions_no_duplicates(self):
+        """同じセッションで問題が重複しないか"""
+        seen = []
+        for _ in range(2):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(q['id'] for q in response.data['results'])
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(response.data['used_count'], 4)
+        self.assertEqual(response.data['remaining'], 1)
+        self.assertEqual(QuizSession.objects.get(session_id='s1').get_used_question_ids(), set(seen))
+
+    def test_session_resets_when_exhausted(self):
+        """全問出題済みになるとセッションがリセットされるか"""
+        for _ in range(3):
+            self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertIn('リセット', response.data['message'])
+        self.assertEqual(response.data['used_count'], 2)
+
+    def test_session_reset_parameter(self):
+        """reset=true で出題済みの記録がクリアされるか"""
+        self.client.get(self.url)
+        response = self.client.get(self.url + '&reset=true')
+        self.assertEqual(response.data['used_count'], 2)
+
+    def test_session_questions_single_row_write(self):
+        """既存セッションはセッション行の読み込み1回・書き込み1回で処理されるか"""
+        self.client.get(self.url)
+        # セッション取得 + 更新 + 問題取得 + 選択肢取得
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
 
 
 class QuizAPITest(APITestCase):
@@ -458,6 +534,10 @@ class RandomQuestionsAPITest(APITestCase):
         r2 = self.client.get('/api/questions/unique_random/?limit=3&seed=42')
         self.assertEqual(r1.status_code, status.HTTP_200_OK)
         self.assertEqual(r2.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [q['id'] for q in r1.data['results']],
+            [q['id'] for q in r2.data['results']],
+        )
 
     def test_unique_random_empty_category(self):
         """問題のないカテゴリで空結果が返るか"""
@@ -654,3 +734,2270 @@ class QuestionResponseModelTest(TestCase):
         )
         self.assertFalse(response.is_correct)
         self.assertIn('不正解', str(response))
+
+
+class QuestionPoolTest(APITestCase):
+    """出題用問題IDプールのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_question_pools()
+        self.category = Category.objects.create(name="Math")
+        self.questions = []
+        for i in range(5):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            Choice.objects.create(question=q, text="A", is_correct=True)
+            Choice.objects.create(question=q, text="B", is_correct=False)
+            self.questions.append(q)
+        # 選択肢のない問題はプールに含まれない
+        self.no_choice_question = Question.objects.create(category=self.category, text="No choices")
+
+    def test_pool_contains_only_questions_with_choices(self):
+        """選択肢のある問題のIDだけがプールに入るか"""
+        pool = get_question_pool(self.category.id)
+        self.assertEqual(list(pool), [q.id for q in self.questions])
+
+    def test_pool_invalidated_on_choice_save(self):
+        """選択肢の追加でプールが更新されるか"""
+        get_question_pool(self.category.id)
+        Choice.objects.create(question=self.no_choice_question, text="A", is_correct=True)
+        self.assertIn(self.no_choice_question.id, get_question_pool(self.category.id))
+
+    def test_pool_invalidated_on_question_delete(self):
+        """問題の削除でプールが更新されるか"""
+        get_question_pool(self.category.id)
+        deleted_id = self.questions[0].id
+        self.questions[0].delete()
+        self.assertNotIn(deleted_id, get_question_pool(self.category.id))
+
+    def test_invalid_category_uses_all_questions(self):
+        """不正なカテゴリ指定は全カテゴリ扱いになるか"""
+        self.assertEqual(list(get_question_pool('abc')), list(get_question_pool(None)))
+
+    def test_unique_random_query_count_independent_of_category_size(self):
+        """プール構築後はカテゴリの問題数に関係なく一定のクエリ数で取得できるか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=3'
+        get_question_pool(self.category.id)
+        # 問題取得 + 選択肢取得（JSON断片のキャッシュなし）
+        invalidate_question_fragments()
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['total_available'], 5)
+
+        for i in range(20):
+            q = Question.objects.create(category=self.category, text=f"Extra{i}")
+            Choice.objects.create(question=q, text="A", is_correct=True)
+        get_question_pool(self.category.id)
+        invalidate_question_fragments()
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.data['total_available'], 25)
+
+    def test_seeded_sample_is_stable(self):
+        """同じシードとカテゴリなら同じIDの並びになるか（文字列のシードも含む）"""
+        for seed in ('42', 'weekly-2024-05'):
+            first = sample_question_ids(self.category.id, 3, rng=seeded_random(seed))
+            # プールを作り直しても結果はIDだけで決まる
+            invalidate_question_pools()
+            second = sample_question_ids(self.category.id, 3, rng=seeded_random(seed))
+            self.assertEqual(first, second)
+            self.assertEqual(len(set(first)), 3)
+
+    def test_integer_seed_matches_previous_order(self):
+        """整数のシードは従来の random.seed(int(seed)) と同じ並びになるか"""
+        pool = get_question_pool(self.category.id)
+        expected = random.Random(12345).sample(pool, 3)
+        self.assertEqual(sample_question_ids(self.category.id, 3, rng=seeded_random('12345')), expected)
+
+    def test_seeded_request_keeps_global_random_state(self):
+        """シード指定のリクエストがグローバルの random の状態を変えないか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=3&seed=7'
+        self.client.get(url)
+        random.seed(2024)
+        state = random.getstate()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(random.getstate(), state)
+
+    def test_seeded_request_served_from_cache(self):
+        """プールとJSON断片がキャッシュ済みならシード指定でもクエリなしで返せるか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=3&seed=abc'
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data['results'], second.data['results'])
+
+
+class UserCategoryStatsTest(APITestCase):
+    """リーダーボード集計テーブルのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='statsuser', password='testpass123')
+        self.other_user = User.objects.create_user(username='otheruser', password='testpass123')
+        self.math = Category.objects.create(name="Math")
+        self.science = Category.objects.create(name="Science")
+
+    def _stats(self, user, category=None):
+        return UserCategoryStats.objects.get(user=user, category=category)
+
+    def test_stats_incremented_on_attempt_create(self):
+        """受験結果の保存でカテゴリ行と全体行が加算されるか"""
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=8, total_questions=10, percentage=80.0)
+        QuizAttempt.objects.create(user=self.user, category=self.science, score=2, total_questions=10, percentage=20.0)
+
+        math_stats = self._stats(self.user, self.math)
+        self.assertEqual((math_stats.attempts, math_stats.score_sum, math_stats.questions_sum), (1, 8, 10))
+        self.assertAlmostEqual(math_stats.avg_percentage, 80.0)
+
+        overall = self._stats(self.user)
+        self.assertEqual((overall.attempts, overall.score_sum, overall.questions_sum), (2, 10, 20))
+        self.assertAlmostEqual(overall.avg_percentage, 50.0)
+
+    def test_stats_decremented_on_attempt_delete(self):
+        """受験結果の削除で集計が減算されるか"""
+        attempt = QuizAttempt.objects.create(user=self.user, category=self.math, score=8, total_questions=10, percentage=80.0)
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=4, total_questions=10, percentage=40.0)
+        attempt.delete()
+
+        math_stats = self._stats(self.user, self.math)
+        self.assertEqual((math_stats.attempts, math_stats.score_sum), (1, 4))
+        self.assertAlmostEqual(math_stats.avg_percentage, 40.0)
+
+    def test_stats_corrected_on_attempt_edit(self):
+        """既存の受験結果のスコア・カテゴリを変更すると集計が差し替えられ、再構築の結果と一致するか"""
+        from django.core.management import call_command
+
+        attempt = QuizAttempt.objects.create(user=self.user, category=self.math, score=8, total_questions=10, percentage=80.0)
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=4, total_questions=10, percentage=40.0)
+        attempt.score = 2
+        attempt.save()
+        math_stats = self._stats(self.user, self.math)
+        self.assertEqual((math_stats.attempts, math_stats.score_sum, math_stats.questions_sum), (2, 6, 20))
+        self.assertAlmostEqual(math_stats.avg_percentage, 30.0)
+
+        attempt.category = self.science
+        attempt.total_questions = 5
+        attempt.save(update_fields=['category', 'total_questions'])
+        # 集計に関係しない項目だけの更新では変わらない
+        attempt.percentage = 40.0
+        attempt.save(update_fields=['percentage'])
+        self.assertEqual((self._stats(self.user, self.math).attempts, self._stats(self.user, self.math).score_sum), (1, 4))
+        self.assertEqual((self._stats(self.user, self.science).score_sum, self._stats(self.user, self.science).questions_sum), (2, 5))
+        overall = self._stats(self.user)
+        self.assertEqual((overall.attempts, overall.score_sum, overall.questions_sum), (2, 6, 15))
+
+        fields = ('user_id', 'category_id', 'attempts', 'score_sum', 'questions_sum', 'avg_percentage')
+        incremental = set(UserCategoryStats.objects.filter(attempts__gt=0).values_list(*fields))
+        UserCategoryStats.objects.all().delete()
+        call_command('rebuild_leaderboard_stats', stdout=io.StringIO())
+        self.assertEqual(set(UserCategoryStats.objects.values_list(*fields)), incremental)
+
+    def test_save_result_updates_stats(self):
+        """結果保存APIで集計が更新されるか"""
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        question = Question.objects.create(category=self.math, text="Q")
+        correct = Choice.objects.create(question=question, text="A", is_correct=True)
+        data = {
+            'category_id': self.math.id, 'total_questions': 5,
+            'responses': [{'question_id': question.id, 'selected_choice_id': correct.id}],
+        }
+        response = self.client.post('/api/quiz/save-result/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._stats(self.user, self.math).score_sum, 1)
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        """再構築コマンドの結果が逐次更新の結果と一致するか"""
+        from django.core.management import call_command
+
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=8, total_questions=10, percentage=80.0)
+        QuizAttempt.objects.create(user=self.other_user, category=self.science, score=5, total_questions=10, percentage=50.0)
+        QuizAttempt.objects.create(user=self.user, category=self.science, score=1, total_questions=4, percentage=25.0)
+        fields = ('user_id', 'category_id', 'attempts', 'score_sum', 'questions_sum', 'avg_percentage')
+        incremental = set(UserCategoryStats.objects.values_list(*fields))
+
+        UserCategoryStats.objects.all().delete()
+        call_command('rebuild_leaderboard_stats', stdout=io.StringIO())
+        self.assertEqual(set(UserCategoryStats.objects.values_list(*fields)), incremental)
+
+    def test_public_leaderboard_reads_stats(self):
+        """公開リーダーボードが集計テーブルの値を返すか"""
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=9, total_questions=10, percentage=90.0)
+        QuizAttempt.objects.create(user=self.other_user, category=self.math, score=3, total_questions=10, percentage=30.0)
+        QuizAttempt.objects.create(user=self.other_user, category=self.science, score=10, total_questions=10, percentage=100.0)
+
+        response = self.client.get(f'/api/quiz/leaderboard/?category={self.math.id}')
+        results = response.data['results']
+        self.assertEqual([r['username'] for r in results], ['statsuser', 'otheruser'])
+        self.assertEqual(results[1]['category_score'], 3)
+        self.assertEqual(results[1]['total_score'], 13)
+
+        response = self.client.get('/api/quiz/leaderboard/')
+        self.assertEqual([r['username'] for r in response.data['results']], ['statsuser', 'otheruser'])
+        self.assertEqual(response.data['results'][0]['category_attempts'], 0)
+
+    def test_authenticated_leaderboard_category_filter(self):
+        """認証リーダーボードのカテゴリフィルターが集計テーブルで動作するか"""
+        QuizAttempt.objects.create(user=self.user, category=self.math, score=9, total_questions=10, percentage=90.0)
+        QuizAttempt.objects.create(user=self.other_user, category=self.science, score=5, total_questions=10, percentage=50.0)
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+        response = self.client.get(f'/api/quiz/leaderboard/authenticated/?category={self.science.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['username'] for r in response.data['results']], ['otheruser'])
+
+        response = self.client.get('/api/quiz/leaderboard/authenticated/')
+        self.assertEqual([r['username'] for r in response.data['results']], ['statsuser', 'otheruser'])
+
+
+class UserStatsAPITest(APITestCase):
+    """ユーザー統計APIのテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='statsuser', password='testpass123')
+        self.categories = [Category.objects.create(name=f"Cat{i}") for i in range(6)]
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _attempt(self, category, score, total=10):
+        QuizAttempt.objects.create(
+            user=self.user, category=category,
+            score=score, total_questions=total, percentage=score * 100.0 / total
+        )
+
+    def test_stats_payload(self):
+        """カテゴリ別・全体の統計値が正しく計算されるか"""
+        self._attempt(self.categories[0], 8)
+        self._attempt(self.categories[0], 6)
+        self._attempt(self.categories[1], 3, total=5)
+
+        response = self.client.get('/api/user/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_attempts'], 3)
+        self.assertEqual(response.data['total_categories_played'], 2)
+        self.assertEqual(response.data['best_category'], 'Cat0')
+        self.assertEqual(response.data['avg_percentage'], 68.0)
+        cat0 = response.data['category_stats'][0]
+        self.assertEqual(cat0['attempts_count'], 2)
+        self.assertEqual(cat0['best_score'], 8)
+        self.assertEqual(cat0['avg_percentage'], 70.0)
+
+    def test_stats_without_attempts(self):
+        """受験記録がない場合にゼロ値が返るか"""
+        response = self.client.get('/api/user/stats/')
+        self.assertEqual(response.data['total_attempts'], 0)
+        self.assertIsNone(response.data['best_category'])
+        self.assertEqual(response.data['category_stats'], [])
+
+    def test_stats_query_count_constant(self):
+        """プレイしたカテゴリ数に関係なくクエリ数が一定か"""
+        self._attempt(self.categories[0], 5)
+        # ユーザー取得（JWT認証） + 集計クエリ
+        with self.assertNumQueries(2):
+            self.client.get('/api/user/stats/')
+
+        for category in self.categories:
+            self._attempt(category, 7)
+            self._attempt(category, 4)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/user/stats/')
+        self.assertEqual(response.data['total_categories_played'], 6)
+
+
+class SaveQuizResultAPITest(APITestCase):
+    """クイズ結果保存（一括登録）のテスト"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.pairs = []
+        for i in range(20):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            correct = Choice.objects.create(question=q, text="A", is_correct=True)
+            Choice.objects.create(question=q, text="B", is_correct=False)
+            self.pairs.append((q, correct))
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _payload(self, pairs):
+        return {
+            'category_id': self.category.id,
+            'score': len(pairs),
+            'total_questions': len(pairs),
+            'responses': [
+                {'question_id': q.id, 'selected_choice_id': c.id, 'is_correct': True}
+                for q, c in pairs
+            ],
+        }
+
+    def test_responses_saved_with_bulk_insert(self):
+        """回答数に関係なく一定のクエリ数で保存されるか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        # 初回は集計行の作成が入るため、2回目以降で比較する
+        self.client.post('/api/quiz/save-result/', self._payload(self.pairs[:1]), format='json')
+        with CaptureQueriesContext(connection) as small:
+            self.client.post('/api/quiz/save-result/', self._payload(self.pairs[:2]), format='json')
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.post('/api/quiz/save-result/', self._payload(self.pairs), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(QuizAttempt.objects.first().responses.count(), 20)
+
+    def test_mismatched_choice_rejected(self):
+        """問題に属さない選択肢が指定された場合にエラーになり何も保存されないか"""
+        payload = self._payload(self.pairs[:2])
+        payload['responses'][1]['selected_choice_id'] = self.pairs[0][1].id
+        response = self.client.post('/api/quiz/save-result/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('responses', response.data)
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+
+    def test_unknown_choice_rejected(self):
+        """存在しない選択肢IDがエラーになるか"""
+        payload = self._payload(self.pairs[:1])
+        payload['responses'][0]['selected_choice_id'] = 999999
+        response = self.client.post('/api/quiz/save-result/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ServerGradingTest(APITestCase):
+    """サーバー側採点のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_answer_keys()
+        self.user = User.objects.create_user(username='grader', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.questions = []
+        for i in range(4):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            correct = Choice.objects.create(question=q, text="A", is_correct=True)
+            wrong = Choice.objects.create(question=q, text="B", is_correct=False)
+            self.questions.append((q, correct, wrong))
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _payload(self, picks, **extra):
+        data = {
+            'category_id': self.category.id,
+            'total_questions': len(picks),
+            'responses': [
+                {'question_id': q.id, 'selected_choice_id': choice.id, 'is_correct': True}
+                for q, choice in picks
+            ],
+        }
+        data.update(extra)
+        return data
+
+    def test_score_computed_on_server(self):
+        """送信されたスコアや正誤ではなくサーバー側の採点結果が保存されるか"""
+        (q1, c1, _), (q2, _, w2), (q3, _, w3), (q4, c4, _) = self.questions
+        payload = self._payload([(q1, c1), (q2, w2), (q3, w3), (q4, c4)], score=4)
+        response = self.client.post('/api/quiz/save-result/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['score'], 2)
+
+        attempt = QuizAttempt.objects.get()
+        self.assertEqual(attempt.score, 2)
+        self.assertEqual(attempt.percentage, 50.0)
+        self.assertEqual(
+            sorted(attempt.responses.values_list('question_id', 'is_correct')),
+            [(q1.id, True), (q2.id, False), (q3.id, False), (q4.id, True)],
+        )
+
+    def test_grading_uses_no_queries_on_warm_cache(self):
+        """解答キャッシュが温まっていれば採点でDB問い合わせが発生しないか"""
+        from .serializers import SaveQuizResultSerializer
+
+        get_category_answer_key(self.category.id)
+        picks = [(q, c) for q, c, _ in self.questions]
+        serializer = SaveQuizResultSerializer(data=self._payload(picks))
+        # カテゴリの存在確認のみ
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid())
+
+    def test_duplicate_question_rejected(self):
+        """同じ問題への正解を繰り返し送信しても採点されずエラーになるか"""
+        q1, c1, _ = self.questions[0]
+        payload = self._payload([(q1, c1)] * 4)
+        response = self.client.post('/api/quiz/save-result/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('responses', response.data)
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+
+    def test_answer_key_invalidated_on_choice_change(self):
+        """選択肢の変更で解答キャッシュが更新されるか"""
+        q1, c1, w1 = self.questions[0]
+        self.assertTrue(get_category_answer_key(self.category.id)[q1.id][c1.id])
+        c1.is_correct = False
+        c1.save()
+        self.assertFalse(get_category_answer_key(self.category.id)[q1.id][c1.id])
+
+    def test_question_from_other_category(self):
+        """カテゴリ外の問題も検証・採点できるか"""
+        other = Category.objects.create(name="Science")
+        q = Question.objects.create(category=other, text="SciQ")
+        c = Choice.objects.create(question=q, text="A", is_correct=True)
+        response = self.client.post('/api/quiz/save-result/', self._payload([(q, c)]), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['score'], 1)
+
+    def test_more_responses_than_questions_rejected(self):
+        """回答数が問題数を超える場合にエラーになるか"""
+        picks = [(q, c) for q, c, _ in self.questions]
+        response = self.client.post('/api/quiz/save-result/', self._payload(picks, total_questions=2), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_hide_answers_mode(self):
+        """hide_answers=true で正解情報が返されないか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}&hide_answers=true'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for question in response.data['results']:
+            for choice in question['choices']:
+                self.assertNotIn('is_correct', choice)
+
+        response = self.client.get(f'/api/questions/unique_random/?category={self.category.id}')
+        self.assertIn('is_correct', response.data['results'][0]['choices'][0])
+
+
+class QuestionFragmentCacheBenchmarkTest(APITestCase):
+    """シリアライズ済みJSON断片キャッシュのベンチマーク"""
+
+    def setUp(self):
+        cache.clear()
+        invalidate_question_pools()
+        self.category = Category.objects.create(name="Bench")
+        for i in range(30):
+            q = Question.objects.create(category=self.category, text=f"問題{i+1}")
+            for j in range(4):
+                Choice.objects.create(question=q, text=f"選択肢{j+1}", is_correct=(j == 0))
+        self.url = f'/api/questions/unique_random/?category={self.category.id}&limit=30'
+
+    def _timed_get(self):
+        import time
+        from unittest import mock
+        from .serializers import QuestionSerializer
+
+        with mock.patch.object(
+            QuestionSerializer, 'to_representation', autospec=True,
+            side_effect=QuestionSerializer.to_representation,
+        ) as to_representation:
+            started = time.perf_counter()
+            response = self.client.get(self.url)
+            elapsed = time.perf_counter() - started
+        return response, to_representation.call_count, elapsed
+
+    def test_unique_random_hot_path_skips_serializer(self):
+        """キャッシュが温まるとシリアライザーもDBも使わずに応答するか"""
+        cold_response, cold_calls, cold_time = self._timed_get()
+        self.assertEqual(cold_calls, 30)
+
+        with self.assertNumQueries(0):
+            warm_response, warm_calls, warm_time = self._timed_get()
+        self.assertEqual(warm_calls, 0)
+        # 所要時間は環境で揺れるため検証せず、参考値として出力するだけにする
+        import sys
+        print(
+            f"\nunique_random limit=30: cold {cold_time * 1000:.1f}ms / warm {warm_time * 1000:.1f}ms",
+            file=sys.stderr,
+        )
+
+        # 断片から組み立てたJSONがシリアライザーの出力と一致するか
+        import json
+        cold = {q['id']: q for q in json.loads(cold_response.content)['results']}
+        warm = {q['id']: q for q in json.loads(warm_response.content)['results']}
+        self.assertEqual(cold, warm)
+        self.assertEqual(warm_response.data['results'][0]['choices'][0]['text'], '選択肢1')
+
+    def test_fragments_invalidated_on_choice_change(self):
+        """選択肢の変更後は新しい内容が返されるか"""
+        self.client.get(self.url)
+        choice = Choice.objects.filter(question__category=self.category, text='選択肢1').first()
+        choice.text = '更新済み'
+        choice.save()
+        response, calls, _ = self._timed_get()
+        self.assertEqual(calls, 30)
+        texts = {c['text'] for q in response.data['results'] for c in q['choices']}
+        self.assertIn('更新済み', texts)
+
+
+class CacheBackendConfigTest(TestCase):
+    """CACHE_URL からのキャッシュ設定のテスト"""
+
+    def test_schemes(self):
+        """各形式のURLが対応するバックエンドに変換されるか"""
+        from .cache_backends import cache_config_from_url
+
+        self.assertEqual(
+            cache_config_from_url('locmem://quiz')['BACKEND'],
+            'django.core.cache.backends.locmem.LocMemCache',
+        )
+        file_config = cache_config_from_url('file:///var/tmp/quiz_cache')
+        self.assertEqual(file_config['BACKEND'], 'django.core.cache.backends.filebased.FileBasedCache')
+        self.assertEqual(file_config['LOCATION'], '/var/tmp/quiz_cache')
+        # 書き込みごとにディレクトリ全体を列挙するため、上限は小さく保つ
+        self.assertLessEqual(file_config['OPTIONS']['MAX_ENTRIES'], 5000)
+        for url in ('redis://localhost:6379/0', 'unix:///run/redis.sock?db=1'):
+            config = cache_config_from_url(url)
+            self.assertEqual(config['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+            self.assertEqual(config['LOCATION'], url)
+        memcached = cache_config_from_url('memcached://127.0.0.1:11211')
+        self.assertEqual(memcached['BACKEND'], 'django.core.cache.backends.memcached.PyMemcacheCache')
+        self.assertEqual(memcached['LOCATION'], '127.0.0.1:11211')
+
+    def test_invalid_url(self):
+        """未対応の形式やディレクトリのないファイルURLはエラーになるか"""
+        from .cache_backends import cache_config_from_url
+
+        with self.assertRaises(ValueError):
+            cache_config_from_url('ftp://example.com')
+        with self.assertRaises(ValueError):
+            cache_config_from_url('file://')
+
+
+class CacheAsideTest(APITestCase):
+    """共有キャッシュ層のテスト"""
+
+    def setUp(self):
+        from . import cache as quiz_cache
+
+        self.quiz_cache = quiz_cache
+        cache.clear()
+        quiz_cache.reset_cache_stats()
+        self.category = Category.objects.create(name="Cache")
+        for i in range(3):
+            q = Question.objects.create(category=self.category, text=f"問題{i+1}")
+            Choice.objects.create(question=q, text="A", is_correct=True)
+
+    def test_hit_miss_and_invalidate(self):
+        """ヒット・ミスが集計され、バージョン更新で再読み込みされるか"""
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return None
+
+        ns = self.quiz_cache.CATEGORIES
+        self.assertIsNone(self.quiz_cache.cache_aside(ns, ['x'], loader))
+        self.assertIsNone(self.quiz_cache.cache_aside(ns, ['x'], loader))
+        self.assertEqual(len(calls), 1)
+        self.quiz_cache.invalidate(ns)
+        self.quiz_cache.cache_aside(ns, ['x'], loader)
+        self.assertEqual(len(calls), 2)
+
+        stats = self.quiz_cache.get_cache_stats()['namespaces'][ns]
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_invalidation_visible_to_other_workers(self):
+        """共有ファイルキャッシュでは別ワーカーでの無効化が反映されるか"""
+        import tempfile
+        from django.core.cache.backends.filebased import FileBasedCache
+        from .cache_backends import cache_config_from_url
+
+        with tempfile.TemporaryDirectory() as location:
+            config = cache_config_from_url(f'file://{location}')
+            with override_settings(CACHES={'default': config}):
+                self.assertEqual(len(get_question_pool(self.category.id)), 3)
+
+                # シグナルを経由しない変更は、このプロセスではまだ見えない
+                q = Question.objects.bulk_create([Question(category=self.category, text="追加")])[0]
+                Choice.objects.bulk_create([Choice(question=q, text="A", is_correct=True)])
+                self.assertEqual(len(get_question_pool(self.category.id)), 3)
+
+                # 別ワーカーが同じディレクトリのバージョンを更新する
+                other_worker = FileBasedCache(location, {'KEY_PREFIX': config['KEY_PREFIX']})
+                other_worker.set('ver:question_pool', 'other-worker', None)
+                self.assertEqual(len(get_question_pool(self.category.id)), 4)
+
+    def test_category_list_cached(self):
+        """カテゴリ一覧は2回目以降DBを使わず、追加で無効化されるか"""
+        self.client.get('/api/categories/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['count'], 1)
+
+        Category.objects.create(name="Added")
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['count'], 2)
+
+    def test_leaderboard_cached_and_invalidated(self):
+        """リーダーボードはキャッシュされ、新しい受験結果で更新されるか"""
+        user = User.objects.create_user(username='cacheuser', password='pass123')
+        QuizAttempt.objects.create(user=user, category=self.category, score=5, total_questions=10, percentage=50.0)
+        url = f'/api/quiz/leaderboard/?category={self.category.id}'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['category_score'], 5)
+
+        QuizAttempt.objects.create(user=user, category=self.category, score=9, total_questions=10, percentage=90.0)
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['category_score'], 14)
+
+    def test_cache_stats_endpoint(self):
+        """管理画面からヒット・ミス数を取得できるか"""
+        admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(admin)
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        response = self.client.get('/quiz-admin/quiz-cache-stats-api/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['namespaces']['categories'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+
+class QuestionListRandomOrderTest(APITestCase):
+    """問題一覧APIのランダム順（IDプールからの抽選）のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name="List")
+        self.questions = []
+        for i in range(25):
+            q = Question.objects.create(category=self.category, text=f"問題{i+1}")
+            if i < 20:
+                Choice.objects.create(question=q, text="A", is_correct=True)
+            self.questions.append(q)
+        self.url = f'/api/questions/?category={self.category.id}'
+
+    def test_random_list_paginates_whole_category(self):
+        """選択肢のない問題も含めてカテゴリ全体がページネーションされるか"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 25)
+        ids = [q['id'] for q in response.data['results']]
+        self.assertEqual(len(ids), 10)
+        self.assertEqual(len(set(ids)), 10)
+        self.assertTrue(set(ids) <= {q.id for q in self.questions})
+        self.assertIsNotNone(response.data['next'])
+
+    def test_random_list_respects_limit(self):
+        """limit がランダム順でも件数の上限として働くか"""
+        response = self.client.get(f'{self.url}&limit=3')
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(len(response.data['results']), 3)
+
+        response = self.client.get(f'{self.url}&limit=999')
+        self.assertEqual(response.data['count'], 25)
+
+    def test_random_list_does_not_sort_by_random(self):
+        """RANDOM() による並べ替えを行わず、一定のクエリ数で取得できるか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.client.get(self.url)
+        invalidate_question_fragments()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        # 問題取得 + 選択肢取得
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('RANDOM()' in q['sql'].upper() for q in queries))
+
+    def test_ordered_list_unchanged(self):
+        """order=id / random=false ではID順のままか"""
+        expected = [q.id for q in self.questions[:10]]
+        for params in ('&order=id', '&random=false'):
+            response = self.client.get(self.url + params)
+            self.assertEqual([q['id'] for q in response.data['results']], expected)
+
+    def test_new_question_included(self):
+        """問題の追加後はプールが更新されて一覧に含まれるか"""
+        self.client.get(self.url)
+        Question.objects.create(category=self.category, text="追加")
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 26)
+
+
+class UnifiedCSVImportTest(TestCase):
+    """統一CSV形式のストリーミングインポートのテスト"""
+
+    HEADER = 'カテゴリー,質問,選択肢1,選択肢2,選択肢3,選択肢4,正解番号\n'
+
+    def setUp(self):
+        cache.clear()
+
+    def _csv(self, rows, header=None, encoding='utf-8', bom=False):
+        text = (header or self.HEADER) + ''.join(rows)
+        data = text.encode(encoding)
+        return io.BytesIO(b'\xef\xbb\xbf' + data if bom else data)
+
+    def _import(self, rows, **kwargs):
+        from .importers import import_csv
+        return import_csv(self._csv(rows), **kwargs)
+
+    def test_import_creates_questions_and_choices(self):
+        """カテゴリー・質問・選択肢が作成され、正解番号が反映されるか"""
+        from .importers import import_csv
+        stream = self._csv(['数学,2+2は?,2,3,4,5,3\n', '英語,appleの意味は?,りんご,みかん,,,1\n'], bom=True)
+        result = import_csv(stream)
+        self.assertEqual(result.encoding, 'utf-8-sig')
+        self.assertEqual((result.total_rows, result.imported, result.error_count), (2, 2, 0))
+        question = Question.objects.get(text='2+2は?')
+        self.assertEqual(question.category.name, '数学')
+        self.assertEqual(question.choices.get(is_correct=True).text, '4')
+        self.assertEqual(Question.objects.get(text='appleの意味は?').choices.count(), 2)
+
+    def test_reimport_replaces_choices(self):
+        """再インポートでは質問を増やさず選択肢を置き換えるか"""
+        self._import(['数学,2+2は?,2,3,4,5,3\n'])
+        result = self._import(['数学,2+2は?,4,5,,,1\n'])
+        self.assertEqual((result.created_questions, result.updated_questions), (0, 1))
+        self.assertEqual(Question.objects.filter(text='2+2は?').count(), 1)
+        self.assertEqual(list(Choice.objects.order_by('id').values_list('text', 'is_correct')), [('4', True), ('5', False)])
+
+    def test_reimport_keeps_response_history(self):
+        """再インポートでは選択肢のIDを保ち、回答履歴を削除しないか"""
+        self._import(['数学,2+2は?,2,3,4,5,3\n'])
+        question = Question.objects.get(text='2+2は?')
+        choice_ids = list(question.choices.order_by('id').values_list('id', flat=True))
+        user = User.objects.create_user(username='player', password='testpass123')
+        attempt = QuizAttempt.objects.create(user=user, category=question.category, score=1, total_questions=1, percentage=100.0)
+        QuestionResponse.objects.create(quiz_attempt=attempt, question=question, selected_choice_id=choice_ids[2], is_correct=True)
+
+        self._import(['数学,2+2は?,3,4,5,,1\n'])
+        self.assertEqual(
+            list(question.choices.order_by('id').values_list('id', 'text', 'is_correct')),
+            [(choice_ids[0], '3', True), (choice_ids[1], '4', False), (choice_ids[2], '5', False)],
+        )
+        self.assertEqual(QuestionResponse.objects.get().selected_choice_id, choice_ids[2])
+
+        # 選択肢が増えた場合は既存の選択肢を残して追加する
+        self._import(['数学,2+2は?,1,2,3,4,4\n'])
+        self.assertEqual(question.choices.count(), 4)
+        self.assertEqual(list(question.choices.order_by('id').values_list('id', flat=True))[:3], choice_ids[:3])
+
+    def test_shift_jis_and_semicolon(self):
+        """Shift_JIS とセミコロン区切りを判定できるか"""
+        from .importers import import_csv
+        header = 'カテゴリー;質問;選択肢1;選択肢2;選択肢3;選択肢4;正解番号\n'
+        result = import_csv(self._csv(['歴史;鎌倉幕府の成立は?;1185;1192;1333;1603;1\n'], header=header, encoding='shift_jis'))
+        self.assertEqual((result.encoding, result.delimiter), ('shift_jis', ';'))
+        self.assertTrue(Question.objects.filter(text='鎌倉幕府の成立は?', category__name='歴史').exists())
+
+    def test_invalid_rows_reported(self):
+        """不正な行はエラーとして報告され、他の行はインポートされるか"""
+        result = self._import(['数学,1+1は?,1,2,,,5\n', ',質問だけ,a,b,,,1\n', '数学,2+2は?,2,3,4,5,3\n'])
+        self.assertEqual((result.imported, result.error_count), (1, 2))
+        self.assertIn('行1: 正解番号が無効です: 5', result.errors)
+        self.assertEqual(Question.objects.count(), 1)
+
+    def test_duplicates_across_chunks(self):
+        """チャンクをまたいだCSV内の重複は1問にまとめられ、警告されるか"""
+        rows = ['数学,2+2は?,2,3,4,5,3\n', '数学,3×3は?,6,9,12,15,2\n', '数学,2+2は?,4,5,,,1\n']
+        result = self._import(rows, chunk_size=2)
+        self.assertEqual(result.duplicate_count, 1)
+        question = Question.objects.get(text='2+2は?')
+        self.assertEqual(question.choices.count(), 2)
+
+    def test_query_count_independent_of_chunk_rows(self):
+        """チャンク内の行数に関係なく一定のクエリ数で保存されるか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        counts = []
+        for size in (10, 60):
+            rows = [f'カテゴリ{size},問題{i},A,B,,,1\n' for i in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                result = self._import(rows, chunk_size=1000)
+            self.assertEqual(result.created_questions, size)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_progress_and_cache_invalidation(self):
+        """チャンクごとに進捗が通知され、出題プールが更新されるか"""
+        category = Category.objects.create(name='数学')
+        self.assertEqual(len(get_question_pool(category.id)), 0)
+        reports = []
+        self._import(
+            [f'数学,問題{i},A,B,,,1\n' for i in range(5)],
+            chunk_size=2, progress=lambda result: reports.append(result.imported),
+        )
+        self.assertEqual(reports, [2, 4, 5])
+        self.assertEqual(len(get_question_pool(category.id)), 5)
+
+    def test_admin_preview(self):
+        """管理画面のプレビューは総行数を数え、DBに書き込まないか"""
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(admin)
+        upload = SimpleUploadedFile('quiz.csv', self._csv(['数学,3×3は?,6,9,12,15,2\n']).getvalue(), content_type='text/csv')
+        response = self.client.post(
+            '/admin/quiz_api/category/unified-import/', {'csv_file': upload, 'preview_only': 'on'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_rows'], 1)
+        self.assertFalse(Question.objects.filter(text='3×3は?').exists())
+
+
+class ImportJobTest(TestCase):
+    """インポートジョブ（DBキュー + ワーカー）のテスト"""
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        super().setUpClass()
+        cls.media_root = tempfile.TemporaryDirectory()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root.name)
+        cls.media_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media_override.disable()
+        cls.media_root.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(self.admin)
+        self.category = Category.objects.create(name='数学')
+
+    def _upload(self, text):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile('quiz.csv', text.encode('utf-8'), content_type='text/csv')
+
+    def _run_worker(self):
+        from django.core.management import call_command
+        call_command('run_import_worker', '--once', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_csv_upload_enqueued_and_processed_by_worker(self):
+        """CSVアップロードはジョブ登録のみ行い、ワーカーが取り込むか"""
+        csv_text = (
+            'カテゴリー,質問,選択肢1,選択肢2,選択肢3,選択肢4,正解番号\n'
+            '数学,2+2は?,2,3,4,5,3\n'
+            '数学,1+1は?,1,2,,,9\n'
+        )
+        response = self.client.post('/admin/quiz_api/category/unified-import/', {'csv_file': self._upload(csv_text)})
+        job = ImportJob.objects.get()
+        self.assertRedirects(response, f'/admin/quiz_api/importjob/{job.id}/progress/')
+        self.assertEqual(job.status, ImportJob.STATUS_PENDING)
+        self.assertFalse(Question.objects.filter(text='2+2は?').exists())
+
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_SUCCEEDED)
+        self.assertEqual((job.processed_rows, job.created_count, job.error_count), (2, 1, 1))
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(job.errors, ['行2: 正解番号が無効です: 9'])
+        self.assertTrue(Question.objects.filter(text='2+2は?', category=self.category).exists())
+
+        response = self.client.get(f'/admin/quiz_api/importjob/{job.id}/status/')
+        self.assertEqual(response.json()['status'], 'succeeded')
+        response = self.client.get(f'/quiz-admin/quiz_api/importjob/{job.id}/progress/')
+        self.assertContains(response, '正解番号が無効です')
+
+    def test_advanced_bulk_add_enqueued(self):
+        """高度な一括追加（JSON）もジョブとして処理されるか"""
+        import json
+        data = json.dumps([
+            {'question': '3×3は?', 'choices': [{'text': '6'}, {'text': '9', 'correct': True}]},
+            {'question': '', 'choices': []},
+        ])
+        self.client.post('/admin/quiz_api/question/advanced-bulk-add/', {
+            'category': self.category.id, 'format_type': 'json', 'questions_data': data,
+        })
+        job = ImportJob.objects.get()
+        self.assertEqual((job.format, job.category_id), ('json', self.category.id))
+
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), (ImportJob.STATUS_SUCCEEDED, 1))
+        self.assertEqual(job.errors, ['質問2: 問題文が空です'])
+        question = Question.objects.get(text='3×3は?')
+        self.assertEqual(question.choices.get(is_correct=True).text, '9')
+        # bulk_create で追加した問題も出題プールに反映されるか
+        self.assertIn(question.id, get_question_pool(self.category.id))
+
+    def test_invalid_data_fails_job(self):
+        """形式エラーのジョブは失敗として記録されるか"""
+        from .import_jobs import enqueue_import
+        job = enqueue_import('json', text='{broken', category=self.category)
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+        self.assertIn('JSON形式エラー', job.message)
+
+    def test_claim_is_exclusive(self):
+        """同じジョブを複数のワーカーが取得しないか"""
+        from .import_jobs import claim_next_job, enqueue_import
+        job = enqueue_import('simple', text='Q\nA*\nB', category=self.category)
+        self.assertEqual(claim_next_job('worker-1').id, job.id)
+        self.assertIsNone(claim_next_job('worker-2'))
+
+    def test_stale_job_failed_and_retry(self):
+        """応答のない実行中ジョブは失敗になり、再実行できるか"""
+        from datetime import timedelta
+        from django.utils import timezone
+        from .import_jobs import claim_next_job, enqueue_import, fail_stale_jobs, retry_jobs
+
+        job = enqueue_import('simple', text='Q\nA*\nB', category=self.category)
+        claim_next_job('worker-1')
+        ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(fail_stale_jobs(600), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.STATUS_FAILED)
+
+        retry_jobs(ImportJob.objects.filter(id=job.id))
+        self._run_worker()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.created_count), (ImportJob.STATUS_SUCCEEDED, 1))
+
+
+
+class UnifiedCSVExportTest(TestCase):
+    """統一CSV形式のストリーミングエクスポートのテスト"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(self.admin)
+        self.math = Category.objects.create(name='数学')
+        self.english = Category.objects.create(name='英語')
+        for i in range(7):
+            q = Question.objects.create(category=self.math if i % 2 else self.english, text=f'問題{i}')
+            for j in range(3):
+                Choice.objects.create(question=q, text=f'{i}-{j}', is_correct=(j == i % 3))
+        Question.objects.create(category=self.math, text='選択肢なし')
+
+    def _content(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_streaming_export_matches_rows(self):
+        """ストリーミングで返すCSVがエクスポート行と一致するか"""
+        import csv
+        response = self.client.get('/admin/quiz_api/category/unified-export/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        content = self._content(response)
+        self.assertTrue(content.startswith(b'\xef\xbb\xbf'))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:2], ['カテゴリー', '質問'])
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[1], ['英語', '問題0', '0-0', '0-1', '0-2', '', '', '', '1'])
+
+    def test_gzip_export(self):
+        """?gzip=1 で gzip 圧縮したCSVを返すか"""
+        import gzip
+        plain = self._content(self.client.get('/admin/quiz_api/category/unified-export/'))
+        response = self.client.get('/admin/quiz_api/category/unified-export/?gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('unified_quiz_export.csv.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(self._content(response)), plain)
+
+    def test_keyset_chunks(self):
+        """チャンクごとに質問と選択肢を1回ずつ取得するか"""
+        from .resources import UnifiedQuizResource
+        rows = UnifiedQuizResource().iter_export_rows(chunk_size=3)
+        # 8問 → 3チャンク（各2クエリ）+ 終端の確認1クエリ
+        with self.assertNumQueries(7):
+            rows = list(rows)
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows, UnifiedQuizResource().export_data())
+
+    def test_export_selected_categories(self):
+        """選択したカテゴリーだけをエクスポートするか"""
+        response = self.client.post('/admin/quiz_api/category/', {
+            'action': 'unified_export_selected', '_selected_action': [self.math.id],
+        })
+        content = self._content(response).decode('utf-8-sig')
+        self.assertIn('問題1', content)
+        self.assertNotIn('問題0', content)
+
+
+class StatsSnapshotTest(TestCase):
+    """管理画面の件数スナップショットのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(self.admin)
+        self.math = Category.objects.create(name='数学')
+        self.english = Category.objects.create(name='英語')
+        for i in range(3):
+            q = Question.objects.create(category=self.math, text=f'問題{i}')
+            Choice.objects.create(question=q, text='A', is_correct=True)
+            Choice.objects.create(question=q, text='B', is_correct=False)
+        QuizAttempt.objects.create(user=self.admin, category=self.math, score=1, total_questions=3, percentage=33.3)
+
+    def _snapshot(self):
+        from .stats_snapshot import get_stats_snapshot
+        return get_stats_snapshot()
+
+    def test_snapshot_counts(self):
+        """総数が集計され、2回目以降はクエリを発行しないか"""
+        snapshot = self._snapshot()
+        self.assertEqual(
+            (snapshot['categories'], snapshot['questions'], snapshot['choices'], snapshot['attempts']),
+            (2, 3, 6, 1),
+        )
+        with self.assertNumQueries(0):
+            self._snapshot()
+
+    def test_admin_pages_do_not_count_tables(self):
+        """キャッシュ済みなら管理画面とAPIが COUNT クエリを発行しないか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._snapshot()
+        for url in ['/admin/', '/quiz-admin/', '/quiz-admin/quiz-stats-api/', '/admin/quiz_api/question/']:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            # テーブル全体の件数（WHERE なしの COUNT）を数えていないこと
+            counts = [q['sql'] for q in ctx.captured_queries
+                      if 'COUNT(' in q['sql'] and 'WHERE' not in q['sql']
+                      and ('quiz_api_choice' in q['sql'] or 'quiz_api_quizattempt' in q['sql'])]
+            self.assertEqual(counts, [], url)
+        data = self.client.get('/quiz-admin/quiz-stats-api/').json()
+        self.assertEqual(data, {'categories': 2, 'questions': 3, 'choices': 6, 'attempts': 1})
+
+    def test_category_question_count_column(self):
+        """カテゴリー一覧の質問数がカテゴリごとのクエリなしで表示されるか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/admin/quiz_api/category/')
+        self.assertEqual(response.status_code, 200)
+        per_row = [q['sql'] for q in ctx.captured_queries if 'WHERE "quiz_api_question"."category_id" =' in q['sql']]
+        self.assertEqual(per_row, [])
+
+    def test_incremental_updates(self):
+        """作成・削除がコミット後にスナップショットへ加算されるか"""
+        self._snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            q = Question.objects.create(category=self.english, text='新問題')
+            Choice.objects.create(question=q, text='A', is_correct=True)
+        with self.assertNumQueries(0):
+            snapshot = self._snapshot()
+        self.assertEqual((snapshot['questions'], snapshot['choices']), (4, 7))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.math.delete()
+        snapshot = self._snapshot()
+        self.assertEqual(
+            (snapshot['categories'], snapshot['questions'], snapshot['choices'], snapshot['attempts']),
+            (1, 1, 1, 0),
+        )
+
+    def test_bulk_import_rebuilds(self):
+        """一括インポート（bulk_create）後にスナップショットが作り直されるか"""
+        from .importers import import_csv
+        self._snapshot()
+        import_csv(io.BytesIO(
+            'カテゴリー,質問,選択肢1,選択肢2,正解番号\n英語,appleの意味は?,りんご,みかん,1\n'.encode('utf-8')
+        ))
+        snapshot = self._snapshot()
+        self.assertEqual((snapshot['questions'], snapshot['choices']), (4, 8))
+
+    def test_expired_snapshot_is_not_extended(self):
+        """構築から有効期限を過ぎたスナップショットは差分加算時に破棄されるか"""
+        from . import cache as quiz_cache
+        from .stats_snapshot import SNAPSHOT_TIMEOUT, add_to_stats
+        snapshot = self._snapshot()
+        key = quiz_cache.make_key(quiz_cache.STATS, 'snapshot')
+        snapshot['built_at'] -= SNAPSHOT_TIMEOUT
+        cache.set(key, snapshot)
+        with self.captureOnCommitCallbacks(execute=True):
+            add_to_stats(attempts=1)
+        self.assertIsNone(cache.get(key))
+        with self.assertRaises(ValueError):
+            add_to_stats(unknown=1)
+
+
+class AdminChangelistQueryTest(TestCase):
+    """管理画面一覧のクエリ数のテスト"""
+
+    URLS = ['/admin/quiz_api/category/', '/admin/quiz_api/question/', '/admin/quiz_api/choice/']
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+        self.client.force_login(self.admin)
+        self._add_rows(2)
+
+    def _add_rows(self, count):
+        for _ in range(count):
+            category = Category.objects.create(name=f'カテゴリー{Category.objects.count()}')
+            for i in range(3):
+                q = Question.objects.create(category=category, text=f'{category.name}-問題{i}')
+                Choice.objects.create(question=q, text='A', is_correct=(i != 0))
+                Choice.objects.create(question=q, text='B', is_correct=False)
+
+    def _count_queries(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_constant_queries_per_page(self):
+        """行数が増えても一覧ページのクエリ数が変わらないか"""
+        # 件数スナップショットの構築分を除くため一度表示しておく
+        for url in self.URLS:
+            self._count_queries(url)
+        before = {url: self._count_queries(url) for url in self.URLS}
+        self._add_rows(5)
+        after = {url: self._count_queries(url) for url in self.URLS}
+        self.assertEqual(before, after)
+
+    def test_annotated_columns(self):
+        """集計列の値が正しく表示され、並べ替えできるか"""
+        response = self.client.get('/admin/quiz_api/question/?o=-3')
+        self.assertEqual(response.status_code, 200)
+        rows = list(response.context['cl'].result_list)
+        self.assertEqual({q._choice_count for q in rows}, {2})
+        self.assertEqual(sum(not q._has_correct_answer for q in rows), 2)
+        self.assertFalse(rows[-1]._has_correct_answer)
+
+        Question.objects.create(category=Category.objects.first(), text='追加')
+        response = self.client.get('/admin/quiz_api/category/?o=-2')
+        rows = list(response.context['cl'].result_list)
+        self.assertEqual([c._question_count for c in rows], [4, 3])
+
+
+class KeysetPaginationTest(APITestCase):
+    """受験履歴・リーダーボードのカーソル方式ページネーションのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _walk(self, url):
+        """next をたどって全ページの results と各ページの count を返す"""
+        results, counts = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            counts.append(response.data['count'])
+            url = response.data['next']
+        return results, counts
+
+    def test_history_cursor_walk(self):
+        """同時刻の受験結果を含めて重複・欠落なく新しい順にたどれるか"""
+        from django.utils import timezone
+        attempts = [
+            QuizAttempt.objects.create(
+                user=self.user, category=self.category, score=i, total_questions=10, percentage=i * 10.0
+            )
+            for i in range(7)
+        ]
+        # 同じ作成日時の行は id で並ぶ
+        QuizAttempt.objects.filter(id__in=[a.id for a in attempts[2:5]]).update(created_at=timezone.now())
+        expected = list(
+            QuizAttempt.objects.filter(user=self.user).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        results, counts = self._walk('/api/quiz/history/?pagination=cursor&page_size=3')
+        self.assertEqual([r['id'] for r in results], expected)
+        self.assertEqual(counts, [7, 7, 7])
+
+    def test_history_cursor_skips_count_query(self):
+        """カーソル方式では受験結果の COUNT(*) も OFFSET も発行しないか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        for i in range(3):
+            QuizAttempt.objects.create(
+                user=self.user, category=self.category, score=i, total_questions=10, percentage=i * 10.0
+            )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/quiz/history/?pagination=cursor&page_size=2')
+        self.assertEqual(response.data['count'], 3)
+        sql = [q['sql'] for q in ctx.captured_queries if 'quiz_api_quizattempt' in q['sql']]
+        self.assertFalse([s for s in sql if 'COUNT(' in s or 'OFFSET' in s])
+
+    def test_history_default_is_page_number(self):
+        """パラメータがなければ従来のページ番号方式で返すか"""
+        response = self.client.get('/api/quiz/history/')
+        self.assertEqual(response.data['count'], 0)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        """不正なカーソルは404になるか"""
+        response = self.client.get('/api/quiz/history/?cursor=invalid')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_invalid_values(self):
+        """形式は正しいが列の型に合わない値のカーソルは500にならず404になるか"""
+        import base64
+        import json
+        cursors = {
+            '/api/quiz/history/': [['x', 1], [{'a': 1}, 1], ['2024-01-01T00:00:00', 'abc'], [None, 1]],
+            '/api/quiz/leaderboard/authenticated/': [['abc', 1], [50.0, [1]], [50.0, None]],
+        }
+        for url, values_list in cursors.items():
+            for values in values_list:
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, (url, values))
+
+    def test_leaderboard_cursor_walk(self):
+        """同率のユーザーを含めて (正答率, id) の順にたどれるか"""
+        for i, score in enumerate([9, 7, 7, 7, 5]):
+            user = User.objects.create_user(username=f'user{i}', password='pass123')
+            QuizAttempt.objects.create(
+                user=user, category=self.category, score=score, total_questions=10, percentage=score * 10.0
+            )
+        results, counts = self._walk('/api/quiz/leaderboard/authenticated/?pagination=cursor&page_size=2')
+        self.assertEqual([r['username'] for r in results], ['user0', 'user1', 'user2', 'user3', 'user4'])
+        self.assertEqual(counts, [5, 5, 5])
+
+
+class QuizHistorySummaryTest(APITestCase):
+    """履歴一覧の概要モードのテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.client = APIClient()
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        questions = []
+        for i in range(5):
+            q = Question.objects.create(category=self.category, text=f"問題{i}")
+            questions.append((q, Choice.objects.create(question=q, text="A", is_correct=True)))
+        for _ in range(3):
+            attempt = QuizAttempt.objects.create(
+                user=self.user, category=self.category, score=5, total_questions=5, percentage=100.0
+            )
+            for q, choice in questions:
+                QuestionResponse.objects.create(
+                    quiz_attempt=attempt, question=q, selected_choice=choice, is_correct=True
+                )
+
+    def test_summary_fields(self):
+        """summary=true では受験結果の項目のみを返すか"""
+        response = self.client.get('/api/quiz/history/?summary=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'category', 'category_name', 'score', 'total_questions', 'percentage', 'created_at'},
+        )
+
+    def test_summary_skips_responses(self):
+        """summary=true では回答・問題・選択肢を取得しないか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/quiz/history/?summary=true')
+        tables = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('quiz_api_questionresponse', tables)
+        self.assertNotIn('quiz_api_question"', tables)
+
+        response = self.client.get('/api/quiz/history/')
+        self.assertEqual(len(response.data['results'][0]['responses']), 5)
+        attempt_id = response.data['results'][0]['id']
+        detail = self.client.get(f'/api/quiz/history/{attempt_id}/')
+        self.assertEqual(len(detail.data['responses']), 5)
+
+    def test_summary_with_cursor(self):
+        """カーソル方式と組み合わせられるか"""
+        response = self.client.get('/api/quiz/history/?summary=true&pagination=cursor&page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertNotIn('responses', response.data['results'][0])
+
+
+class CategoryCatalogTest(APITestCase):
+    """カテゴリカタログ（/api/categories/catalog/）のテスト"""
+
+    url = '/api/categories/catalog/'
+
+    def setUp(self):
+        cache.clear()
+        self.math = Category.objects.create(name="Math")
+        self.empty = Category.objects.create(name="Art")
+        for i in range(3):
+            q = Question.objects.create(
+                category=self.math, text=f"Q{i+1}",
+                image='question_images/q.png' if i == 0 else None,
+            )
+            Choice.objects.create(question=q, text="A", is_correct=True)
+            Choice.objects.create(question=q, text="B", is_correct=False)
+        # 選択肢のない問題は出題できないため数えない
+        self.draft = Question.objects.create(category=self.math, text="Draft", image='question_images/d.png')
+
+    def test_catalog_counts(self):
+        """全カテゴリが名前順で、出題可能な問題数と画像付き問題数が返るか"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'id': self.empty.id, 'name': 'Art', 'question_count': 0, 'image_question_count': 0},
+            {'id': self.math.id, 'name': 'Math', 'question_count': 3, 'image_question_count': 1},
+        ])
+
+    def test_catalog_built_with_one_query(self):
+        """カテゴリ数に関係なく1回の集計クエリで構築されるか"""
+        for i in range(5):
+            Category.objects.create(name=f"Extra{i}")
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_warm_catalog_uses_no_queries(self):
+        """キャッシュが温まっていれば匿名でもログイン済みでもDBに触れないか"""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+        user = User.objects.create_user(username='player', password='testpass123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, status.HTTP_200_OK)
+
+    def test_not_modified(self):
+        """If-None-Match が一致すれば本文なしの 304 を返すか"""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_choice_change_updates_catalog(self):
+        """選択肢の追加で問題数と ETag が変わるか"""
+        etag = self.client.get(self.url)['ETag']
+        Choice.objects.create(question=self.draft, text="A", is_correct=True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        math = next(row for row in response.data if row['id'] == self.math.id)
+        self.assertEqual((math['question_count'], math['image_question_count']), (4, 2))
+
+    def test_category_rename_updates_catalog(self):
+        """カテゴリ名の変更で ETag が変わるか"""
+        etag = self.client.get(self.url)['ETag']
+        self.empty.name = "Zoology"
+        self.empty.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[-1]['name'], 'Zoology')
+
+
+class RecentQuestionsTest(APITestCase):
+    """最近出題した問題の除外（quiz_session）のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.pairs = []
+        for i in range(6):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            self.pairs.append((q, Choice.objects.create(question=q, text="A", is_correct=True)))
+        refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def _session_ids(self):
+        response = self.client.get(f'/api/questions/quiz_session/?category={self.category.id}&count=20')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {q['id'] for q in response.data['results']}
+
+    def _save(self, pairs):
+        # 除外リストへの記録はコミット後に行われる
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/quiz/save-result/', {
+                'category_id': self.category.id,
+                'total_questions': len(pairs),
+                'responses': [
+                    {'question_id': q.id, 'selected_choice_id': c.id} for q, c in pairs
+                ],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def _create_attempt(self, pairs):
+        attempt = QuizAttempt.objects.create(
+            user=self.user, category=self.category, score=len(pairs),
+            total_questions=len(pairs), percentage=100.0,
+        )
+        for q, c in pairs:
+            QuestionResponse.objects.create(quiz_attempt=attempt, question=q, selected_choice=c, is_correct=True)
+        return attempt
+
+    def test_saved_questions_are_excluded(self):
+        """保存した回答の問題が次のセッションから除外されるか"""
+        self._save(self.pairs[:2])
+        ids = self._session_ids()
+        self.assertEqual(ids, {q.id for q, _ in self.pairs[2:]})
+        self._save(self.pairs[2:4])
+        self.assertEqual(self._session_ids(), {q.id for q, _ in self.pairs[4:]})
+
+    def test_rolled_back_save_is_not_excluded(self):
+        """ロールバックされた保存の問題は除外リストに記録されないか"""
+        from unittest import mock
+        from django.db import DatabaseError, transaction
+        from .recent_questions import get_recent_question_ids
+        from .serializers import SaveQuizResultSerializer
+        serializer = SaveQuizResultSerializer(data={
+            'category_id': self.category.id,
+            'total_questions': 2,
+            'responses': [{'question_id': q.id, 'selected_choice_id': c.id} for q, c in self.pairs[:2]],
+        }, context={'request': mock.Mock(user=self.user)})
+        self.assertTrue(serializer.is_valid())
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    serializer.save()
+                    raise DatabaseError('commit failed')
+        self.assertEqual(QuizAttempt.objects.count(), 0)
+        self.assertEqual(get_recent_question_ids(self.user.id), set())
+        self.assertEqual(self._session_ids(), {q.id for q, _ in self.pairs})
+
+    def test_no_attempt_join(self):
+        """除外リストの取得で受験結果・回答テーブルを参照しないか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self._save(self.pairs[:2])
+        with CaptureQueriesContext(connection) as ctx:
+            self._session_ids()
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('quiz_api_questionresponse', sql)
+        self.assertNotIn('quiz_api_quizattempt', sql)
+
+    def test_rebuild_from_attempts(self):
+        """キャッシュが空なら期間内の受験結果から再構築するか"""
+        from datetime import timedelta
+        from django.utils import timezone
+        self._create_attempt(self.pairs[:2])
+        old = self._create_attempt(self.pairs[2:3])
+        QuizAttempt.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(hours=2))
+        cache.clear()
+        self.assertEqual(self._session_ids(), {q.id for q, _ in self.pairs[2:]})
+
+    def test_exclude_recent_false(self):
+        """exclude_recent=false では除外しないか"""
+        self._save(self.pairs[:2])
+        response = self.client.get(
+            f'/api/questions/quiz_session/?category={self.category.id}&count=20&exclude_recent=false'
+        )
+        self.assertEqual(len(response.data['results']), 6)
+
+    @override_settings(QUIZ_RECENT_QUESTIONS_WINDOW=600, QUIZ_RECENT_QUESTIONS_BUCKET=60)
+    def test_window_expiry(self):
+        """期間より前の時間枠は除外に使わないか"""
+        from unittest import mock
+        from . import recent_questions
+        now = 1_000_000.0
+        with mock.patch.object(recent_questions.time, 'time', return_value=now):
+            recent_questions.add_recent_questions(self.user.id, [self.pairs[0][0].id])
+        with mock.patch.object(recent_questions.time, 'time', return_value=now + 300):
+            self.assertEqual(recent_questions.get_recent_question_ids(self.user.id), {self.pairs[0][0].id})
+        with mock.patch.object(recent_questions.time, 'time', return_value=now + 700):
+            self.assertEqual(recent_questions.get_recent_question_ids(self.user.id), set())
+
+
+class ConditionalGetTest(APITestCase):
+    """ETag による条件付きGET（304）のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.math = Category.objects.create(name="Math")
+        self.science = Category.objects.create(name="Science")
+        self.pairs = []
+        for category in (self.math, self.science):
+            for i in range(2):
+                q = Question.objects.create(category=category, text=f"{category.name}{i+1}")
+                self.pairs.append((q, Choice.objects.create(question=q, text="A", is_correct=True)))
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.other = User.objects.create_user(username='other', password='testpass123')
+        self.login(self.user)
+
+    def login(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def create_attempt(self, user):
+        QuizAttempt.objects.create(user=user, category=self.math, score=1, total_questions=1, percentage=100.0)
+
+    def assert_not_modified(self, url, etag, queries=0):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+    def test_category_list_and_detail(self):
+        """カテゴリの一覧・詳細が 304 を返し、カテゴリの変更で ETag が変わるか"""
+        self.client.credentials()
+        for url in ('/api/categories/', f'/api/categories/{self.math.id}/'):
+            etag = self.client.get(url)['ETag']
+            self.assert_not_modified(url, etag)
+        Category.objects.create(name="History")
+        self.assertEqual(self.client.get('/api/categories/', HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_question_list_uses_category_version(self):
+        """問題一覧の ETag は指定カテゴリの変更でだけ変わるか"""
+        url = f'/api/questions/?category={self.math.id}&order=id'
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, etag, queries=1)  # 認証のユーザー取得のみ
+
+        science_question = self.pairs[2][0]
+        Choice.objects.create(question=science_question, text="B", is_correct=False)
+        self.assert_not_modified(url, etag, queries=1)
+
+        Choice.objects.create(question=self.pairs[0][0], text="B", is_correct=False)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_choice_changes_do_not_query_question_per_row(self):
+        """選択肢の変更ごとに問題を問い合わせず、まとめてコミット後にカテゴリの版を更新するか"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = f'/api/questions/?category={self.math.id}&order=id'
+        question = self.pairs[0][0]
+        for text in ("B", "C", "D"):
+            Choice.objects.create(question=question, text=text, is_correct=False)
+        etag = self.client.get(url)['ETag']
+
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            Choice.objects.filter(question=question, is_correct=False).delete()
+        lookups = [q['sql'] for q in ctx.captured_queries if 'FROM "quiz_api_question"' in q['sql']]
+        self.assertEqual(len(lookups), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_question_category_move_updates_all_versions(self):
+        """問題のカテゴリ変更では移動元のカテゴリの ETag も変わるか"""
+        url = f'/api/questions/?category={self.math.id}&order=id'
+        etag = self.client.get(url)['ETag']
+        question = self.pairs[0][0]
+        question.category = self.science
+        question.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_question_detail(self):
+        """問題の詳細が 304 を返し、問題の変更で ETag が変わるか"""
+        question = self.pairs[0][0]
+        url = f'/api/questions/{question.id}/'
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, etag, queries=1)
+        question.text = "Changed"
+        question.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_random_question_list_has_no_etag(self):
+        """ランダム順の一覧には ETag を付けないか"""
+        response = self.client.get(f'/api/questions/?category={self.math.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_public_leaderboard(self):
+        """公開リーダーボードが 304 を返し、受験結果の保存で ETag が変わるか"""
+        self.client.credentials()
+        url = '/api/quiz/leaderboard/'
+        etag = self.client.get(url)['ETag']
+        self.assert_not_modified(url, etag)
+        self.create_attempt(self.other)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_user_endpoints_use_attempts_version(self):
+        """履歴と統計は本人の受験結果の保存でだけ ETag が変わるか"""
+        for url in ('/api/quiz/history/', '/api/user/stats/'):
+            cache.clear()
+            response = self.client.get(url)
+            etag = response['ETag']
+            self.assertIn('private', response['Cache-Control'])
+            self.assertIn('Authorization', response['Vary'])
+            self.assert_not_modified(url, etag, queries=1)
+
+            self.create_attempt(self.other)
+            self.assert_not_modified(url, etag, queries=1)
+
+            self.create_attempt(self.user)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_differs_between_users(self):
+        """別のユーザーの ETag では 304 にならないか"""
+        etag = self.client.get('/api/quiz/history/')['ETag']
+        self.login(self.other)
+        response = self.client.get('/api/quiz/history/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unauthenticated_request_is_not_answered_with_304(self):
+        """認証エラーは ETag の比較より先に返るか"""
+        self.client.credentials()
+        response = self.client.get('/api/user/stats/', HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(response.has_header('ETag'))
+
+
+@override_settings(QUIZ_INSTRUMENTATION=True)
+class InstrumentationTest(APITestCase):
+    """リクエスト計測ミドルウェアのテスト"""
+
+    def setUp(self):
+        from .instrumentation import reset_request_metrics
+        cache.clear()
+        reset_request_metrics()
+        self.category = Category.objects.create(name="Math")
+        self.admin = User.objects.create_superuser(username='admin', password='pass123')
+
+    def _run(self, view):
+        """view(request) を計測付きで実行する"""
+        from django.http import HttpResponse
+        from django.test import RequestFactory
+        from .instrumentation import InstrumentationMiddleware
+
+        def get_response(request):
+            view(request)
+            return HttpResponse('ok')
+
+        return InstrumentationMiddleware(get_response)(RequestFactory().get('/api/test/'))
+
+    @override_settings(QUIZ_SERVER_TIMING=False)
+    def test_server_timing_is_opt_in(self):
+        """QUIZ_SERVER_TIMING が無効（DEBUG=False のデフォルト）なら Server-Timing を付けないか"""
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(QUIZ_SERVER_TIMING=True)
+    def test_records_endpoint_metrics(self):
+        """URL名ごとにリクエスト数とSQL件数が集計され、Server-Timing が付くか"""
+        response = self.client.get('/api/categories/')
+        self.assertIn('Server-Timing', response)
+        self.client.force_login(self.admin)
+        data = self.client.get('/quiz-admin/quiz-metrics-api/').json()
+        stats = data['endpoints']['category-list']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(sum(stats['latency_ms'].values()), 1)
+        self.assertGreaterEqual(stats['avg_sql_count'], 1)
+
+    def test_metrics_api_is_admin_only(self):
+        """一般ユーザーは集計APIにアクセスできないか"""
+        user = User.objects.create_user(username='user', password='pass123')
+        self.client.force_login(user)
+        response = self.client.get('/quiz-admin/quiz-metrics-api/')
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(QUIZ_N_PLUS_ONE_THRESHOLD=3)
+    def test_n_plus_one_logged(self):
+        """同じSQLを繰り返し実行したリクエストが N+1 の疑いとして記録されるか"""
+        from .instrumentation import get_request_metrics
+        ids = [Category.objects.create(name=f'C{i}').id for i in range(3)]
+        with self.assertLogs('quiz_api.instrumentation', 'WARNING') as logs:
+            self._run(lambda request: [Category.objects.get(id=i) for i in ids])
+        self.assertIn('N+1', logs.output[0])
+        self.assertEqual(get_request_metrics()['endpoints']['unresolved']['n_plus_one'], 1)
+
+    @override_settings(QUIZ_SLOW_REQUEST_MS=0)
+    def test_slow_request_logged(self):
+        """しきい値を超えたリクエストが記録されるか"""
+        with self.assertLogs('quiz_api.instrumentation', 'WARNING') as logs:
+            self._run(lambda request: Category.objects.count())
+        self.assertIn('遅いリクエスト', logs.output[0])
+
+    def test_serializer_time(self):
+        """シリアライザーの処理時間が計測されるか"""
+        from .instrumentation import get_request_metrics, install_serializer_timing
+        from .serializers import CategorySerializer
+        install_serializer_timing()
+        self._run(lambda request: CategorySerializer(Category.objects.all(), many=True).data)
+        self.assertGreater(get_request_metrics()['endpoints']['unresolved']['avg_serializer_ms'], 0)
+
+
+class BenchmarkSuiteTest(TestCase):
+    """ベンチマーク用データ生成と計測コマンドのテスト"""
+
+    GENERATE_OPTIONS = dict(categories=2, questions=6, users=3, attempts=2, answers=3, seed=7, stdout=io.StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def _generate(self, **options):
+        from django.core.management import call_command
+        call_command('generate_quiz_data', **{**self.GENERATE_OPTIONS, **options})
+
+    def _snapshot(self):
+        questions = [
+            (q.category.name, q.text, [c.is_correct for c in q.choices.order_by('id')])
+            for q in Question.objects.select_related('category').order_by('id')
+        ]
+        attempts = [
+            (a.user.username, a.category.name, a.score,
+             [(r.question.text, r.selected_choice.text) for r in a.responses.order_by('id')])
+            for a in QuizAttempt.objects.select_related('user', 'category').order_by('id')
+        ]
+        return questions, attempts
+
+    def test_generate_is_deterministic(self):
+        """同じシードなら同じ内容のデータが生成され、集計テーブルも作られるか"""
+        from django.core.management.base import CommandError
+        self._generate()
+        first = self._snapshot()
+        self.assertEqual(len(first[0]), 12)
+        self.assertEqual(len(first[1]), 6)
+        self.assertEqual(Choice.objects.count(), 48)
+        self.assertEqual(UserCategoryStats.objects.filter(category__isnull=True).count(), 3)
+
+        with self.assertRaises(CommandError):
+            self._generate()
+        self._generate(replace=True)
+        self.assertEqual(self._snapshot(), first)
+        self._generate(replace=True, seed=8)
+        self.assertNotEqual(self._snapshot(), first)
+
+    def test_benchmark_report(self):
+        """全シナリオを計測してJSONレポートを出力し、保存したデータはロールバックされるか"""
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        self._generate()
+        attempts = QuizAttempt.objects.count()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            call_command('benchmark_api', requests=2, warmup=0, output=path, stdout=io.StringIO())
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(report['dataset']['attempts'], attempts)
+        self.assertIn('save_result', report['results'])
+        for name, result in report['results'].items():
+            self.assertLess(result['status'], 400, name)
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['min_ms'], result['median_ms'])
+        self.assertEqual(QuizAttempt.objects.count(), attempts)
+
+    def test_compare_detects_query_regression(self):
+        """比較元よりクエリ数が増えたシナリオがあればエラーになるか"""
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        self._generate()
+        baseline = {'results': {'categories': {'median_ms': 1000.0, 'queries': 0}}}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'baseline.json')
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+            with self.assertRaisesRegex(CommandError, 'クエリ数'):
+                call_command(
+                    'benchmark_api', requests=1, warmup=0, only=['categories'],
+                    compare=path, max_regression=50, stdout=io.StringIO(),
+                )
+
+    def test_benchmark_requires_data(self):
+        """データがなければエラーになるか"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        with self.assertRaises(CommandError):
+            call_command('benchmark_api', stdout=io.StringIO())
+
+
+class ConcurrencyBenchmarkTest(TransactionTestCase):
+    """WSGI と ASGI の同時接続ベンチマーク（benchmark_concurrency）のテスト
+
+    接続ごとのスレッドやリクエストごとのスレッドからDBを読むため、データはコミットしておく。
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_benchmark_report(self):
+        """シナリオ・デプロイ・同時接続数ごとの結果を出力し、作成したセッションは削除されるか"""
+        import json
+        import os
+        import tempfile
+        from django.core.management import call_command
+        call_command(
+            'generate_quiz_data', categories=1, questions=6, users=2, attempts=1, answers=3, seed=7,
+            stdout=io.StringIO(),
+        )
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'report.json')
+            call_command(
+                'benchmark_concurrency', concurrency=[1, 3], requests=2,
+                only=['unique_random', 'session_questions', 'leaderboard_public'],
+                output=path, stdout=io.StringIO(),
+            )
+            with open(path, encoding='utf-8') as f:
+                report = json.load(f)
+        self.assertEqual(set(report['results']), {'unique_random', 'session_questions', 'leaderboard_public'})
+        for name, targets in report['results'].items():
+            self.assertEqual(set(targets), {'wsgi', 'asgi'})
+            for target, levels in targets.items():
+                self.assertEqual(levels['3']['requests'], 6, (name, target))
+                self.assertEqual(levels['3']['errors'], 0, (name, target))
+                self.assertGreater(levels['1']['throughput_rps'], 0)
+        self.assertFalse(QuizSession.objects.exists())
+
+    def test_rejects_requests_over_rate_limit(self):
+        """1ユーザーあたりのリクエストがレート制限を超える指定はエラーになるか"""
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        call_command(
+            'generate_quiz_data', categories=1, questions=2, users=1, attempts=1, answers=1, seed=7,
+            stdout=io.StringIO(),
+        )
+        with self.assertRaisesRegex(CommandError, 'レート制限'):
+            call_command('benchmark_concurrency', concurrency=[5], requests=30, stdout=io.StringIO())
+
+
+@skipUnless(find_spec('orjson'), 'orjson がインストールされていません')
+class FastJSONTest(APITestCase):
+    """orjson のレンダラー・パーサー（quiz_api/fast_json.py）のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.category = Category.objects.create(name="日本の歴史")
+        self.pairs = []
+        for i in range(10):
+            q = Question.objects.create(category=self.category, text=f"「{i+1}」番目の問題\u2028改行\t付き")
+            choices = [Choice.objects.create(question=q, text=f"選択肢{j+1}", is_correct=(j == 0)) for j in range(4)]
+            self.pairs.append((q, choices[i % 4]))
+        self.client.force_authenticate(self.user)
+        for _ in range(5):
+            response = self.client.post('/api/quiz/save-result/', {
+                'category_id': self.category.id,
+                'total_questions': len(self.pairs),
+                'responses': [{'question_id': q.id, 'selected_choice_id': c.id} for q, c in self.pairs],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def renderers(self):
+        from .fast_json import QuizORJSONRenderer
+        from .renderers import QuizJSONRenderer
+        return QuizJSONRenderer(), QuizORJSONRenderer()
+
+    def assert_same_bytes(self, data, accepted_media_type=None, renderer_context=None):
+        default, fast = self.renderers()
+        expected = default.render(data, accepted_media_type, renderer_context)
+        self.assertEqual(fast.render(data, accepted_media_type, renderer_context), expected)
+        return expected
+
+    def test_special_values_match_default_renderer(self):
+        """日時・Decimal・遅延文字列などが標準のレンダラーとバイト単位で同じか"""
+        import datetime
+        import decimal
+        import uuid
+        from zoneinfo import ZoneInfo
+        from django.utils.translation import gettext_lazy
+        from .renderers import RawJSON
+        data = {
+            'aware': datetime.datetime(2024, 5, 1, 9, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            'tokyo': datetime.datetime(2024, 5, 1, 9, 30, tzinfo=ZoneInfo('Asia/Tokyo')),
+            'naive': datetime.datetime(2024, 5, 1, 9, 30, 15, 500),
+            'date': datetime.date(2024, 5, 1),
+            'time': datetime.time(9, 30, 15, 123456),
+            'duration': datetime.timedelta(minutes=3, microseconds=5),
+            'decimal': decimal.Decimal('12.50'),
+            'lazy': gettext_lazy('日本語の遅延文字列'),
+            'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'text': '改行\n タブ\t 制御\x01 引用"符 バックスラッシュ\\ 区切り\u2028\u2029 絵文字🎌',
+            'numbers': [0, -1, 2 ** 62, 0.1, 66.66666666666667, 100.0, True, False, None],
+            'nested': {1: ('a', 'b'), 'set': {3}, 'empty': {}},
+            'raw': RawJSON(b'{"id":1}'),
+            'bytes': b'abc',
+        }
+        self.assert_same_bytes(data)
+        self.assert_same_bytes({'results': [RawJSON(b'{"id":1}')], 'when': data['aware']})
+        self.assert_same_bytes(None)
+
+    def test_fallbacks_match_default_renderer(self):
+        """orjson が扱えない値やインデント指定時も標準のレンダラーと同じか"""
+        self.assert_same_bytes({'big': 2 ** 70})
+        self.assert_same_bytes({'a': [1, {'b': '日本'}]}, 'application/json; indent=4')
+        with self.assertRaises(TypeError):
+            self.renderers()[1].render({'object': object()})
+
+    def test_serializer_outputs_match_default_renderer(self):
+        """履歴・問題・統計の各シリアライザーの出力が標準のレンダラーと同じか"""
+        from .serializers import QuestionSerializer, QuizAttemptSerializer
+        attempts = QuizAttempt.objects.filter(user=self.user).prefetch_related('responses__question')
+        self.assert_same_bytes(QuizAttemptSerializer(attempts, many=True).data)
+        questions = Question.objects.prefetch_related('choices')
+        self.assert_same_bytes(QuestionSerializer(questions, many=True).data)
+
+    def test_api_responses_match_default_renderer(self):
+        """設定を切り替えても unique_random と履歴のレスポンスがバイト単位で同じか"""
+        from .fast_json import with_fast_json
+        urls = [
+            f'/api/questions/unique_random/?category={self.category.id}&limit=10&seed=5',
+            '/api/quiz/history/',
+            '/api/user/stats/',
+            '/api/quiz/leaderboard/',
+        ]
+        expected = [self.client.get(url).content for url in urls]
+        cache.clear()
+        with override_settings(REST_FRAMEWORK=with_fast_json(settings.REST_FRAMEWORK)):
+            self.assertEqual([self.client.get(url).content for url in urls], expected)
+
+    def test_parser_matches_default_parser(self):
+        """解析結果とエラーが標準のパーサーと同じか"""
+        from rest_framework.exceptions import ParseError
+        from rest_framework.parsers import JSONParser
+        from .fast_json import QuizORJSONParser
+        for body in ('{"text": "日本語", "n": [1, 2.5, null]}', f'{{"big": {2 ** 70}}}'):
+            raw = body.encode('utf-8')
+            self.assertEqual(QuizORJSONParser().parse(io.BytesIO(raw)), JSONParser().parse(io.BytesIO(raw)))
+        for body in (b'{"a": NaN}', b'{"a": ', '{"a": "日本"}'.encode('shift_jis')):
+            with self.assertRaises(ParseError) as expected:
+                JSONParser().parse(io.BytesIO(body))
+            with self.assertRaises(ParseError) as actual:
+                QuizORJSONParser().parse(io.BytesIO(body))
+            self.assertEqual(str(actual.exception), str(expected.exception))
+
+    def test_render_benchmark(self):
+        """unique_random と履歴のペイロードの出力が標準のレンダラーより速いか"""
+        import time
+        self.client.force_authenticate(self.user)
+        payloads = [
+            self.client.get(f'/api/questions/unique_random/?category={self.category.id}&limit=10').data,
+            self.client.get('/api/quiz/history/').data,
+        ]
+        timings = []
+        for renderer in self.renderers():
+            started = time.perf_counter()
+            for _ in range(50):
+                for payload in payloads:
+                    renderer.render(payload)
+            timings.append(time.perf_counter() - started)
+        self.assertLess(timings[1], timings[0])
+
+
+class CompressionTest(APITestCase):
+    """レスポンス圧縮（quiz_api/compression.py）のテスト"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.category = Category.objects.create(name="世界の首都")
+        self.pairs = []
+        for i in range(20):
+            q = Question.objects.create(category=self.category, text=f"{i+1}番目の国の首都はどこでしょうか？")
+            choices = [Choice.objects.create(question=q, text=f"首都の候補{j+1}", is_correct=(j == 0)) for j in range(4)]
+            self.pairs.append((q, choices[0]))
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            response = self.client.post('/api/quiz/save-result/', {
+                'category_id': self.category.id,
+                'total_questions': len(self.pairs),
+                'responses': [{'question_id': q.id, 'selected_choice_id': c.id} for q, c in self.pairs],
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def get_gzip(self, url, client=None, **headers):
+        headers.setdefault('HTTP_ACCEPT_ENCODING', 'gzip, deflate')
+        response = (client or self.client).get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        return response
+
+    def test_compresses_large_responses(self):
+        """大きなレスポンスは gzip で圧縮され、展開すると元の本文と同じか"""
+        import gzip
+        plain = self.client.get('/api/quiz/history/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        compressed = self.get_gzip('/api/quiz/history/')
+        self.assertLess(len(compressed.content), len(plain.content))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+    def test_small_or_refused_responses_are_not_compressed(self):
+        """しきい値未満のレスポンスや q=0 の形式は圧縮しないか"""
+        response = self.client.get('/api/user/stats/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response = self.client.get('/api/quiz/history/', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.get_gzip('/api/quiz/history/', HTTP_ACCEPT_ENCODING='*')['Content-Encoding'], 'gzip')
+
+    def test_html_is_not_compressed(self):
+        """CSRFトークンを含む管理画面のHTMLは圧縮しないか"""
+        admin = User.objects.create_superuser(username='admin', password='adminpass123')
+        self.client.force_login(admin)
+        response = self.client.get('/quiz-admin/quiz_api/question/add/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(len(response.content), settings.QUIZ_COMPRESSION_MIN_BYTES)
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_accepted_encodings(self):
+        """Accept-Encoding の q 値とワイルドカードを解釈できるか"""
+        from .compression import accepted_encodings
+        self.assertEqual(accepted_encodings('gzip, deflate, br;q=0'), {'gzip', 'deflate'})
+        self.assertEqual(accepted_encodings('GZIP;q=0.5'), {'gzip'})
+        self.assertEqual(accepted_encodings('*;q=1, gzip;q=0'), {'*'})
+        self.assertEqual(accepted_encodings(''), set())
+
+    def test_question_fragments_are_spliced(self):
+        """問題の断片は保存済みの deflate ブロックをつなげ、本文全体を圧縮し直さないか"""
+        import gzip
+        from unittest import mock
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=20&seed=3'
+        plain = self.client.get(url).content
+        with mock.patch('quiz_api.compression.compress') as compress:
+            response = self.get_gzip(url)
+        compress.assert_not_called()
+        self.assertEqual(gzip.decompress(response.content), plain)
+
+    def test_cached_payloads_are_precompressed(self):
+        """カタログとリーダーボードはキャッシュ済みの圧縮結果をそのまま返すか"""
+        import gzip
+        from unittest import mock
+        for i in range(10):
+            Category.objects.create(name=f"追加のカテゴリ{i+1:02d}")
+        # ミドルウェアはしきい値を起動時に読むため、設定を変えた後に新しいクライアントを作る
+        with override_settings(QUIZ_COMPRESSION_MIN_BYTES=128):
+            client = self.client_class()
+            client.force_authenticate(self.user)
+            for url in ('/api/categories/catalog/', '/api/quiz/leaderboard/authenticated/'):
+                plain = client.get(url).content
+                self.assertGreaterEqual(len(plain), 128, url)
+                with mock.patch('quiz_api.compression.compress') as compress:
+                    response = self.get_gzip(url, client)
+                compress.assert_not_called()
+                self.assertEqual(gzip.decompress(response.content), plain)
+
+    @skipUnless(find_spec('brotli'), 'brotli が必要')
+    def test_brotli_is_preferred(self):
+        """brotli があれば br を優先し、gzip だけのクライアントには gzip を返すか"""
+        import brotli
+        plain = self.client.get('/api/quiz/history/').content
+        response = self.client.get('/api/quiz/history/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), plain)
+        self.get_gzip('/api/quiz/history/', HTTP_ACCEPT_ENCODING='gzip')
+
+    def test_weak_etag_still_matches(self):
+        """圧縮時は弱い ETag になり、それを If-None-Match に付けても 304 になるか"""
+        response = self.get_gzip('/api/quiz/history/')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        response = self.client.get('/api/quiz/history/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_splice_gzip(self):
+        """断片のブロックと区切りから作った gzip が正しく展開できるか"""
+        import gzip
+        from .compression import deflate_block, splice_gzip
+        from .renderers import RawJSON
+        fragments = [f'{{"id":{i},"text":"断片{i}"}}'.encode('utf-8') for i in range(5)]
+        parts = [b'{"results":[']
+        for i, raw in enumerate(fragments):
+            if i:
+                parts.append(b',')
+            parts.append(RawJSON(raw, deflate_block=deflate_block(raw)))
+        parts.append(b']}')
+        expected = b'{"results":[' + b','.join(fragments) + b']}'
+        self.assertEqual(gzip.decompress(splice_gzip(parts)), expected)
+        self.assertEqual(gzip.decompress(splice_gzip([b'only', b' bytes'])), b'only bytes')
+
+
+class AsyncViewsTest(APITestCase):
+    """出題系APIと公開リーダーボードの非同期版（quiz_api/async_views.py）のテスト"""
+
+    ASYNC_URLCONF = 'quiz_api.async_urls'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='player', password='testpass123')
+        self.other = User.objects.create_user(username='rival', password='testpass123')
+        self.category = Category.objects.create(name="Math")
+        self.pairs = []
+        for i in range(8):
+            q = Question.objects.create(category=self.category, text=f"Q{i+1}")
+            correct = Choice.objects.create(question=q, text="正解", is_correct=True)
+            Choice.objects.create(question=q, text="不正解", is_correct=False)
+            self.pairs.append((q, correct))
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def get_async(self, url, **headers):
+        with self.settings(ROOT_URLCONF=self.ASYNC_URLCONF):
+            return self.client.get(url, **headers)
+
+    def save_result(self, user, pairs):
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post('/api/quiz/save-result/', {
+            'category_id': self.category.id,
+            'total_questions': len(pairs),
+            'responses': [{'question_id': q.id, 'selected_choice_id': c.id} for q, c in pairs],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_routes(self):
+        """非同期版は同じURL・URL名で登録され、それ以外のURLは同期版に任せるか"""
+        from django.urls import resolve, reverse
+        from .async_views import AsyncPublicLeaderboardView, AsyncUniqueRandomView
+        match = resolve('/api/questions/unique_random/', urlconf=self.ASYNC_URLCONF)
+        self.assertIs(match.func.view_class, AsyncUniqueRandomView)
+        self.assertEqual(reverse('question-unique-random', urlconf=self.ASYNC_URLCONF), '/api/questions/unique_random/')
+        self.assertIs(resolve('/api/quiz/leaderboard/', urlconf=self.ASYNC_URLCONF).func.view_class, AsyncPublicLeaderboardView)
+        self.assertEqual(resolve('/api/questions/', urlconf=self.ASYNC_URLCONF).url_name, 'question-list')
+
+    def test_same_body_as_sync_views(self):
+        """シード指定の抽選と公開リーダーボードは同期版とバイト単位で同じ本文を返すか"""
+        self.save_result(self.user, self.pairs[:3])
+        self.save_result(self.other, self.pairs[3:5])
+        for url in (
+            f'/api/questions/unique_random/?category={self.category.id}&limit=5&seed=7',
+            f'/api/questions/unique_random/?category={self.category.id}&limit=5&seed=7&hide_answers=true',
+            '/api/quiz/leaderboard/',
+            f'/api/quiz/leaderboard/?category={self.category.id}',
+        ):
+            expected = self.client.get(url)
+            cache.clear()
+            response = self.get_async(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            self.assertEqual(response['Content-Type'], expected['Content-Type'])
+            self.assertEqual(response.content, expected.content, url)
+        self.assertNotIn(b'is_correct', response.content)
+
+    def test_random_questions(self):
+        """random_questions は除外指定を守り、正解を隠す指定にも従うか"""
+        excluded = [q.id for q, _ in self.pairs[:6]]
+        url = f"/api/questions/random_questions/?category={self.category.id}&limit=10&hide_answers=true&exclude={','.join(map(str, excluded))}"
+        data = self.get_async(url).json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual({q['id'] for q in data['results']}, {q.id for q, _ in self.pairs[6:]})
+        self.assertTrue(all('is_correct' not in c for q in data['results'] for c in q['choices']))
+
+    def test_session_questions(self):
+        """session_questions は同じセッションで重複せず、使い切るとリセットするか"""
+        url = f'/api/questions/session_questions/?category={self.category.id}&limit=5&session_id=async-s1'
+        first = self.get_async(url).json()
+        second = self.get_async(url).json()
+        self.assertEqual(first['count'], 5)
+        self.assertEqual(second['count'], 3)
+        self.assertFalse({q['id'] for q in first['results']} & {q['id'] for q in second['results']})
+        session = QuizSession.objects.get(session_id='async-s1')
+        self.assertEqual(session.user, self.user)
+        self.assertEqual(session.used_count, 8)
+        third = self.get_async(url).json()
+        self.assertEqual(third['count'], 5)
+        self.assertIn('リセット', third['message'])
+
+    def test_quiz_session_excludes_recent(self):
+        """quiz_session は保存した回答の問題を除外するか（認証ユーザーのみ）"""
+        self.save_result(self.user, self.pairs[:5])
+        url = f'/api/questions/quiz_session/?category={self.category.id}&count=20'
+        data = self.get_async(url).json()
+        self.assertEqual(data['total_available'], 3)
+        self.assertEqual({q['id'] for q in data['results']}, {q.id for q, _ in self.pairs[5:]})
+        self.client.credentials()
+        self.assertEqual(self.get_async(url).json()['count'], 8)
+
+    def test_authentication_errors_match_sync_views(self):
+        """不正なトークンは同期版と同じ 401 になり、GET 以外は 405 になるか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        expected = self.client.get(url)
+        response = self.get_async(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(response['WWW-Authenticate'], expected['WWW-Authenticate'])
+        self.client.credentials()
+        with self.settings(ROOT_URLCONF=self.ASYNC_URLCONF):
+            response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertIn('detail', response.json())
+
+    def assert_same_response(self, url, method='get', **headers):
+        """同期版と非同期版が同じステータス・本文・ヘッダーを返すことを確認し、非同期版のレスポンスを返す"""
+        expected = getattr(self.client, method)(url, **headers)
+        with self.settings(ROOT_URLCONF=self.ASYNC_URLCONF):
+            response = getattr(self.client, method)(url, **headers)
+        self.assertEqual(response.status_code, expected.status_code, url)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'], url)
+        if expected['Content-Type'].startswith('application/json'):
+            self.assertEqual(response.json(), expected.json(), url)
+        for header in ('WWW-Authenticate', 'Retry-After', 'Allow'):
+            self.assertEqual(response.get(header), expected.get(header), (url, header))
+        return response
+
+    def test_error_responses_match_sync_views(self):
+        """認証エラー・未対応のメソッド・未対応の形式は同期版と同じレスポンスになるか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}'
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        self.assertEqual(self.assert_same_response(url).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assert_same_response('/api/quiz/leaderboard/')
+        self.client.credentials()
+        self.assertEqual(self.assert_same_response(url, method='post').status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+        self.assertEqual(self.assert_same_response(f'{url}&format=xml').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_content_negotiation_matches_sync_views(self):
+        """?format= と Accept で同期版と同じレンダラーが選ばれるか"""
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=3&seed=1'
+        response = self.assert_same_response(f'{url}&format=api')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        response = self.assert_same_response('/api/quiz/leaderboard/', HTTP_ACCEPT='text/html')
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assert_same_response(f'{url}&format=json')
+
+    def test_throttled_responses_match_sync_views(self):
+        """レート制限を超えたときの 429 が同期版と同じ本文・Retry-After になるか"""
+        from unittest import mock
+        from rest_framework.throttling import SimpleRateThrottle
+        self.client.credentials()
+        with mock.patch.object(SimpleRateThrottle, 'timer', lambda throttle: 1000.0):
+            for _ in range(30):
+                self.client.get('/api/quiz/leaderboard/')
+            response = self.assert_same_response('/api/quiz/leaderboard/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_view_throttle_classes_are_used(self):
+        """ビューの throttle_classes の上書きが非同期版でも効くか"""
+        from unittest import mock
+        from .async_views import AsyncPublicLeaderboardView
+        self.client.credentials()
+        with mock.patch.object(AsyncPublicLeaderboardView, 'throttle_classes', []):
+            for _ in range(35):
+                self.assertEqual(self.get_async('/api/quiz/leaderboard/').status_code, status.HTTP_200_OK)
+
+    def test_throttle_history_is_shared(self):
+        """レート制限は同期版と同じ履歴で数えられるか（匿名は 30/minute）"""
+        self.client.credentials()
+        for i in range(30):
+            response = self.client.get('/api/quiz/leaderboard/') if i % 2 else self.get_async('/api/quiz/leaderboard/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.get_async('/api/quiz/leaderboard/')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertIn('detail', response.json())
+
+    def test_leaderboard_cache_and_etag(self):
+        """公開リーダーボードは同期版とキャッシュ・ETag を共有し、一致すれば 304 を返すか"""
+        self.save_result(self.other, self.pairs[:2])
+        self.client.credentials()
+        expected = self.client.get('/api/quiz/leaderboard/')
+        with self.assertNumQueries(0):
+            response = self.get_async('/api/quiz/leaderboard/')
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        response = self.get_async('/api/quiz/leaderboard/', HTTP_IF_NONE_MATCH=expected['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.save_result(self.user, self.pairs[:4])
+        response = self.get_async('/api/quiz/leaderboard/', HTTP_IF_NONE_MATCH=expected['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+
+    async def test_asgi_request(self):
+        """ASGI のハンドラー経由で非同期のミドルウェアとビューが動き、計測と圧縮も行われるか"""
+        import gzip
+        from unittest import mock
+        url = f'/api/questions/unique_random/?category={self.category.id}&limit=8&seed=3'
+        headers = {'Authorization': f'Bearer {self.token}'}
+        with self.settings(ROOT_URLCONF=self.ASYNC_URLCONF, QUIZ_COMPRESSION_MIN_BYTES=256,
+                           QUIZ_INSTRUMENTATION=True, QUIZ_SERVER_TIMING=True):
+            plain = await self.async_client.get(url, headers=headers)
+            with mock.patch('quiz_api.compression.compress') as compress:
+                compressed = await self.async_client.get(url, headers={**headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(plain.status_code, status.HTTP_200_OK)
+        self.assertEqual(plain.json()['count'], 8)
+        # 非同期のORMのSQLもリクエストごとに数えられる（認証・IDプール・問題・選択肢）
+        self.assertIn('desc="4 queries"', plain['Server-Timing'])
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        compress.assert_not_called()
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
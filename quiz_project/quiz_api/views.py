@@ -1,4 +1,5 @@
 # quiz_api/views.py
+import hashlib
 import logging
 import random
 
@@ -7,43 +8,35 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.throttling import AnonRateThrottle
 from rest_framework.permissions import AllowAny
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from django.contrib.auth.models import User
 from django.contrib.auth import get_user_model
-from django.db.models import Avg, Count, Sum, Max, F, ExpressionWrapper, FloatField, IntegerField, Q, Case, When, Value
-
-from .models import Category, Question, Choice, QuizAttempt, QuizSession
+from django.db.models import Avg, Count, Sum, Max, F, FloatField, IntegerField, Q, Value, FilteredRelation
+
+from . import cache as quiz_cache
+from .category_catalog import get_catalog_version, get_category_catalog
+from .compression import precompress
+from .conditional import ConditionalGetMixin, make_etag
+from .content_versions import attempts_version, content_version
+from .models import Category, Question, Choice, QuizAttempt, QuizSession, UserCategoryStats
+from .pagination import LeaderboardCursorPagination, QuizHistoryPagination
+from .question_cache import get_question_fragments
+from .question_pool import (
+    RandomIdSample, get_question_pool, normalize_category, sample_question_ids, seeded_random,
+)
+from .recent_questions import get_recent_question_ids
+from .renderers import RawJSON
 from .serializers import (
-    CategorySerializer, QuestionSerializer, ChoiceSerializer,
+    CategorySerializer, QuestionSerializer, ChoiceSerializer, PublicQuestionSerializer,
     RegisterSerializer, UserSerializer, SaveQuizResultSerializer,
-    QuizAttemptSerializer, UserLeaderboardSerializer, UserStatsSerializer,
+    QuizAttemptSerializer, QuizAttemptSummarySerializer, UserLeaderboardSerializer, UserStatsSerializer,
     PublicLeaderboardSerializer,
 )
 
 logger = logging.getLogger(__name__)
 
 
-def select_random_questions(queryset, limit):
-    """クエリセットからランダムにlimit件を選択して返す共通ユーティリティ"""
-    all_items = list(queryset)
-    if len(all_items) <= limit:
-        selected = all_items
-    else:
-        selected = random.sample(all_items, limit)
-    random.shuffle(selected)
-    return selected
-
-
-def filter_questions_with_choices(queryset, category=None):
-    """カテゴリフィルターと選択肢ありフィルターを適用する共通ユーティリティ"""
-    qs = queryset.select_related('category').prefetch_related('choices')
-    if category and category != 'all':
-        try:
-            qs = qs.filter(category__id=int(category))
-        except ValueError:
-            pass
-    return qs.filter(choices__isnull=False).distinct()
-
-
 def parse_limit(value, default=10, maximum=50):
     """limit パラメータを安全にパースする"""
     try:
@@ -52,50 +45,190 @@ def parse_limit(value, default=10, maximum=50):
         return default
 
 
+def leaderboard_queryset(category_id=None):
+    """UserCategoryStats からリーダーボード用の集計値を付与したユーザーを返す
+
+    total_* / avg_percentage は全カテゴリ合計の行、category_* は指定カテゴリの行から取得する。
+    """
+    queryset = User.objects.annotate(
+        overall_stats=FilteredRelation('category_stats', condition=Q(category_stats__category__isnull=True)),
+    ).filter(overall_stats__attempts__gt=0).annotate(
+        total_attempts=F('overall_stats__attempts'),
+        total_score=F('overall_stats__score_sum'),
+        total_questions=F('overall_stats__questions_sum'),
+        avg_percentage=F('overall_stats__avg_percentage'),
+    )
+    if category_id is not None:
+        queryset = queryset.annotate(
+            selected_stats=FilteredRelation('category_stats', condition=Q(category_stats__category_id=category_id)),
+        ).filter(selected_stats__attempts__gt=0).annotate(
+            category_attempts=F('selected_stats__attempts'),
+            category_score=F('selected_stats__score_sum'),
+            category_questions=F('selected_stats__questions_sum'),
+            category_percentage=F('selected_stats__avg_percentage'),
+        )
+    return queryset
+
+
+def public_leaderboard_queryset(category_id=None):
+    """公開リーダーボードの上位10件（カテゴリ未指定・不正な場合は全体の成績で、カテゴリ別フィールドは0固定）"""
+    if category_id and category_id != 'all':
+        try:
+            return leaderboard_queryset(int(category_id)).order_by('-category_percentage', 'id')[:10]
+        except ValueError:
+            # カテゴリIDが無効な場合は全体統計を使用
+            pass
+    return leaderboard_queryset().annotate(
+        category_attempts=Value(0, output_field=IntegerField()),
+        category_score=Value(0, output_field=IntegerField()),
+        category_questions=Value(0, output_field=IntegerField()),
+        category_percentage=Value(0.0, output_field=FloatField())
+    ).order_by('-avg_percentage', 'id')[:10]
+
+
 class AuthRateThrottle(AnonRateThrottle):
     """認証エンドポイント専用のレート制限"""
     rate = '5/minute'
 
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class LeaderboardCacheMixin(ConditionalGetMixin):
+    """リーダーボードのレスポンスを共有キャッシュ経由で返す（受験結果の保存で無効化）
+
+    レンダリング済みのJSONと圧縮済みの表現をキャッシュし、RawJSON としてそのまま返す。
+    キャッシュと同じバージョンを ETag に使い、変更がなければ 304 を返す。
+    """
+    leaderboard_cache_timeout = 60 * 10
+
+    def get_etag(self, request):
+        return make_etag('leaderboard', quiz_cache.get_version(quiz_cache.LEADERBOARD))
+
+    def list(self, request, *args, **kwargs):
+        url_digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+
+        def render():
+            data = super(LeaderboardCacheMixin, self).list(request, *args, **kwargs).data
+            raw = api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
+            return raw, precompress(raw)
+
+        raw, encoded = quiz_cache.cache_aside(
+            quiz_cache.LEADERBOARD,
+            [self.__class__.__name__, 'z', url_digest],
+            render,
+            timeout=self.leaderboard_cache_timeout,
+        )
+        return Response(RawJSON(raw, encoded=encoded))
+
+
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all().order_by('name')  # 名前でソート
     serializer_class = CategorySerializer
 
-class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
+    def get_etag(self, request):
+        if self.action == 'catalog':
+            return make_etag('catalog', get_catalog_version())
+        return make_etag('categories', quiz_cache.get_version(quiz_cache.CATEGORIES))
+
+    def list(self, request, *args, **kwargs):
+        # カテゴリ一覧は共有キャッシュから取得し、ページネーションのみ行う
+        categories = quiz_cache.cache_aside(
+            quiz_cache.CATEGORIES,
+            ['list'],
+            lambda: list(self.get_serializer(self.get_queryset(), many=True).data),
+        )
+        page = self.paginate_queryset(categories)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(categories)
+
+    # トークンからユーザーを復元するだけにして、キャッシュが温まっていればDBに触れない
+    @action(
+        detail=False, methods=['get'], pagination_class=None,
+        authentication_classes=[JWTStatelessUserAuthentication],
+    )
+    def catalog(self, request):
+        """全カテゴリと出題可能な問題数・画像付き問題数（ETag 付き、ページネーションなし）"""
+        return Response(get_category_catalog())
+
+class QuestionViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = QuestionSerializer
     
+    def get_etag(self, request):
+        # 詳細は問題のカテゴリが分からないため全カテゴリの版を使う。ランダム順の一覧と抽選系のアクションは対象外
+        if self.action == 'retrieve':
+            return make_etag('question', content_version())
+        if self.action == 'list' and not self.random_order():
+            return make_etag('questions', content_version(normalize_category(request.query_params.get('category'))))
+        return None
+    
+    def hide_answers(self):
+        return self.request.query_params.get('hide_answers', 'false').lower() == 'true'
+    
+    def get_serializer_class(self):
+        # hide_answers=true の場合は正解情報を含めない（採点はサーバー側で行う）
+        if self.hide_answers():
+            return PublicQuestionSerializer
+        return super().get_serializer_class()
+    
+    def get_question_payloads(self, question_ids):
+        """問題IDをキャッシュ済みのJSON断片に変換する（シリアライザーはキャッシュミス時のみ使用）"""
+        return get_question_fragments(
+            question_ids,
+            self.request,
+            serialize=lambda questions: self.get_serializer(questions, many=True).data,
+            hide_answers=self.hide_answers(),
+        )
+    
+    def get_list_limit(self):
+        """一覧の件数制限（未指定・不正値の場合は None、最大50件）"""
+        try:
+            limit_num = int(self.request.query_params.get('limit', None))
+        except (ValueError, TypeError):
+            return None
+        return min(limit_num, 50) if limit_num > 0 else None
+    
+    def random_order(self):
+        """一覧をランダム順で返すか（デフォルトはカテゴリー指定時のみ。order=id または random=false で無効化）"""
+        params = self.request.query_params
+        random_order = params.get('random', None)
+        if normalize_category(params.get('category', None)) is None or params.get('order', None) == 'id':
+            return False
+        return not (random_order and random_order.lower() == 'false')
+    
+    def get_random_question_ids(self):
+        """ランダム順で返す問題IDのシーケンス（ランダム順でない場合は None）
+        
+        テーブル全体を RANDOM() で並べ替えず、IDプールから表示する件数だけを抽選する。
+        """
+        if not self.random_order():
+            return None
+        category = normalize_category(self.request.query_params.get('category', None))
+        pool = get_question_pool(category, playable_only=False)
+        return RandomIdSample(pool, size=self.get_list_limit())
+    
+    def list(self, request, *args, **kwargs):
+        question_ids = self.get_random_question_ids()
+        if question_ids is None:
+            return super().list(request, *args, **kwargs)
+        
+        page = self.paginate_queryset(question_ids)
+        if page is not None:
+            return self.get_paginated_response(self.get_question_payloads(page))
+        return Response(self.get_question_payloads(list(question_ids)))
+    
     def get_queryset(self):
-        queryset = Question.objects.all()
+        queryset = Question.objects.prefetch_related('choices')
         category = self.request.query_params.get('category', None)
-        random_order = self.request.query_params.get('random', None)
-        limit = self.request.query_params.get('limit', None)
-        force_order = self.request.query_params.get('order', None)
         
         # カテゴリーフィルター
         if category is not None:
             queryset = queryset.filter(category__id=category)
         
-        # 順序制御（デフォルトをランダムに変更）
-        if force_order == 'id':
-            # 明示的にID順が指定された場合のみID順
-            queryset = queryset.order_by('id')
-        elif random_order and random_order.lower() == 'false':
-            # 明示的にランダムを無効化
-            queryset = queryset.order_by('id')
-        else:
-            # デフォルトはランダム（カテゴリー指定時のみ）
-            if category is not None:
-                queryset = queryset.order_by('?')
-            else:
-                queryset = queryset.order_by('id')
+        # ランダム順の一覧は list() で IDプールから抽選する
+        queryset = queryset.order_by('id')
         
         # 件数制限
-        if limit is not None:
-            try:
-                limit_num = int(limit)
-                if limit_num > 0:
-                    queryset = queryset[:min(limit_num, 50)]
-            except ValueError:
-                pass
+        limit_num = self.get_list_limit()
+        if limit_num is not None:
+            queryset = queryset[:limit_num]
         
         return queryset
     
@@ -106,34 +239,23 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         limit_num = parse_limit(request.query_params.get('limit', '10'))
         seed = request.query_params.get('seed', None)
 
-        queryset = filter_questions_with_choices(Question.objects.all(), category)
-
-        # シード値が指定されている場合は再現可能なランダム
-        if seed:
-            try:
-                random.seed(int(seed))
-            except ValueError:
-                random.seed(hash(seed) % (2**32))
-
-        all_questions = list(queryset)
-        if not all_questions:
+        pool = get_question_pool(category)
+        if not pool:
             return Response({
                 'count': 0,
                 'results': [],
                 'message': '指定された条件に合う問題が見つかりませんでした'
             })
 
-        selected_questions = select_random_questions(queryset, limit_num)
-
-        # シード値をリセット
-        if seed:
-            random.seed()
+        # シード値が指定されている場合はリクエスト専用の乱数生成器で再現可能に抽選する
+        rng = seeded_random(seed) if seed else None
+        selected_ids = sample_question_ids(category, limit_num, rng=rng)
 
-        serializer = self.get_serializer(selected_questions, many=True)
+        selected_questions = self.get_question_payloads(selected_ids)
         return Response({
             'count': len(selected_questions),
-            'results': serializer.data,
-            'total_available': len(all_questions),
+            'results': selected_questions,
+            'total_available': len(pool),
             'message': f'{len(selected_questions)}問の問題をランダムに取得しました（重複なし保証）'
         })
     
@@ -156,44 +278,42 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
             }
         )
 
-        if reset_session.lower() == 'true':
-            session.used_questions.clear()
-            session.save()
+        used_question_ids = set()
+        if reset_session.lower() != 'true':
+            used_question_ids = session.get_used_question_ids()
 
-        queryset = filter_questions_with_choices(Question.objects.all(), category)
+        pool = get_question_pool(category)
 
         # 既に使用した問題を除外
-        used_question_ids = session.used_questions.values_list('id', flat=True)
-        available_queryset = queryset.exclude(id__in=used_question_ids)
+        available_count = sum(1 for question_id in pool if question_id not in used_question_ids)
 
         # 利用可能な問題がない場合
         message_suffix = ''
-        if not available_queryset.exists():
-            if not queryset.exists():
+        if available_count == 0:
+            if not pool:
                 return Response({
                     'count': 0, 'results': [], 'session_id': session_id,
                     'message': '指定された条件に合う問題が見つかりませんでした',
                     'total_available': 0, 'used_count': 0
                 })
-            session.used_questions.clear()
-            session.save()
-            available_queryset = queryset
+            used_question_ids = set()
+            available_count = len(pool)
             message_suffix = '（すべての問題を出題済みのため、セッションをリセットしました）'
 
-        selected_questions = select_random_questions(available_queryset, limit_num)
+        selected_ids = sample_question_ids(category, limit_num, exclude=used_question_ids)
+        selected_questions = self.get_question_payloads(selected_ids)
 
-        if selected_questions:
-            session.used_questions.add(*selected_questions)
-            session.save()
+        # 出題済みIDはセッション行の1カラムにまとめて書き込む
+        session.set_used_question_ids(used_question_ids | set(selected_ids))
+        session.save(update_fields=['used_question_data', 'used_count', 'updated_at'])
 
-        serializer = self.get_serializer(selected_questions, many=True)
         return Response({
             'count': len(selected_questions),
-            'results': serializer.data,
+            'results': selected_questions,
             'session_id': session_id,
-            'total_available': queryset.count(),
-            'used_count': session.used_questions.count(),
-            'remaining': queryset.count() - session.used_questions.count(),
+            'total_available': len(pool),
+            'used_count': session.used_count,
+            'remaining': available_count - len(selected_questions),
             'message': f'{len(selected_questions)}問の問題を取得しました（セッション管理による重複なし保証）{message_suffix}'
         })
     
@@ -204,22 +324,18 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         limit_num = parse_limit(request.query_params.get('limit', '10'))
         exclude = request.query_params.get('exclude', '')
 
-        queryset = filter_questions_with_choices(Question.objects.all(), category)
-
         # 除外する問題があれば除外
+        exclude_ids = set()
         if exclude:
             try:
-                exclude_ids = [int(x.strip()) for x in exclude.split(',') if x.strip()]
-                if exclude_ids:
-                    queryset = queryset.exclude(id__in=exclude_ids)
+                exclude_ids = {int(x.strip()) for x in exclude.split(',') if x.strip()}
             except ValueError:
                 pass
 
-        questions = select_random_questions(queryset, limit_num)
-        serializer = self.get_serializer(questions, many=True)
+        questions = self.get_question_payloads(sample_question_ids(category, limit_num, exclude=exclude_ids))
         return Response({
             'count': len(questions),
-            'results': serializer.data,
+            'results': questions,
             'message': f'{len(questions)}問の問題をランダムに取得しました'
         })
     
@@ -231,23 +347,14 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
         question_count = parse_limit(request.query_params.get('count', '10'), maximum=20)
         exclude_recent = request.query_params.get('exclude_recent', 'true')
 
-        queryset = filter_questions_with_choices(Question.objects.all(), category)
+        pool = get_question_pool(category)
 
-        # 最近出題された問題を除外（認証ユーザーの場合）
+        # 最近出題された問題を除外（認証ユーザーの場合、キャッシュ済みのID集合を使用）
+        recent_question_ids = set()
         if exclude_recent.lower() == 'true' and request.user.is_authenticated:
-            from datetime import timedelta
-            from django.utils import timezone
-
-            recent_time = timezone.now() - timedelta(hours=1)
-            recent_attempts = QuizAttempt.objects.filter(
-                user=request.user,
-                created_at__gte=recent_time
-            ).values_list('responses__question_id', flat=True)
+            recent_question_ids = get_recent_question_ids(request.user.id)
 
-            if recent_attempts:
-                queryset = queryset.exclude(id__in=recent_attempts)
-
-        total_questions = queryset.count()
+        total_questions = sum(1 for question_id in pool if question_id not in recent_question_ids)
         if total_questions == 0:
             return Response({
                 'count': 0, 'results': [],
@@ -255,11 +362,12 @@ class QuestionViewSet(viewsets.ReadOnlyModelViewSet):
                 'total_available': 0
             })
 
-        questions = select_random_questions(queryset, question_count)
-        serializer = self.get_serializer(questions, many=True)
+        questions = self.get_question_payloads(
+            sample_question_ids(category, question_count, exclude=recent_question_ids)
+        )
         return Response({
             'count': len(questions),
-            'results': serializer.data,
+            'results': questions,
             'session_id': session_id or f'session_{random.randint(1000, 9999)}',
             'total_available': total_questions,
             'message': f'{len(questions)}問の問題を取得しました（利用可能: {total_questions}問）'
@@ -287,17 +395,45 @@ class SaveQuizResultView(generics.CreateAPIView):
         context.update({"request": self.request})
         return context
 
-class QuizHistoryView(generics.ListAPIView):
+class QuizHistoryView(ConditionalGetMixin, generics.ListAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = QuizAttemptSerializer
+    pagination_class = QuizHistoryPagination
+    etag_private = True
+
+    def get_etag(self, request):
+        # カテゴリ名と問題文も含むため、カテゴリと問題の版も組み合わせる
+        return make_etag(
+            'history', request.user.pk, attempts_version(request.user.pk),
+            quiz_cache.get_version(quiz_cache.CATEGORIES), content_version(),
+        )
+
+    def summary(self):
+        return self.request.query_params.get('summary', 'false').lower() == 'true'
+
+    def get_serializer_class(self):
+        # summary=true の場合は回答の詳細を含めない
+        if self.summary():
+            return QuizAttemptSummarySerializer
+        return QuizAttemptSerializer
 
     def get_queryset(self):
+        queryset = QuizAttempt.objects.filter(user=self.request.user)
+        if self.summary():
+            return queryset.select_related('category')
         return (
-            QuizAttempt.objects.filter(user=self.request.user)
-            .select_related('user', 'category')
+            queryset.select_related('user', 'category')
             .prefetch_related('responses__question', 'responses__selected_choice')
         )
 
+    def get_pagination_count(self, queryset):
+        """カーソル方式の総件数（集計済みの全体行の受験回数を使う）"""
+        attempts = (
+            UserCategoryStats.objects.filter(user=self.request.user, category__isnull=True)
+            .values_list('attempts', flat=True).first()
+        )
+        return attempts or 0
+
 class QuizAttemptDetailView(generics.RetrieveAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = QuizAttemptSerializer
@@ -309,91 +445,99 @@ class QuizAttemptDetailView(generics.RetrieveAPIView):
             .prefetch_related('responses__question', 'responses__selected_choice')
         )
 # リーダーボード
-class LeaderboardView(generics.ListAPIView):
+class LeaderboardView(LeaderboardCacheMixin, generics.ListAPIView):
     """全ユーザーの成績を集計したリーダーボードを提供するAPI"""
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserLeaderboardSerializer
+    pagination_class = LeaderboardCursorPagination
     
-    def get_queryset(self):
+    def get_category(self):
         category = self.request.query_params.get('category')
-        
-        # 基本的なクエリ - 単純化
-        queryset = User.objects.annotate(
-            total_attempts=Count('quiz_attempts'),
-            total_score=Sum('quiz_attempts__score', default=0),
-            total_questions=Sum('quiz_attempts__total_questions', default=0),
-            avg_percentage=Case(
-                When(total_questions__gt=0, 
-                    then=ExpressionWrapper(
-                        F('total_score') * 100.0 / F('total_questions'), 
-                        output_field=FloatField()
-                    )
-                ),
-                default=Value(0.0),
-                output_field=FloatField()
-            )
-        )
-        
-        # カテゴリフィルターはシンプルに保持
         if category and category != 'all' and category.isdigit():
-            queryset = queryset.filter(quiz_attempts__category_id=category)
-            
-        # 少なくとも1つの試行があるユーザーのみ表示
-        queryset = queryset.filter(total_attempts__gt=0).distinct()
+            return int(category)
+        return None
+    
+    def get_queryset(self):
+        # カテゴリフィルター（指定カテゴリに受験記録のあるユーザーのみ）
+        queryset = leaderboard_queryset(self.get_category())
         
         # 平均パーセンテージでソート（降順）
-        return queryset.order_by('-avg_percentage')
+        return queryset.order_by('-avg_percentage', 'id')
+    
+    def get_pagination_count(self, queryset):
+        """カーソル方式の総件数（受験結果の保存で無効化されるキャッシュから返す）"""
+        return quiz_cache.cache_aside(
+            quiz_cache.LEADERBOARD,
+            ['count', self.get_category() or 'all'],
+            queryset.count,
+            timeout=self.leaderboard_cache_timeout,
+        )
 
 #ユーザープロフィールとパフォーマンス統計
-class UserStatsView(generics.RetrieveAPIView):
+class UserStatsView(ConditionalGetMixin, generics.RetrieveAPIView):
     permission_classes = (permissions.IsAuthenticated,)
     serializer_class = UserStatsSerializer
+    etag_private = True
+
+    def get_etag(self, request):
+        return make_etag(
+            'stats', request.user.pk, attempts_version(request.user.pk),
+            quiz_cache.get_version(quiz_cache.CATEGORIES),
+        )
     
     def get_object(self):
         user = self.request.user
         
         try:
-            # シンプルな統計計算
-            attempts = QuizAttempt.objects.filter(user=user)
+            # カテゴリ別の集計を1回のグループ化クエリで取得
+            rows = (
+                QuizAttempt.objects.filter(user=user)
+                .order_by('category__name')
+                .values('category', 'category__name')
+                .annotate(
+                    attempts_count=Count('id'),
+                    score_sum=Sum('score'),
+                    questions_sum=Sum('total_questions'),
+                    best_score=Max('score'),
+                )
+            )
             
-            # ベストカテゴリーを取得（平均スコアが最も高いもの）
             best_category = None
             category_stats = []
+            total_attempts = 0
+            total_score = 0
+            total_questions = 0
             
             # カテゴリー別の統計を計算
-            if attempts.exists():
-                # percentage フィールドの代わりに計算式を使用
-                categories = attempts.values('category', 'category__name').distinct()
+            for row in rows:
+                cat_score_sum = row['score_sum'] or 0
+                cat_questions_sum = row['questions_sum'] or 1
+                cat_percentage = (cat_score_sum / cat_questions_sum) * 100 if cat_questions_sum > 0 else 0
                 
-                for cat in categories:
-                    cat_attempts = attempts.filter(category=cat['category'])
-                    cat_score_sum = cat_attempts.aggregate(Sum('score'))['score__sum'] or 0
-                    cat_questions_sum = cat_attempts.aggregate(Sum('total_questions'))['total_questions__sum'] or 1
-                    cat_percentage = (cat_score_sum / cat_questions_sum) * 100 if cat_questions_sum > 0 else 0
-                    
-                    cat_stats = {
-                        'id': cat['category'],
-                        'name': cat['category__name'],
-                        'attempts_count': cat_attempts.count(),
-                        'best_score': cat_attempts.aggregate(Max('score'))['score__max'] or 0,
-                        'avg_percentage': round(cat_percentage, 1)
-                    }
-                    category_stats.append(cat_stats)
-                    
-                # 最高パーセンテージのカテゴリーを特定
-                if category_stats:
-                    best_cat = max(category_stats, key=lambda x: x['avg_percentage'])
-                    best_category = best_cat['name']
+                category_stats.append({
+                    'id': row['category'],
+                    'name': row['category__name'],
+                    'attempts_count': row['attempts_count'],
+                    'best_score': row['best_score'] or 0,
+                    'avg_percentage': round(cat_percentage, 1)
+                })
+                total_attempts += row['attempts_count']
+                total_score += cat_score_sum
+                total_questions += row['questions_sum'] or 0
+            
+            # 最高パーセンテージのカテゴリーを特定
+            if category_stats:
+                best_cat = max(category_stats, key=lambda x: x['avg_percentage'])
+                best_category = best_cat['name']
             
             # 全体の平均パーセンテージを計算
-            total_score = attempts.aggregate(Sum('score'))['score__sum'] or 0
-            total_questions = attempts.aggregate(Sum('total_questions'))['total_questions__sum'] or 1
+            total_questions = total_questions or 1
             avg_percentage = (total_score / total_questions) * 100 if total_questions > 0 else 0
             
             # 全体統計
             overall_stats = {
-                'total_attempts': attempts.count(),
-                'total_categories_played': attempts.values('category').distinct().count(),
+                'total_attempts': total_attempts,
+                'total_categories_played': len(category_stats),
                 'best_category': best_category,
                 'avg_percentage': round(avg_percentage, 1),
                 'category_stats': category_stats  # カテゴリー統計を追加
@@ -413,71 +557,16 @@ class UserStatsView(generics.RetrieveAPIView):
                 'error': "統計情報の計算中にエラーが発生しました"
             }
 
-class PublicLeaderboardView(generics.ListAPIView):
+class PublicLeaderboardView(LeaderboardCacheMixin, generics.ListAPIView):
     """公開用リーダーボード（認証不要）"""
     permission_classes = [AllowAny]
     serializer_class = PublicLeaderboardSerializer
 
     def get_queryset(self):
         try:
-            # カテゴリフィルターを取得
-            category_id = self.request.query_params.get('category', None)
-
-            # ベースとなる全体統計を計算
-            queryset = User.objects.annotate(
-                total_attempts=Count('quiz_attempts'),
-                total_score=Sum('quiz_attempts__score', default=0),
-                total_questions=Sum('quiz_attempts__total_questions', default=0),
-                avg_percentage=Case(
-                    When(total_questions__gt=0,
-                        then=ExpressionWrapper(
-                            F('total_score') * 100.0 / F('total_questions'),
-                            output_field=FloatField()
-                        )
-                    ),
-                    default=Value(0.0),
-                    output_field=FloatField()
-                )
-            )
-
-            # カテゴリフィルターが指定されている場合
-            if category_id and category_id != 'all':
-                try:
-                    category_id_int = int(category_id)
-                    queryset = queryset.annotate(
-                        category_attempts=Count('quiz_attempts', filter=Q(quiz_attempts__category_id=category_id_int)),
-                        category_score=Sum('quiz_attempts__score', filter=Q(quiz_attempts__category_id=category_id_int), default=0),
-                        category_questions=Sum('quiz_attempts__total_questions', filter=Q(quiz_attempts__category_id=category_id_int), default=0),
-                        category_percentage=Case(
-                            When(category_questions__gt=0,
-                                then=ExpressionWrapper(
-                                    F('category_score') * 100.0 / F('category_questions'),
-                                    output_field=FloatField()
-                                )
-                            ),
-                            default=Value(0.0),
-                            output_field=FloatField()
-                        )
-                    ).filter(category_attempts__gt=0).order_by('-category_percentage')[:10]
-                except ValueError:
-                    # カテゴリIDが無効な場合は全体統計を使用
-                    queryset = queryset.annotate(
-                        category_attempts=Value(0, output_field=IntegerField()),
-                        category_score=Value(0, output_field=IntegerField()),
-                        category_questions=Value(0, output_field=IntegerField()),
-                        category_percentage=Value(0.0, output_field=FloatField())
-                    ).filter(total_attempts__gt=0).order_by('-avg_percentage')[:10]
-            else:
-                # カテゴリフィルターが指定されていない場合はデフォルト値を設定
-                queryset = queryset.annotate(
-                    category_attempts=Value(0, output_field=IntegerField()),
-                    category_score=Value(0, output_field=IntegerField()),
-                    category_questions=Value(0, output_field=IntegerField()),
-                    category_percentage=Value(0.0, output_field=FloatField())
-                ).filter(total_attempts__gt=0).order_by('-avg_percentage')[:10]
-
-            return queryset
+            # カテゴリフィルター（async_views.AsyncPublicLeaderboardView と共通）
+            return public_leaderboard_queryset(self.request.query_params.get('category', None))
 
         except Exception as e:
             logger.error(f"Error in PublicLeaderboardView: {e}", exc_info=True)
-            return User.objects.none()
\ No newline at end of file
+            return User.objects.none()
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz_api.instrumentation.InstrumentationMiddleware',
+    'quiz_api.compression.CompressionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,7 +61,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'quiz_project.urls'
+# True の場合、出題系APIと公開リーダーボードを非同期ビュー（quiz_api/async_views.py）で処理する（ASGI で起動する場合向け）
+QUIZ_ASYNC_VIEWS = os.environ.get('QUIZ_ASYNC_VIEWS', 'False').lower() == 'true'
+
+ROOT_URLCONF = 'quiz_api.async_urls' if QUIZ_ASYNC_VIEWS else 'quiz_project.urls'
 
 TEMPLATES = [
     {
@@ -152,6 +157,10 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': [
+        'quiz_api.renderers.QuizJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_THROTTLE_CLASSES': [
@@ -170,13 +179,45 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
 }
 
+# キャッシュ: CACHE_URL で切り替え（形式は quiz_api/cache_backends.py を参照）
+# 未指定時は開発環境ではプロセス内メモリを使用。本番ではワーカー間で共有する Redis などの指定が必須
+# （レート制限で毎リクエスト書き込むため、ファイルキャッシュは小規模な単一マシン向け）
+from quiz_api.cache_backends import cache_config_from_url
+
+CACHE_URL = os.environ.get('CACHE_URL') or ('locmem://quiz-api' if DEBUG else '')
+if not CACHE_URL:
+    raise ValueError('CACHE_URL must be set via environment variable in production')
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+    'default': cache_config_from_url(CACHE_URL),
 }
 
+# クイズセッションで最近出題した問題を除外する期間（秒）と、出題履歴をまとめる時間枠（秒）
+QUIZ_RECENT_QUESTIONS_WINDOW = int(os.environ.get('QUIZ_RECENT_QUESTIONS_WINDOW', 60 * 60))
+QUIZ_RECENT_QUESTIONS_BUCKET = int(os.environ.get('QUIZ_RECENT_QUESTIONS_BUCKET', 5 * 60))
+
+# リクエスト計測（quiz_api/instrumentation.py）: 遅いリクエストとみなす時間（ミリ秒）と、
+# 1リクエストで同じSQLを何回実行したら N+1 の疑いとして記録するか
+# 計測は全SQLをフックし、ワーカー全体で共有する集計をロックして更新するため、本番ではデフォルトで無効
+QUIZ_INSTRUMENTATION = os.environ.get('QUIZ_INSTRUMENTATION', str(DEBUG)).lower() == 'true'
+QUIZ_SLOW_REQUEST_MS = int(os.environ.get('QUIZ_SLOW_REQUEST_MS', 500))
+QUIZ_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUIZ_N_PLUS_ONE_THRESHOLD', 10))
+# 計測値（SQL件数・SQL時間・処理時間）を Server-Timing ヘッダーで返すか（内部の情報のため本番ではデフォルトで無効）
+QUIZ_SERVER_TIMING = os.environ.get('QUIZ_SERVER_TIMING', str(DEBUG)).lower() == 'true'
+
+# レスポンスの圧縮（quiz_api/compression.py）: この大きさ（バイト）未満のレスポンスは圧縮しない
+QUIZ_COMPRESSION = os.environ.get('QUIZ_COMPRESSION', 'True').lower() == 'true'
+QUIZ_COMPRESSION_MIN_BYTES = int(os.environ.get('QUIZ_COMPRESSION_MIN_BYTES', 1024))
+
+# orjson によるJSONの出力・解析（quiz_api/fast_json.py、orjson のインストールが必要）。出力は標準のレンダラーと同じ
+QUIZ_FAST_JSON = os.environ.get('QUIZ_FAST_JSON', 'False').lower() == 'true'
+if QUIZ_FAST_JSON:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'][0] = 'quiz_api.fast_json.QuizORJSONRenderer'
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'] = [
+        'quiz_api.fast_json.QuizORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ]
+
 # ---------- Security settings (production) ----------
 if not DEBUG:
     SECURE_SSL_REDIRECT = True